@@ -3,12 +3,37 @@ KRISHI MITRA - Flask Backend API
 Complete agricultural advisory system backend
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
+import io
 import json
+import math
 import os
 from datetime import datetime
 
+import numpy as np
+
+from crop_engine import NUTRIENTS, suitability_grid, soil_score_vector, rank_crops, as_sample_matrix
+from fertilizer import DEFAULT_PRICES, plan_fertilizer_batch, plan_to_dict, procurement_totals
+from batch import READERS, binary_stream, detect_format, chunked
+from villages import load_village_store, load_gazetteer, slugify
+from village_file import MappedVillageStore, write_village_file, DEFAULT_VILLAGE_FILE
+from spatial import idw_weights
+from precompute import PrecomputedResponses
+from weather import WeatherService, OpenWeatherMapUpstream, StubUpstream
+from history import HistoryStore, DEFAULT_HISTORY_PATH
+from firebase_auth import TokenVerifier, DEFAULT_CREDENTIALS_PATH
+from inference import InferenceEngine, DEFAULT_MODEL_PATH, spec_path
+from assessment import lookup_estimate
+from knowledge import KnowledgeStore, DEFAULT_SNAPSHOT_PATH, DEFAULT_SOURCE_PATH
+from rollups import RollupStore, DEFAULT_ROLLUP_PATH, LEVELS, ROLLUP_PARAMS, sample_row
+from memo import ResultCache, DEFAULT_MEMO_PATH, DECIMALS, canonical_key, quantize
+from sensitivity import MAX_GRID_POINTS, axis_values, grid_size, what_if
+from metrics import MetricsRegistry
+from profiling import RequestProfiler
+from responses import (MIN_COMPRESS_SIZE, CompressedBodies, body_etag, choose_encoding,
+                       compress, parse_fields, project)
+
 app = Flask(__name__)
 
 # Configure CORS for production
@@ -16,11 +41,22 @@ CORS(app, origins=[
     "http://localhost:8000",
     "https://krishi-mitra-3da67.web.app",
     "https://krishi-mitra-3da67.firebaseapp.com"
-])
+], expose_headers=['X-Next-Cursor'])
+
+# Latency histograms, error counters and spans on /metrics; with METRICS_DIR
+# set (gunicorn.conf.py does) the numbers cover every worker process
+METRICS = MetricsRegistry('api', os.environ.get('METRICS_DIR'))
+METRICS.install(app)
+
+# Flamegraph-ready stacks for PROFILE_SAMPLE_RATE of requests and for any
+# request with a signed X-Profile header; off when neither is configured
+PROFILER = RequestProfiler('api', os.environ.get('PROFILE_DIR'),
+                           os.environ.get('PROFILE_SAMPLE_RATE'), os.environ.get('PROFILE_SECRET'))
+PROFILER.install(app)
 
 # ========== CONFIGURATION ==========
 
-# Mysuru Location Data
+# Legacy Mysuru Rural villages not yet covered by mysuru-data.json
 MYSURU_LOCATIONS = {
     'hebbal': {
         'name': 'Hebbal',
@@ -63,147 +99,154 @@ MYSURU_LOCATIONS = {
     }
 }
 
-# Crop Database
-CROP_DATABASE = {
-    'ragi': {
-        'name_english': 'Finger Millet',
-        'name_kannada': 'ರಾಗಿ',
-        'ideal_conditions': {
-            'ph': [5.5, 7.0],
-            'nitrogen': [150, 300],
-            'phosphorus': [30, 50],
-            'potassium': [20, 40]
-        },
-        'economics': {
-            'input_cost_per_acre': 15000,
-            'expected_revenue_per_acre': 35000,
-            'expected_yield': '25-30 quintals/hectare'
-        },
-        'timeline': {
-            'sowing': 'June-July',
-            'harvest': 'October-November',
-            'duration': '120-130 days'
-        },
-        'best_variety': 'GPU-28'
-    },
-    'maize': {
-        'name_english': 'Maize',
-        'name_kannada': 'ಮೆಕ್ಕೆಜೋಳ',
-        'ideal_conditions': {
-            'ph': [6.0, 7.5],
-            'nitrogen': [180, 300],
-            'phosphorus': [25, 50],
-            'potassium': [150, 250]
-        },
-        'economics': {
-            'input_cost_per_acre': 20000,
-            'expected_revenue_per_acre': 45000,
-            'expected_yield': '40-50 quintals/hectare'
-        },
-        'timeline': {
-            'sowing': 'June',
-            'harvest': 'September-October',
-            'duration': '110-120 days'
-        },
-        'best_variety': 'DHM 117'
-    },
-    'wheat': {
-        'name_english': 'Wheat',
-        'name_kannada': 'ಗೋಧಿ',
-        'ideal_conditions': {
-            'ph': [6.5, 7.5],
-            'nitrogen': [200, 300],
-            'phosphorus': [30, 60],
-            'potassium': [150, 250]
-        },
-        'economics': {
-            'input_cost_per_acre': 18000,
-            'expected_revenue_per_acre': 40000,
-            'expected_yield': '35-45 quintals/hectare'
-        },
-        'timeline': {
-            'sowing': 'November',
-            'harvest': 'March-April',
-            'duration': '120-130 days'
-        },
-        'best_variety': 'HI 1544'
-    }
-}
+# Crop knowledge: crop-knowledge.json compiled into a binary snapshot that
+# every worker hot-swaps when the file changes (see knowledge.py)
+KNOWLEDGE = KnowledgeStore(
+    os.environ.get('CROP_SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH),
+    source=os.environ.get('CROP_KNOWLEDGE_PATH', DEFAULT_SOURCE_PATH)
+)
+
+def build_village_file(path=DEFAULT_VILLAGE_FILE):
+    """Convert mysuru-data.json (legacy entries fill the gaps) into the mapped village file"""
+    store = load_village_store()
+    for location in MYSURU_LOCATIONS.values():
+        store.add(location['name'], 'Mysuru Rural', location, 'Mysuru', 'Karnataka')
+    load_gazetteer(store)
+    write_village_file(store, path)
+    return path
+
+# Village store: a memory-mapped columnar file shared by every worker.
+# VILLAGE_FILE points at a pre-converted file (see village_file.py);
+# otherwise it is rebuilt from the JSON sources at startup.
+VILLAGE_STORE = MappedVillageStore(os.environ.get('VILLAGE_FILE') or build_village_file())
+
+# GPS lookups: neighbours blended per request, and how far a match may be
+MAX_GPS_NEIGHBOURS = 8
+MAX_NEAREST_KM = 50
+
+# Weather proxy: real upstream when a key is set, local stub when asked for
+if os.environ.get('OPENWEATHERMAP_API_KEY'):
+    WEATHER = WeatherService(OpenWeatherMapUpstream(os.environ['OPENWEATHERMAP_API_KEY']),
+                             ttl=int(os.environ.get('WEATHER_TTL_SECONDS', 600)))
+elif os.environ.get('WEATHER_STUB') == '1':
+    WEATHER = WeatherService(StubUpstream())
+else:
+    WEATHER = None
+
+# Farmers' saved analyses
+HISTORY = HistoryStore(os.environ.get('HISTORY_DB_PATH', DEFAULT_HISTORY_PATH))
+HISTORY_PAGE_MAX = 100
+
+# Firebase ID token checks for history; same credentials as main.py
+if os.environ.get('FIREBASE_CREDENTIALS'):
+    AUTH = TokenVerifier(json.loads(os.environ['FIREBASE_CREDENTIALS']))
+elif os.path.exists(os.environ.get('FIREBASE_CREDENTIALS_PATH', DEFAULT_CREDENTIALS_PATH)):
+    AUTH = TokenVerifier(os.environ.get('FIREBASE_CREDENTIALS_PATH', DEFAULT_CREDENTIALS_PATH))
+else:
+    AUTH = None
+
+# Streaming village/taluk/district statistics over submitted lab reports
+ROLLUPS = RollupStore(os.environ.get('ROLLUP_DB_PATH', DEFAULT_ROLLUP_PATH),
+                      flush_interval=float(os.environ.get('ROLLUP_FLUSH_SECONDS', 1.0)))
+
+# Lab report responses memoized on their rounded N/P/K/pH, shared by every
+# worker through SQLite with a small in-process LRU in front
+MEMO = ResultCache(os.environ.get('MEMO_DB_PATH', DEFAULT_MEMO_PATH),
+                   max_entries=int(os.environ.get('MEMO_MAX_ENTRIES', 50000)),
+                   local_entries=int(os.environ.get('MEMO_LOCAL_ENTRIES', 1024)))
+
+# Rows scored per vectorized pass in bulk lab-report uploads
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 500))
+
+# Compressed bodies of responses whose handler set an ETag, reused until the content changes
+COMPRESSED_BODIES = CompressedBodies(int(os.environ.get('COMPRESSED_CACHE_ENTRIES', 512)))
+
+# Browser cache lifetime for data that only changes on redeploy or crop swap
+STATIC_MAX_AGE = 300
+
+# Soil model (model.tflite), reported alongside the rule-based analysis. Only
+# loaded when its feature spec ('<model>.json', from the training pipeline)
+# sits beside it; without one, responses carry no model_prediction at all.
+# Set MODEL_PATH to an empty string to turn it off
+MODEL = None
+MODEL_PATH = os.environ.get('MODEL_PATH', DEFAULT_MODEL_PATH)
+if MODEL_PATH and not os.path.exists(spec_path(MODEL_PATH)):
+    app.logger.info('No %s, analyses will not include a model prediction', spec_path(MODEL_PATH))
+elif MODEL_PATH:
+    try:
+        MODEL = InferenceEngine(
+            MODEL_PATH,
+            backend=os.environ.get('MODEL_BACKEND', 'auto'),
+            max_batch=int(os.environ.get('MODEL_MAX_BATCH', 64)),
+            max_wait=float(os.environ.get('MODEL_MAX_WAIT_MS', 5)) / 1000
+        )
+    except (OSError, ValueError) as e:
+        app.logger.warning('Model not loaded, analyses will not include a model prediction: %s', e)
 
 # ========== UTILITY FUNCTIONS ==========
 
+def crop_snapshot():
+    """Crop knowledge for this request, pinned so a hot swap never mixes versions"""
+    if has_request_context():
+        if 'crops' not in g:
+            g.crops = KNOWLEDGE.current
+        return g.crops
+    return KNOWLEDGE.current
+
 def calculate_soil_score(n, p, k, ph, organic_carbon=None):
     """Calculate soil health score 0-100"""
-    score = 0
-    
-    # Nitrogen (25 points)
-    if 180 <= n <= 300:
-        score += 25
-    elif 150 <= n < 180 or 300 < n <= 350:
-        score += 20
-    elif 120 <= n < 150 or 350 < n <= 400:
-        score += 15
-    else:
-        score += 10
-    
-    # Phosphorus (25 points)
-    if 30 <= p <= 50:
-        score += 25
-    elif 20 <= p < 30 or 50 < p <= 70:
-        score += 20
-    elif 15 <= p < 20 or 70 < p <= 90:
-        score += 15
-    else:
-        score += 10
-    
-    # Potassium (25 points)
-    if 150 <= k <= 250:
-        score += 25
-    elif 120 <= k < 150 or 250 < k <= 280:
-        score += 20
-    elif 100 <= k < 120 or 280 < k <= 300:
-        score += 15
-    else:
-        score += 10
-    
-    # pH (25 points)
-    if 6.0 <= ph <= 7.5:
-        score += 25
-    elif 5.5 <= ph < 6.0 or 7.5 < ph <= 8.0:
-        score += 20
-    elif 5.0 <= ph < 5.5 or 8.0 < ph <= 8.5:
-        score += 15
-    else:
-        score += 10
-    
-    return min(score, 100)
+    return int(soil_score_vector([{'ph': ph, 'nitrogen': n, 'phosphorus': p, 'potassium': k}])[0])
 
+@METRICS.timed('recommend_crops')
 def recommend_crops(soil_params):
     """Get crop recommendations based on soil parameters"""
-    n = soil_params['nitrogen']
-    p = soil_params['phosphorus']
-    k = soil_params['potassium']
-    ph = soil_params['ph']
-    
-    recommendations = []
-    
-    for crop_name, crop_data in CROP_DATABASE.items():
-        score = calculate_crop_suitability(crop_data['ideal_conditions'], soil_params)
-        
-        if score >= 70:
-            recommendations.append({
-                'crop': crop_name,
-                'confidence': score,
-                'details': crop_data
-            })
-    
-    # Sort by confidence
-    recommendations.sort(key=lambda x: x['confidence'], reverse=True)
-    
-    return recommendations[:5]  # Top 5 crops
+    return crops_from_scores(suitability_grid(crop_snapshot().matrix, [soil_params])[0])
+
+def model_prediction(soil_params):
+    """Model signal for one sample, micro-batched with concurrent requests (None without a model)"""
+    if MODEL is None:
+        return None
+    try:
+        return MODEL.predict(soil_params)
+    except Exception:
+        # The model is an extra signal; never fail the analysis over it
+        app.logger.exception('Model prediction error')
+        return None
+
+def model_predictions(soil_params_list):
+    """Model signals for many samples in one batched pass"""
+    if MODEL is None:
+        return [None] * len(soil_params_list)
+    try:
+        return MODEL.predict_batch(soil_params_list)
+    except Exception:
+        app.logger.exception('Model prediction error')
+        return [None] * len(soil_params_list)
+
+def with_model_prediction(result, prediction):
+    """Add the model signal to a response body when a model is loaded"""
+    if MODEL is not None:
+        result['model_prediction'] = prediction
+    return result
+
+def crops_from_scores(scores):
+    """Build recommendations from one row of the suitability grid"""
+    snapshot = crop_snapshot()
+    return [
+        {
+            'crop': snapshot.matrix.names[i],
+            'confidence': score,
+            'details': snapshot.crops[snapshot.matrix.names[i]]
+        }
+        for i, score in rank_crops(snapshot.matrix, scores)  # Top 5 crops
+    ]
 
 def calculate_crop_suitability(ideal, actual):
-    """Calculate how well soil matches crop requirements (0-100)"""
+    """Calculate how well soil matches crop requirements (0-100)
+    
+    Scalar reference for a single crop; recommend_crops scores the whole
+    database at once through crop_engine.suitability_grid.
+    """
     score = 0
     
     # Check pH match (40% weight)
@@ -233,53 +276,67 @@ def calculate_crop_suitability(ideal, actual):
     
     return min(100, score)
 
-def generate_fertilizer_plan(crop_name, soil_params, field_size=1):
-    """Generate fertilizer recommendation for crop"""
-    crop = CROP_DATABASE.get(crop_name)
-    if not crop:
+@METRICS.timed('generate_fertilizer_plan')
+def generate_fertilizer_plan(crop_name, soil_params, field_size=1, prices=None):
+    """Generate cheapest stage-wise fertilizer recommendation for crop"""
+    if crop_name not in crop_snapshot().crops:
         return None
     
-    n = soil_params['nitrogen']
-    p = soil_params['phosphorus']
-    k = soil_params['potassium']
-    
-    # Calculate deficiencies
-    ideal_n = (crop['ideal_conditions']['nitrogen'][0] + crop['ideal_conditions']['nitrogen'][1]) / 2
-    ideal_p = (crop['ideal_conditions']['phosphorus'][0] + crop['ideal_conditions']['phosphorus'][1]) / 2
-    ideal_k = (crop['ideal_conditions']['potassium'][0] + crop['ideal_conditions']['potassium'][1]) / 2
-    
-    n_deficit = max(0, ideal_n - n) * field_size
-    p_deficit = max(0, ideal_p - p) * field_size
-    k_deficit = max(0, ideal_k - k) * field_size
-    
-    plan = {
-        'stages': [
-            {
-                'stage': 'Before Sowing',
-                'fertilizers': [
-                    {'name': 'FYM', 'amount': f'{5 * field_size}-{7 * field_size} tonnes/hectare'},
-                    {'name': 'Urea', 'amount': f'{n_deficit * 0.5:.0f} kg/hectare'},
-                    {'name': 'DAP', 'amount': f'{p_deficit * 0.4:.0f} kg/hectare'},
-                    {'name': 'MOP', 'amount': f'{k_deficit * 0.3:.0f} kg/hectare'}
-                ]
-            },
-            {
-                'stage': '30 Days After Sowing',
-                'fertilizers': [
-                    {'name': 'Urea', 'amount': f'{n_deficit * 0.3:.0f} kg/hectare'}
-                ]
-            },
-            {
-                'stage': 'Flowering Stage',
-                'fertilizers': [
-                    {'name': 'Potash', 'amount': f'{k_deficit * 0.2:.0f} kg/hectare'}
-                ]
-            }
-        ],
-        'total_cost': f'₹{(n_deficit * 0.5 + p_deficit * 0.4 + k_deficit * 0.5) * 20:.0f}'
-    }
+    deficits = fertilizer_deficits([crop_name], [soil_params])
+    stages, cost = plan_fertilizer_batch(deficits, prices)
+    return plan_to_dict(stages, cost, 0, field_size)
+
+def fertilizer_deficits(crop_names, soil_params_list):
+    """kg/ha of N, P and K below each crop's ideal midpoint, one row per field"""
+    matrix = crop_snapshot().matrix
+    rows = [matrix.index[name] for name in crop_names]
+    actual = as_sample_matrix(soil_params_list)
+    # Columns 1-3 of the crop matrix are nitrogen, phosphorus, potassium
+    return np.clip(matrix.mid[rows, 1:] - actual[:, 1:], 0, None)
+
+# ========== RESPONSE LAYER ==========
+
+@app.after_request
+def finalize_response(response):
+    """Apply ?fields=, revalidate GETs by ETag and compress API responses"""
+    if response.direct_passthrough or response.is_streamed or not request.path.startswith('/api/'):
+        return response
+    
+    fields = request.args.get('fields')
+    if fields and response.status_code == 200 and response.is_json:
+        body = project(response.get_json(), parse_fields(fields))
+        response.set_data(app.json.dumps(body, separators=(',', ':')))
+        # The handler's ETag described the full body
+        response.headers.pop('ETag', None)
+    
+    # Handler ETags mark bodies served again and again (precomputed, memoized,
+    # static); only those are worth the slow compression and its cache
+    reused = bool(response.get_etag()[0])
     
-    return plan
+    if request.method in ('GET', 'HEAD') and response.status_code == 200:
+        if not reused:
+            response.set_etag(body_etag(response.get_data()))
+        if 'Cache-Control' not in response.headers:
+            # Cache, but revalidate: a 304 costs a few hundred bytes on 2G
+            response.headers['Cache-Control'] = 'no-cache'
+        response = response.make_conditional(request)
+    
+    if response.status_code != 200 or not (response.is_json or response.mimetype.startswith('text/')):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE or 'Content-Encoding' in response.headers:
+        return response
+    
+    etag, _ = response.get_etag()
+    # Our ETags are content hashes, so a cached body for the tag is this body
+    response.set_data(COMPRESSED_BODIES.get(etag, encoding, body) if reused else compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # Byte-level identity changed; the tag still matches If-None-Match weakly
+        response.set_etag(etag, weak=True)
+    return response
 
 # ========== API ENDPOINTS ==========
 
@@ -288,35 +345,108 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'Krishi Mitra API is running'})
 
+# (village store version, {taluk: static location data}); only the lab
+# report rollups change between requests
+_TALUK_LOCATIONS = (None, None)
+
+def taluk_locations():
+    """Villages and mean soil per taluk, rebuilt only when the village store changes"""
+    global _TALUK_LOCATIONS
+    version, locations = _TALUK_LOCATIONS
+    if version != VILLAGE_STORE.version:
+        version, locations = VILLAGE_STORE.version, {}
+        for taluk, taluk_name in VILLAGE_STORE.taluks.items():
+            means = VILLAGE_STORE.taluk_soil_means(taluk)
+            locations[taluk] = {
+                'name': taluk_name,
+                'villages': [v.slug for v in VILLAGE_STORE.in_taluk(taluk)],
+                'avg_soil': {
+                    key: round(means[key], 2)
+                    for key in ('ph', 'nitrogen', 'phosphorus', 'potassium')
+                }
+            }
+        _TALUK_LOCATIONS = version, locations
+    return locations
+
 @app.route('/api/locations/mysuru', methods=['GET'])
 def get_mysuru_locations():
     """Get hierarchical Mysuru location data"""
+    lab_reports = ROLLUPS.level('taluk')
+    taluks = {
+        taluk: dict(location, lab_reports=lab_reports[taluk].summary() if taluk in lab_reports else None)
+        for taluk, location in taluk_locations().items()
+    }
+    
+    response = jsonify({'taluks': taluks})
+    # Content ETag: unchanged rollups reuse the compressed body
+    response.set_etag(body_etag(response.get_data()))
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_MAX_AGE
+    return response
+
+@app.route('/api/locations/search', methods=['GET'])
+def search_locations():
+    """Autocomplete villages by name prefix or pincode"""
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    if not query:
+        return jsonify({'error': "Missing query parameter 'q'"}), 400
+    
     return jsonify({
-        'taluks': {
-            'mysuru_rural': {
-                'name': 'Mysuru Rural',
-                'villages': ['hebbal', 'hootagalli', 'srirampura'],
-                'avg_soil': {
-                    'ph': 6.5,
-                    'nitrogen': 250,
-                    'phosphorus': 38,
-                    'potassium': 185
-                }
-            }
-        }
+        'query': query,
+        'results': [v.summary() for v in VILLAGE_STORE.search(query, limit)]
     })
 
 @app.route('/api/analyze/location', methods=['POST'])
 def analyze_by_location():
-    """Analyze soil based on location"""
+    """Analyze soil based on location (village slug, or lat/lon with optional k)"""
     data = request.json
-    village = data.get('village', 'hebbal')
+    if data.get('lat') is not None and data.get('lon') is not None:
+        return analyze_by_coordinates(data)
     
-    if village not in MYSURU_LOCATIONS:
+    village = VILLAGE_STORE.get(data.get('village', 'hebbal'), data.get('taluk'))
+    
+    if village is None:
+        return jsonify({'error': 'Village not found'}), 404
+    
+    return precomputed_location_response(village)
+
+@app.route('/api/analyze/location/<village>', methods=['GET'])
+def get_location_analysis(village):
+    """Cacheable GET form of the location analysis, honors If-None-Match"""
+    village = VILLAGE_STORE.get(village, request.args.get('taluk'))
+    
+    if village is None:
         return jsonify({'error': 'Village not found'}), 404
     
-    location_data = MYSURU_LOCATIONS[village]
-    soil_params = location_data['avg_soil']
+    return precomputed_location_response(village)
+
+def analyze_by_coordinates(data):
+    """Resolve GPS coordinates to the nearest village, or blend the k nearest"""
+    try:
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+        k = int(data.get('k', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'lat, lon and k must be numbers'}), 400
+    
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 1 <= k <= MAX_GPS_NEIGHBOURS):
+        return jsonify({'error': f'lat/lon out of range or k not in 1-{MAX_GPS_NEIGHBOURS}'}), 400
+    
+    nearest = VILLAGE_STORE.nearest(lat, lon, k, MAX_NEAREST_KM)
+    if not nearest or nearest[0][1] > MAX_NEAREST_KM:
+        return jsonify({'error': f'No village within {MAX_NEAREST_KM} km'}), 404
+    
+    if k == 1:
+        village, distance = nearest[0]
+        response = precomputed_location_response(village)
+        response.headers['X-Village-Distance-Km'] = f'{distance:.2f}'
+        return response
+    
+    # Inverse-distance-weighted soil parameters across the neighbours
+    weights = idw_weights([distance for _, distance in nearest])
+    soil_params = VILLAGE_STORE.blended_soil_params([village for village, _ in nearest], weights)
     
     score = calculate_soil_score(
         soil_params['nitrogen'],
@@ -324,17 +454,56 @@ def analyze_by_location():
         soil_params['potassium'],
         soil_params['ph']
     )
-    
     crops = recommend_crops(soil_params)
     
-    return jsonify({
+    result = location_result(nearest[0][0], soil_params, score, crops, model_prediction(soil_params))
+    result['method'] = 'location_gps'
+    result['nearest_villages'] = [
+        dict(village.summary(), distance_km=round(distance, 2), weight=round(float(weight), 4))
+        for (village, distance), weight in zip(nearest, weights)
+    ]
+    return jsonify(result)
+
+def precomputed_location_response(village):
+    """Serve a village's pre-serialized analysis with its strong ETag"""
+    entry = LOCATION_RESULTS.get(village.id)
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    return response.make_conditional(request)
+
+def location_result(village, soil_params, score, crops, prediction=None):
+    """Assemble the location analysis response body"""
+    return with_model_prediction({
         'soil_score': score,
         'soil_params': soil_params,
+        'village': village.summary(),
         'grade': 'Good' if score >= 60 else 'Fair',
         'recommendations': crops,
         'method': 'location',
         'confidence': 'medium'
-    })
+    }, prediction)
+
+def build_location_results(ids=None):
+    """Score every village (or those with ids) in one vectorized pass and serialize each result"""
+    villages = VILLAGE_STORE.villages if ids is None else [VILLAGE_STORE.village(i) for i in ids]
+    params = [VILLAGE_STORE.soil_params(v) for v in villages]
+    scores = soil_score_vector(params)
+    grid = suitability_grid(crop_snapshot().matrix, params)
+    predictions = model_predictions(params)
+    
+    for village, soil_params, score, row_scores, prediction in zip(villages, params, scores, grid, predictions):
+        result = location_result(village, soil_params, int(score), crops_from_scores(row_scores), prediction)
+        yield village.id, (app.json.dumps(result, separators=(',', ':')) + '\n').encode('utf-8')
+
+# Per-village results, rebuilt when the crop snapshot is swapped or villages are added.
+# Up to PRECOMPUTED_LOCATIONS_MAX villages are all built before forking and
+# shared; a larger village file gets a per-process LRU of that size instead
+LOCATION_RESULTS = PrecomputedResponses(
+    build_location_results,
+    lambda: (crop_snapshot().digest, VILLAGE_STORE.version),
+    count=lambda: len(VILLAGE_STORE),
+    max_entries=int(os.environ.get('PRECOMPUTED_LOCATIONS_MAX', 10000))
+)
 
 @app.route('/api/analyze/assessment', methods=['POST'])
 def analyze_by_assessment():
@@ -353,61 +522,44 @@ def analyze_by_assessment():
     
     crops = recommend_crops(estimated_params)
     
-    return jsonify({
+    return jsonify(with_model_prediction({
         'soil_score': score,
         'soil_params': estimated_params,
         'grade': 'Good' if score >= 60 else 'Fair',
         'recommendations': crops,
         'method': 'assessment',
         'confidence': 'medium'
-    })
+    }, model_prediction(estimated_params)))
 
 def estimate_from_assessment(data):
     """Estimate NPK values from visual assessment"""
-    soil_color = data.get('soil_color', 'brown')
-    soil_texture = data.get('texture', 'loamy')
-    
-    # Base values
-    estimates = {
-        'red': {'n': 230, 'p': 35, 'k': 170, 'ph': 6.0},
-        'black': {'n': 180, 'p': 25, 'k': 270, 'ph': 7.5},
-        'brown': {'n': 250, 'p': 38, 'k': 190, 'ph': 6.5},
-        'yellow': {'n': 200, 'p': 30, 'k': 150, 'ph': 5.8}
-    }
-    
-    base = estimates.get(soil_color, estimates['brown'])
-    
-    # Adjust for texture
-    if soil_texture == 'clay':
-        base['k'] += 50
-    elif soil_texture == 'sandy':
-        base['n'] -= 30
-    
-    return {
-        'nitrogen': base['n'],
-        'phosphorus': base['p'],
-        'potassium': base['k'],
-        'ph': base['ph']
-    }
+    # Precompiled per color x texture; each call gets its own copy
+    return lookup_estimate(data.get('soil_color', 'brown'), data.get('texture', 'loamy'))
 
 @app.route('/api/analyze/lab-report', methods=['POST'])
 def analyze_lab_report():
-    """Analyze soil from lab report data"""
+    """Analyze soil from lab report data (optional 'village'/'taluk' feed the rollups)"""
     data = request.json
     
-    n = float(data.get('nitrogen', 0))
-    p = float(data.get('phosphorus', 0))
-    k = float(data.get('potassium', 0))
-    ph = float(data.get('ph', 7.0))
+    try:
+        soil_params = parse_lab_params(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid lab report: {e}'}), 400
+    record_lab_samples([data], [soil_params])
     
-    soil_params = {
-        'nitrogen': n,
-        'phosphorus': p,
-        'potassium': k,
-        'ph': ph
-    }
+    # Resubmitted cards (same rounded values, same crop database) skip the analysis
+    key, version = canonical_key('lab-report', soil_params), memo_version()
+    cached = MEMO.get(key, version)
+    METRICS.inc('memo_lookups_total', ('lab_report', cached[2] if cached else 'miss'))
+    if cached is not None:
+        return memoized_response(*cached[:2])
     
-    score = calculate_soil_score(n, p, k, ph)
+    score = calculate_soil_score(
+        soil_params['nitrogen'],
+        soil_params['phosphorus'],
+        soil_params['potassium'],
+        soil_params['ph']
+    )
     crops = recommend_crops(soil_params)
     
     # Generate fertilizer plan for top crop
@@ -415,7 +567,69 @@ def analyze_lab_report():
     if crops:
         fertilizer_plan = generate_fertilizer_plan(crops[0]['crop'], soil_params)
     
-    return jsonify({
+    prediction = model_prediction(soil_params)
+    response = jsonify(lab_report_result(soil_params, score, crops, fertilizer_plan, prediction))
+    body = response.get_data()
+    response.set_etag(body_etag(body))
+    # A failed model call is not the answer for these inputs; don't keep it
+    if prediction is not None or MODEL is None:
+        MEMO.put(key, version, response.get_etag()[0], body)
+    return response
+
+def memo_version():
+    """Everything a memoized analysis depends on besides its inputs"""
+    return f"{crop_snapshot().digest}:{MODEL.version if MODEL is not None else 'no-model'}"
+
+def memoized_response(etag, body):
+    """Cached JSON body with its content ETag (so its compressed form is cached too)"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+def parse_lab_params(data):
+    """Read N, P, K and pH from a lab report row, rounded to lab precision
+    
+    Raises ValueError for values float() accepts but JSON cannot carry back
+    ('nan', 'inf').
+    """
+    soil_params = {
+        'nitrogen': float(data.get('nitrogen', 0)),
+        'phosphorus': float(data.get('phosphorus', 0)),
+        'potassium': float(data.get('potassium', 0)),
+        'ph': float(data.get('ph', 7.0))
+    }
+    if not all(math.isfinite(value) for value in soil_params.values()):
+        raise ValueError('nitrogen, phosphorus, potassium and ph must be finite numbers')
+    return quantize(soil_params)
+
+def rollup_keys(data):
+    """(level, key) rollups a lab report counts towards, from its village or taluk"""
+    taluk = data.get('taluk')
+    if data.get('village'):
+        village = VILLAGE_STORE.get(str(data['village']), taluk)
+        if village is None:
+            return ()
+        return (('village', f'{village.taluk}/{village.slug}'), ('taluk', village.taluk),
+                ('district', slugify(village.district or '')))
+    district = VILLAGE_STORE.district(str(taluk)) if taluk else None
+    if district is None:
+        return ()
+    return ('taluk', slugify(taluk)), ('district', slugify(district))
+
+def record_lab_samples(rows, soil_params_list):
+    """Fold located, plausible lab samples into the rollups, one batch per location"""
+    groups = {}
+    for data, soil_params in zip(rows, soil_params_list):
+        sample = sample_row(soil_params)
+        keys = rollup_keys(data)
+        if sample is not None and keys:
+            groups.setdefault(keys, []).append(sample)
+    for keys, samples in groups.items():
+        ROLLUPS.add(keys, samples)
+
+def lab_report_result(soil_params, score, crops, fertilizer_plan, prediction=None):
+    """Assemble the lab report response body"""
+    return with_model_prediction({
         'soil_score': score,
         'soil_params': soil_params,
         'grade': 'Excellent' if score >= 80 else ('Good' if score >= 60 else 'Fair'),
@@ -423,20 +637,386 @@ def analyze_lab_report():
         'fertilizer_plan': fertilizer_plan,
         'method': 'lab_report',
         'confidence': 'high'
+    }, prediction)
+
+def analyze_lab_rows(rows, first_row=0):
+    """Score a chunk of lab report rows in one vectorized pass, one result per row"""
+    results = [None] * len(rows)
+    valid = []
+    
+    for i, data in enumerate(rows):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('row must be an object')
+            valid.append((i, parse_lab_params(data)))
+        except (TypeError, ValueError) as e:
+            results[i] = {'error': f'Invalid row: {e}'}
+    
+    if valid:
+        params = [soil_params for _, soil_params in valid]
+        scores = soil_score_vector(params)
+        grid = suitability_grid(crop_snapshot().matrix, params)
+        crops = [crops_from_scores(row_scores) for row_scores in grid]
+        
+        # One batched fertilizer solve for every row's top crop
+        planned = [j for j, row_crops in enumerate(crops) if row_crops]
+        if planned:
+            stages, cost = plan_fertilizer_batch(fertilizer_deficits(
+                [crops[j][0]['crop'] for j in planned], [params[j] for j in planned]))
+        plans = {j: plan_to_dict(stages, cost, row) for row, j in enumerate(planned)}
+        predictions = model_predictions(params)
+        record_lab_samples([rows[i] for i, _ in valid], params)
+        
+        for j, ((i, soil_params), score) in enumerate(zip(valid, scores)):
+            results[i] = lab_report_result(soil_params, int(score), crops[j], plans.get(j), predictions[j])
+    
+    for i, (data, result) in enumerate(zip(rows, results)):
+        line = {'row': first_row + i}
+        if isinstance(data, dict) and 'sample_id' in data:
+            line['sample_id'] = data['sample_id']
+        line.update(result)
+        yield line
+
+@app.route('/api/analyze/lab-report/batch', methods=['POST'])
+def analyze_lab_report_batch():
+    """Analyze many lab report rows, streaming one NDJSON result line per row
+    
+    Accepts a JSON array, NDJSON or CSV body, or any of those as a multipart
+    'file' upload.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': "Missing 'file' upload"}), 400
+        # Detach the spooled upload so request teardown does not close it
+        # before the response body has been streamed
+        stream, upload.stream = upload.stream, io.BytesIO()
+        fmt = detect_format(upload.mimetype, upload.filename)
+    else:
+        stream = binary_stream(request.stream)
+        fmt = detect_format(request.mimetype)
+    
+    if fmt is None:
+        return jsonify({'error': 'Unsupported format, send JSON array, NDJSON or CSV'}), 415
+    
+    failure = []
+    
+    def rows():
+        try:
+            yield from READERS[fmt](stream)
+        except ValueError as e:
+            failure.append(str(e))
+    
+    def generate():
+        row = 0
+        try:
+            for chunk in chunked(rows(), BATCH_CHUNK_SIZE):
+                for line in analyze_lab_rows(chunk, row):
+                    yield app.json.dumps(line) + '\n'
+                row += len(chunk)
+            if failure:
+                # Malformed input ends the stream; rows already sent stand
+                yield app.json.dumps({'row': row, 'error': failure[0], 'fatal': True}) + '\n'
+        finally:
+            stream.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/analyze/what-if', methods=['POST'])
+def analyze_what_if():
+    """Soil score and crop suitability over ranges of N, P, K and pH around a base sample
+    
+    Body: {'base': {nitrogen, phosphorus, potassium, ph},
+           'ranges': {param: {'min', 'max', 'step'}, ...}}
+    Returns the base analysis, score and suitability surfaces over the grid
+    of every range (one dimension per entry of 'axes', in pH, N, P, K order),
+    and for each varied input the values where the recommended crop ranking
+    changes with the others held at the base.
+    """
+    data = request.get_json(silent=True)
+    base, ranges = (data.get('base'), data.get('ranges')) if isinstance(data, dict) else (None, None)
+    
+    if not isinstance(base, dict) or not isinstance(ranges, dict) or not ranges:
+        return jsonify({'error': "Expected a 'base' sample and a non-empty 'ranges' object"}), 400
+    unknown = sorted(set(ranges) - set(DECIMALS))
+    if unknown:
+        return jsonify({'error': f'Unknown inputs {unknown}, ranges may vary {list(DECIMALS)}'}), 400
+    
+    try:
+        base = parse_lab_params(base)
+    except (TypeError, ValueError):
+        return jsonify({'error': "'base' needs numeric nitrogen, phosphorus, potassium and ph"}), 400
+    try:
+        # Fixed dimension order; JSON object key order is not reliable
+        axes = {param: parse_what_if_range(param, ranges[param]) for param in NUTRIENTS if param in ranges}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if grid_size(axes) > MAX_GRID_POINTS:
+        return jsonify({'error': f'Grid has {grid_size(axes)} points, at most {MAX_GRID_POINTS} allowed'}), 400
+    
+    matrix = crop_snapshot().matrix
+    score, base_scores, scores, suitability, flips = what_if(matrix, base, axes)
+    
+    return jsonify({
+        'base': dict(base, soil_score=score, recommendations=[
+            {'crop': matrix.names[i], 'confidence': confidence} for i, confidence in rank_crops(matrix, base_scores)
+        ]),
+        'axes': [{'param': param, 'values': values.tolist()} for param, values in axes.items()],
+        'crops': list(matrix.names),
+        'soil_score': scores.tolist(),
+        'suitability': {name: np.round(suitability[..., j], 1).tolist() for j, name in enumerate(matrix.names)},
+        'flips': {
+            param: [
+                {
+                    'between': [axes[param][i].item(), axes[param][i + 1].item()],
+                    'at': round(at, DECIMALS[param] + 3),
+                    'from': [matrix.names[c] for c in before],
+                    'to': [matrix.names[c] for c in after]
+                }
+                for i, at, before, after in param_flips
+            ]
+            for param, param_flips in flips.items()
+        }
     })
 
+def parse_what_if_range(param, spec):
+    """Grid values for one what-if range; ValueError with a message if out of bounds"""
+    try:
+        low, high, step = float(spec['min']), float(spec['max']), float(spec['step'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{param} range needs numeric 'min', 'max' and 'step'")
+    if not 0 <= low <= high <= ROLLUP_PARAMS[param]:
+        raise ValueError(f'{param} range must satisfy 0 <= min <= max <= {ROLLUP_PARAMS[param]:g}')
+    # Finer steps than lab precision would only repeat values after rounding
+    if not 10 ** -DECIMALS[param] <= step < np.inf:
+        raise ValueError(f'{param} step must be at least {10 ** -DECIMALS[param]:g}')
+    return axis_values(low, high, step, DECIMALS[param])
+
+@app.route('/api/rollups/<level>', methods=['GET'])
+def get_rollups(level):
+    """Lab report statistics for every village, taluk or district with samples"""
+    if level not in LEVELS:
+        return jsonify({'error': f'level must be one of {list(LEVELS)}'}), 404
+    return jsonify({key: rollup.summary() for key, rollup in sorted(ROLLUPS.level(level).items())})
+
+@app.route('/api/rollups/<level>/<path:key>', methods=['GET'])
+def get_rollup(level, key):
+    """Lab report statistics for one village ('taluk/village'), taluk or district"""
+    if level not in LEVELS:
+        return jsonify({'error': f'level must be one of {list(LEVELS)}'}), 404
+    rollup = ROLLUPS.get(level, key)
+    if rollup is None:
+        return jsonify({'error': 'No lab reports for this location'}), 404
+    return jsonify(dict(rollup.summary(), level=level, key=key))
+
+@app.route('/api/fertilizer/plan/batch', methods=['POST'])
+def plan_fertilizer_for_fields():
+    """Cheapest fertilizer plans for many fields in one solve, with procurement totals"""
+    data = request.get_json(silent=True) or {}
+    fields = data.get('fields')
+    prices = data.get('prices') or {}
+    
+    if not isinstance(fields, list) or not fields:
+        return jsonify({'error': "Expected a non-empty 'fields' list"}), 400
+    if not isinstance(prices, dict) or any(
+            name not in DEFAULT_PRICES or not is_finite_number(price) or price < 0
+            for name, price in prices.items()):
+        return jsonify({'error': f'prices must map {sorted(DEFAULT_PRICES)} to non-negative numbers'}), 400
+    
+    try:
+        crops = [field['crop'] for field in fields]
+        soil_params = [parse_lab_params(field) for field in fields]
+        field_sizes = [float(field.get('field_size', 1)) for field in fields]
+        fym_tonnes = float(data.get('fym_tonnes', 5))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({'error': "Each field needs 'crop' and numeric nitrogen, phosphorus, potassium"}), 400
+    if not all(math.isfinite(value) and value >= 0 for value in field_sizes + [fym_tonnes]):
+        return jsonify({'error': 'field_size and fym_tonnes must be non-negative numbers'}), 400
+    
+    unknown = sorted(set(crops) - set(crop_snapshot().crops))
+    if unknown:
+        return jsonify({'error': f'Unknown crops: {unknown}'}), 404
+    
+    stages, cost = plan_fertilizer_batch(fertilizer_deficits(crops, soil_params), prices, fym_tonnes)
+    plans = []
+    for i, field in enumerate(fields):
+        plan = plan_to_dict(stages, cost, i, field_sizes[i])
+        plan['crop'] = crops[i]
+        if 'id' in field:
+            plan['id'] = field['id']
+        plans.append(plan)
+    
+    return jsonify({
+        'plans': plans,
+        'procurement_kg': procurement_totals(stages, field_sizes),
+        'total_cost_inr': round(float(np.dot(cost, field_sizes)))
+    })
+
+def is_finite_number(value):
+    """A JSON number that is not NaN or infinite (booleans are ints to Python, not here)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+@app.route('/api/weather/<lat>/<lon>', methods=['GET'])
+def get_weather(lat, lon):
+    """Current weather for the grid cell containing lat/lon"""
+    if WEATHER is None:
+        return jsonify({'error': 'Weather service not configured'}), 503
+    
+    try:
+        lat, lon = float(lat), float(lon)
+    except ValueError:
+        return jsonify({'error': 'lat and lon must be numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat/lon out of range'}), 400
+    
+    try:
+        weather, centre, status, seconds_left = WEATHER.get(lat, lon)
+    except Exception as e:
+        app.logger.warning('Weather upstream error: %s', e)
+        return jsonify({'error': 'Weather upstream unavailable'}), 502
+    
+    response = jsonify(dict(weather, cell={'lat': centre[0], 'lon': centre[1]}))
+    response.headers['X-Cache'] = status
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(seconds_left))
+    return response
+
+def check_user(user_id):
+    """Error response unless the request's Firebase ID token is user_id's (None if it is)"""
+    if AUTH is None:
+        return jsonify({'error': 'Sign-in verification not configured'}), 503
+    try:
+        uid = AUTH.uid(request.headers.get('Authorization'))
+    except Exception as e:
+        app.logger.warning('Firebase token verification unavailable: %s', e)
+        return jsonify({'error': 'Sign-in verification unavailable'}), 503
+    if uid is None:
+        return jsonify({'error': "Missing or invalid 'Authorization: Bearer <Firebase ID token>'"}), 401
+    if uid != str(user_id):
+        return jsonify({'error': 'Signed in as a different user'}), 403
+    return None
+
+@app.route('/api/save-analysis', methods=['POST'])
+def save_analysis():
+    """Save an analysis to the farmer's history"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid or missing JSON body'}), 400
+    
+    user_id = data.get('userId') or data.get('user_id') or data.get('uid')
+    if not user_id:
+        return jsonify({'error': 'Missing userId'}), 400
+    denied = check_user(user_id)
+    if denied:
+        return denied
+    
+    score = data.get('soil_score', data.get('score'))
+    try:
+        score = float(score) if score is not None else None
+    except (TypeError, ValueError):
+        score = None
+    
+    analysis_id, created_at = HISTORY.save(str(user_id), data.get('method'), score, data)
+    return jsonify({'id': analysis_id, 'createdAt': created_at}), 201
+
+@app.route('/api/history/<user_id>', methods=['GET'])
+def get_history(user_id):
+    """Newest-first page of a farmer's analyses; next page cursor in X-Next-Cursor"""
+    denied = check_user(user_id)
+    if denied:
+        return denied
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), HISTORY_PAGE_MAX))
+    include_result = request.args.get('full') == '1'
+    
+    try:
+        items, next_cursor = HISTORY.page(user_id, limit, request.args.get('before'), include_result)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/history/<user_id>/<int:analysis_id>', methods=['GET'])
+def get_history_item(user_id, analysis_id):
+    """One saved analysis with its full result"""
+    denied = check_user(user_id)
+    if denied:
+        return denied
+    
+    item = HISTORY.get(user_id, analysis_id)
+    if item is None:
+        return jsonify({'error': 'Analysis not found'}), 404
+    return jsonify(item)
+
 @app.route('/api/crops/recommendations', methods=['POST'])
 def get_crop_recommendations():
     """Get detailed crop recommendations"""
     data = request.json
     crop = data.get('crop')
     
-    if crop in CROP_DATABASE:
-        return jsonify(CROP_DATABASE[crop])
+    crops = crop_snapshot().crops
+    if crop in crops:
+        response = jsonify(crops[crop])
+        response.set_etag(body_etag(response.get_data()))
+        return response
     
     return jsonify({'error': 'Crop not found'}), 404
 
+@app.route('/api/crops/recommendations/<crop>', methods=['GET'])
+def get_crop_details(crop):
+    """Cacheable GET form of the crop details, honors If-None-Match"""
+    crops = crop_snapshot().crops
+    if crop not in crops:
+        return jsonify({'error': 'Crop not found'}), 404
+    
+    response = jsonify(crops[crop])
+    response.set_etag(body_etag(response.get_data()))
+    response.cache_control.public = True
+    response.cache_control.max_age = STATIC_MAX_AGE
+    return response
+
+@app.route('/api/crops/snapshot', methods=['GET'])
+def get_crop_snapshot_version():
+    """Current crop knowledge version and the immutable URL to fetch it from"""
+    snapshot = crop_snapshot()
+    response = jsonify({'version': snapshot.digest, 'url': f'/api/crops/snapshot/{snapshot.digest}'})
+    # Tiny and always revalidated; the snapshot itself is cached forever
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/crops/snapshot/<digest>', methods=['GET'])
+def get_crop_snapshot(digest):
+    """Binary crop knowledge snapshot addressed by its content hash"""
+    snapshot = crop_snapshot()
+    if digest != snapshot.digest:
+        return jsonify({'error': 'Unknown snapshot version', 'current': snapshot.digest}), 404
+    
+    response = Response(snapshot.data, mimetype='application/octet-stream')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(snapshot.digest)
+    return response.make_conditional(request)
+
+def warm_caches():
+    """Build every derived table up front so the first requests are already warm"""
+    VILLAGE_STORE.spatial
+    LOCATION_RESULTS.refresh()
+
+def create_app():
+    """App factory for production servers
+    
+    gunicorn calls this once in the master (preload_app), so the crop matrix,
+    village store and precomputed results are built before forking and shared
+    copy-on-write by every worker.
+    """
+    warm_caches()
+    return app
+
 if __name__ == '__main__':
+    warm_caches()
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
     
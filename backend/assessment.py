@@ -0,0 +1,163 @@
+"""
+KRISHI MITRA - Visual Soil Assessment Rules
+One declarative table for both assessment paths (main.py's advice and the
+API's NPK estimate), compiled at import into frozen lookups over every
+color x texture x drainage x moisture combination
+"""
+
+from collections import namedtuple
+from itertools import product
+from types import MappingProxyType
+
+# property -> value -> rule. Every field is optional:
+#   advice    sentence added to the assessment text
+#   crops     crops this property favours (ties keep table order)
+#   tip       practical tip
+#   estimate  base N/P/K/pH for a soil color
+#   adjust    change to the estimate for a texture
+ASSESSMENT_RULES = {
+    'color': {
+        'black': {
+            'advice': 'Black soil indicates high organic matter and fertility. Excellent for most crops.',
+            'crops': ('Rice', 'Sugarcane', 'Cotton'),
+            'tip': 'Black soil is highly fertile - use balanced fertilization',
+            'estimate': {'nitrogen': 180, 'phosphorus': 25, 'potassium': 270, 'ph': 7.5},
+        },
+        'brown': {
+            'advice': 'Brown soil shows good organic matter content. Suitable for most agricultural crops.',
+            'estimate': {'nitrogen': 250, 'phosphorus': 38, 'potassium': 190, 'ph': 6.5},
+        },
+        'red': {
+            'advice': 'Red soil indicates iron oxide presence. May need pH adjustment and organic matter addition.',
+            'crops': ('Groundnut', 'Ragi', 'Sunflower'),
+            'tip': 'Red soil may need lime application to adjust pH',
+            'estimate': {'nitrogen': 230, 'phosphorus': 35, 'potassium': 170, 'ph': 6.0},
+        },
+        'yellow': {
+            'advice': 'Yellow soil suggests leaching of nutrients. Requires fertilization and organic matter.',
+            'crops': ('Maize', 'Soybean', 'Wheat'),
+            'tip': 'Yellow soil needs organic matter and proper fertilization',
+            'estimate': {'nitrogen': 200, 'phosphorus': 30, 'potassium': 150, 'ph': 5.8},
+        },
+        'gray': {
+            'advice': 'Gray soil may indicate poor drainage or waterlogging. Needs drainage improvement.',
+        },
+    },
+    'texture': {
+        'clay': {
+            'advice': 'Clay soil has good water retention but poor drainage. Add organic matter and sand for better structure.',
+            'crops': ('Rice', 'Wheat', 'Sugarcane'),
+            'tip': 'Clay soil benefits from deep plowing and organic matter addition',
+            'adjust': {'potassium': 50},
+        },
+        'sandy': {
+            'advice': 'Sandy soil drains well but has poor water retention. Add organic matter and clay for better fertility.',
+            'crops': ('Groundnut', 'Sunflower', 'Pearl Millet'),
+            'tip': 'Sandy soil needs frequent irrigation and organic matter',
+            'adjust': {'nitrogen': -30},
+        },
+        'loamy': {
+            'advice': 'Loamy soil is ideal for most crops. Maintain organic matter content for optimal productivity.',
+            'crops': ('Maize', 'Soybean', 'Vegetables'),
+            'tip': 'Loamy soil is ideal - maintain organic matter content',
+        },
+        'silty': {
+            'advice': 'Silty soil has moderate drainage and fertility. Add organic matter to improve structure.',
+        },
+    },
+    'drainage': {
+        'good': {
+            'advice': 'Good drainage prevents waterlogging and root diseases. Maintain proper field drainage.',
+            'tip': 'Maintain good drainage with proper field leveling',
+        },
+        'moderate': {
+            'advice': 'Moderate drainage may cause occasional waterlogging. Improve field drainage systems.',
+        },
+        'poor': {
+            'advice': 'Poor drainage can cause root rot and nutrient leaching. Install proper drainage systems.',
+            'tip': 'Install proper drainage systems to prevent waterlogging',
+        },
+    },
+    'moisture': {
+        'dry': {
+            'advice': 'Dry soil needs irrigation management and mulching to retain moisture.',
+            'tip': 'Implement mulching and drip irrigation for water conservation',
+        },
+        'moist': {
+            'advice': 'Moist soil is ideal for most crops. Maintain consistent moisture levels.',
+        },
+        'wet': {
+            'advice': 'Wet soil may cause root diseases. Improve drainage and avoid over-irrigation.',
+            'tip': 'Improve drainage and avoid over-irrigation',
+        },
+    },
+}
+
+# Order properties are read in; advice and tips follow it
+PROPERTIES = ('color', 'texture', 'drainage', 'moisture')
+
+# Estimates fall back to this color when the color is unknown or has none
+DEFAULT_ESTIMATE_COLOR = 'brown'
+
+MAX_RECOMMENDATIONS = 3
+
+Assessment = namedtuple('Assessment', 'advice recommendations tips')
+
+
+def _rank_crops(rules):
+    # Crops favoured by more properties first, then in table order
+    votes = {}
+    for rule in rules:
+        for crop in rule.get('crops', ()):
+            votes[crop] = votes.get(crop, 0) + 1
+    ranked = sorted(votes, key=lambda crop: -votes[crop])  # sorted() is stable
+    return tuple(ranked[:MAX_RECOMMENDATIONS])
+
+
+def compile_assessments(rules=ASSESSMENT_RULES):
+    """Frozen {(color, texture, drainage, moisture): Assessment}
+
+    Unknown values are keyed as None, so every input resolves with one lookup.
+    """
+    table = {}
+    for key in product(*[(*rules[prop], None) for prop in PROPERTIES]):
+        matched = [rules[prop][value] for prop, value in zip(PROPERTIES, key) if value is not None]
+        table[key] = Assessment(
+            advice=' '.join(rule['advice'] for rule in matched if rule.get('advice')),
+            recommendations=_rank_crops(matched),
+            tips=tuple(rule['tip'] for rule in matched if rule.get('tip')),
+        )
+    return MappingProxyType(table)
+
+
+def compile_estimates(rules=ASSESSMENT_RULES):
+    """Frozen {(color, texture): estimate} with texture adjustments applied"""
+    default = rules['color'][DEFAULT_ESTIMATE_COLOR]['estimate']
+    table = {}
+    for color, texture in product((*rules['color'], None), (*rules['texture'], None)):
+        estimate = dict(rules['color'].get(color, {}).get('estimate', default))
+        for param, delta in rules['texture'].get(texture, {}).get('adjust', {}).items():
+            estimate[param] += delta
+        table[color, texture] = MappingProxyType(estimate)
+    return MappingProxyType(table)
+
+
+ASSESSMENTS = compile_assessments()
+ESTIMATES = compile_estimates()
+
+
+def _known(prop, value):
+    return value if isinstance(value, str) and value in ASSESSMENT_RULES[prop] else None
+
+
+def lookup_assessment(color, texture, drainage, moisture):
+    """Precompiled Assessment for one combination (unknown values ignored)"""
+    return ASSESSMENTS[
+        _known('color', color), _known('texture', texture),
+        _known('drainage', drainage), _known('moisture', moisture)
+    ]
+
+
+def lookup_estimate(color, texture):
+    """Estimated soil parameters as a new dict the caller may modify"""
+    return dict(ESTIMATES[_known('color', color), _known('texture', texture)])
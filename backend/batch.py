@@ -0,0 +1,193 @@
+"""
+KRISHI MITRA - Batch Input Readers
+Incremental readers for bulk lab-report uploads (JSON array, NDJSON, CSV)
+so large batches never have to sit in memory at once
+"""
+
+import csv
+import io
+import json
+from itertools import islice
+
+READ_SIZE = 64 * 1024
+
+# Largest JSON array item or NDJSON line accepted (characters); a lab
+# report row is ~200
+MAX_ITEM_SIZE = 1024 * 1024
+
+# A decode error this far before the end of the buffer cannot be a value
+# cut off at a chunk boundary (longest truncated token: a surrogate pair escape)
+TRUNCATION_MARGIN = 16
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+def detect_format(mimetype, filename=None):
+    """Pick 'json', 'ndjson' or 'csv' from a content type or file name"""
+    mimetype = (mimetype or '').lower()
+    filename = (filename or '').lower()
+
+    if mimetype in NDJSON_TYPES or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if mimetype in CSV_TYPES or filename.endswith('.csv'):
+        return 'csv'
+    if mimetype == 'application/json' or filename.endswith('.json'):
+        return 'json'
+    return None
+
+
+class _ReadOnly(io.RawIOBase):
+    """io wrapper for WSGI input streams that only implement read()"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def binary_stream(stream):
+    """A closable, buffered file object for a WSGI input stream
+
+    Werkzeug hands over the server's own input object when the server marks
+    it terminated (gunicorn does), and that object has read() but not the
+    rest of the io interface that TextIOWrapper needs.
+    """
+    if isinstance(stream, io.IOBase):
+        return stream
+    return io.BufferedReader(_ReadOnly(stream), READ_SIZE)
+
+
+def _text(stream):
+    """Decode a binary stream lazily"""
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_json_array(stream, read_size=READ_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """Yield the items of a top-level JSON array without loading it whole
+
+    A malformed item fails as soon as the error is in the buffer, and an
+    item longer than max_item_size fails without reading further.
+    """
+    text = _text(stream)
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        # Drop consumed input so the buffer stays about one chunk wide
+        nonlocal buf, pos, eof
+        chunk = text.read(read_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+    def check_size():
+        if len(buf) - pos > max_item_size:
+            raise ValueError(f'JSON array item longer than {max_item_size} characters')
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buf[pos:pos + 1] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+    skip_whitespace()
+    if buf[pos:pos + 1] == ']':
+        return
+
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                truncated = e.pos >= len(buf) - TRUNCATION_MARGIN or e.msg.startswith('Unterminated string')
+                if eof or not truncated:
+                    raise ValueError('Malformed JSON array item')
+                check_size()
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # A trailing value may continue in the next chunk
+                check_size()
+                fill()
+                continue
+            break
+
+        yield item
+        pos = end
+        skip_whitespace()
+        separator = buf[pos:pos + 1]
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError('Expected "," or "]" after array item')
+
+
+def iter_ndjson(stream, max_line_size=MAX_ITEM_SIZE):
+    """Yield one JSON value per non-blank line; a line over max_line_size fails unread"""
+    text = _text(stream)
+    lineno = 0
+    while True:
+        # Bounded read, so one endless line cannot fill memory
+        line = text.readline(max_line_size + 1)
+        if not line:
+            return
+        lineno += 1
+        if len(line) > max_line_size and not line.endswith('\n'):
+            raise ValueError(f'Line {lineno} longer than {max_line_size} characters')
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError(f'Malformed JSON on line {lineno}')
+
+
+def iter_csv(stream):
+    """Yield one dict per CSV row, keyed by the header row"""
+    rows = csv.DictReader(_text(stream))
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # e.g. a field over csv.field_size_limit(); callers handle ValueError
+            raise ValueError(f'Malformed CSV on line {rows.line_num}: {e}')
+        yield {key.strip().lower(): value for key, value in row.items() if key}
+
+
+READERS = {
+    'json': iter_json_array,
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
+
+
+def chunked(iterable, size):
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,131 @@
+"""
+KRISHI MITRA - Crop Suitability Engine
+Compiles the crop database into ideal-range matrices and scores
+(n_samples x n_crops) grids in one vectorized pass
+"""
+
+import numpy as np
+
+# Column order shared by sample matrices and crop matrices
+NUTRIENTS = ('ph', 'nitrogen', 'phosphorus', 'potassium')
+
+# ========== SUITABILITY RULES ==========
+
+# Per-nutrient suitability rule: full weight inside the ideal range, otherwise
+# weight - distance * mul / div, never below the floor.
+# pH measures distance to the nearest edge, nutrients to the range midpoint.
+SUITABILITY_RULES = (
+    # (weight, mul, div, floor, distance_to)
+    (40, 10, 1, 0, 'edge'),   # ph
+    (20, 1, 10, 5, 'mid'),    # nitrogen
+    (20, 1, 1, 5, 'mid'),     # phosphorus
+    (20, 1, 10, 5, 'mid'),    # potassium
+)
+
+# ========== SOIL HEALTH BANDS ==========
+
+# Nested closed bands per nutrient, innermost first. A value in the first band
+# earns 25 points, the second 20, the third 15, anything else 10.
+SOIL_SCORE_BANDS = {
+    'ph': ((6.0, 7.5), (5.5, 8.0), (5.0, 8.5)),
+    'nitrogen': ((180, 300), (150, 350), (120, 400)),
+    'phosphorus': ((30, 50), (20, 70), (15, 90)),
+    'potassium': ((150, 250), (120, 280), (100, 300)),
+}
+SOIL_SCORE_POINTS = (25, 20, 15, 10)
+
+
+class CropMatrix:
+    """Array-backed view of the crop database"""
+
+    def __init__(self, names, low, high):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.low = low
+        self.high = high
+        # Same arithmetic as sum(ideal) / 2 in the scalar path
+        self.mid = (low + high) / 2
+
+    def __len__(self):
+        return len(self.names)
+
+
+def compile_crop_database(crop_database):
+    """Build a CropMatrix from a CROP_DATABASE-style dict"""
+    names = list(crop_database)
+    low = np.empty((len(names), len(NUTRIENTS)), dtype=np.float64)
+    high = np.empty_like(low)
+
+    for i, name in enumerate(names):
+        ideal = crop_database[name]['ideal_conditions']
+        for j, nutrient in enumerate(NUTRIENTS):
+            low[i, j], high[i, j] = ideal[nutrient]
+
+    return CropMatrix(names, low, high)
+
+
+def as_sample_matrix(samples):
+    """Stack soil param dicts (or an array) into an (n_samples x 4) float matrix"""
+    if isinstance(samples, np.ndarray):
+        return np.atleast_2d(samples).astype(np.float64, copy=False)
+    return np.array(
+        [[float(s[nutrient]) for nutrient in NUTRIENTS] for s in samples],
+        dtype=np.float64
+    ).reshape(-1, len(NUTRIENTS))
+
+
+# ========== KERNELS ==========
+
+def suitability_grid(matrix, samples):
+    """Score every sample against every crop, returns (n_samples x n_crops)"""
+    x = as_sample_matrix(samples)[:, None, :]
+    low = matrix.low[None, :, :]
+    high = matrix.high[None, :, :]
+    inside = (low <= x) & (x <= high)
+
+    total = np.zeros((x.shape[0], len(matrix)), dtype=np.float64)
+    # Accumulate in the same order as the scalar path so results match bit for bit
+    for j, (weight, mul, div, floor, distance_to) in enumerate(SUITABILITY_RULES):
+        xj = x[..., j]
+        if distance_to == 'edge':
+            dist = np.minimum(np.abs(xj - low[..., j]), np.abs(xj - high[..., j]))
+        else:
+            dist = np.abs(xj - matrix.mid[None, :, j])
+        partial = np.maximum(floor, weight - dist * mul / div)
+        total += np.where(inside[..., j], weight, partial)
+
+    return np.minimum(100, total)
+
+
+def soil_score_vector(samples):
+    """Soil health score 0-100 for every sample, returns (n_samples,)"""
+    x = as_sample_matrix(samples)
+    score = np.zeros(x.shape[0], dtype=np.int64)
+
+    for j, nutrient in enumerate(NUTRIENTS):
+        xj = x[:, j]
+        conditions = [(lo <= xj) & (xj <= hi) for lo, hi in SOIL_SCORE_BANDS[nutrient]]
+        score += np.select(conditions, SOIL_SCORE_POINTS[:-1], SOIL_SCORE_POINTS[-1])
+
+    return np.minimum(score, 100)
+
+
+def as_number(value):
+    """Plain Python number for JSON: ints stay ints, fractions stay floats"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def rank_crops(matrix, scores, threshold=70, limit=5):
+    """Indices and scores of crops at or above threshold, best first (stable)"""
+    order = np.argsort(-scores, kind='stable')
+    order = order[scores[order] >= threshold][:limit]
+    return [(int(i), as_number(scores[i])) for i in order]
+
+
+def rank_matrix(scores, threshold=70, limit=5):
+    """rank_crops for every row of a suitability grid: (n_samples x limit) crop indices, -1 padded"""
+    scores = np.atleast_2d(scores)
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :limit]
+    # Rows are sorted best first, so the crops at or above threshold are a prefix
+    return np.where(np.take_along_axis(scores, order, axis=1) >= threshold, order, -1)
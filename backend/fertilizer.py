@@ -0,0 +1,155 @@
+"""
+KRISHI MITRA - Fertilizer Planner
+Cheapest product blend meeting N/P/K deficits, solved as a small LP for
+many fields at once
+
+Each stage is: minimize price . x  subject to  content . x >= demand, x >= 0
+With three nutrient rows the optimum sits on a basis of three columns
+(products or surplus slacks), so every basis inverse is computed once and
+a whole batch of fields is solved with a few matrix products.
+"""
+
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+# Nutrient content as % N, % P2O5, % K2O
+PRODUCTS = {
+    'Urea': (46.0, 0.0, 0.0),
+    'DAP': (18.0, 46.0, 0.0),
+    'MOP': (0.0, 0.0, 60.0),
+    'SSP': (0.0, 16.0, 0.0),
+    'FYM': (0.5, 0.2, 0.5),
+}
+
+# Local retail prices in Rs/kg; override per request for other markets
+DEFAULT_PRICES = {
+    'Urea': 5.92,
+    'DAP': 27.0,
+    'MOP': 34.0,
+    'SSP': 11.0,
+    'FYM': 1.5,
+}
+
+# Basal organic manure applied regardless of cost, tonnes/hectare
+DEFAULT_FYM_TONNES = 5
+
+# (stage, share of each nutrient's deficit applied, products allowed)
+STAGES = (
+    ('Before Sowing', (0.5, 1.0, 0.6), ('Urea', 'DAP', 'MOP', 'SSP', 'FYM')),
+    ('30 Days After Sowing', (0.5, 0.0, 0.0), ('Urea',)),
+    ('Flowering Stage', (0.0, 0.0, 0.4), ('MOP',)),
+)
+
+# Fields solved per vectorized pass; bounds the (fields x bases x 3) work array
+SOLVE_CHUNK = 4096
+
+
+@lru_cache(maxsize=None)
+def _bases(products):
+    """Inverses of every nonsingular 3-column basis of [content | -I]"""
+    content = np.array([PRODUCTS[name] for name in products], dtype=np.float64).T / 100
+    columns = np.hstack([content, -np.eye(3)])
+
+    indices, inverses = [], []
+    for basis in combinations(range(columns.shape[1]), 3):
+        matrix = columns[:, basis]
+        if abs(np.linalg.det(matrix)) > 1e-12:
+            indices.append(basis)
+            inverses.append(np.linalg.inv(matrix))
+    return np.array(indices), np.array(inverses)
+
+
+def solve_blends(demand, products, prices=None):
+    """Cheapest kg/ha of each product meeting demand (n_fields x 3, kg N/P2O5/K2O)
+
+    Returns an (n_fields x len(products)) array of product quantities.
+    """
+    prices = dict(DEFAULT_PRICES, **(prices or {}))
+    demand = np.clip(np.atleast_2d(np.asarray(demand, dtype=np.float64)), 0, None)
+    indices, inverses = _bases(tuple(products))
+
+    # Slack columns cost nothing
+    column_cost = np.array([prices[name] for name in products] + [0.0, 0.0, 0.0])
+    basis_cost = column_cost[indices]
+    quantities = np.zeros((len(demand), len(products)))
+
+    for start in range(0, len(demand), SOLVE_CHUNK):
+        chunk = demand[start:start + SOLVE_CHUNK]
+        # Basic solution for every (field, basis): x_B = B^-1 d
+        x = np.einsum('bij,nj->nbi', inverses, chunk)
+        feasible = np.all(x >= -1e-9, axis=2)
+        cost = np.where(feasible, np.einsum('nbi,bi->nb', x, basis_cost), np.inf)
+        best = np.argmin(cost, axis=1)
+        if not np.all(np.isfinite(cost[np.arange(len(chunk)), best])):
+            raise ValueError(f'Products {products} cannot supply the requested nutrients')
+
+        chosen = np.clip(x[np.arange(len(chunk)), best], 0, None)
+        rows = np.repeat(np.arange(len(chunk)), 3)
+        cols = indices[best].ravel()
+        is_product = cols < len(products)
+        block = np.zeros((len(chunk), len(products) + 3))
+        block[rows[is_product], cols[is_product]] = chosen.ravel()[is_product]
+        quantities[start:start + len(chunk)] = block[:, :len(products)]
+
+    return quantities
+
+
+def plan_fertilizer_batch(deficits, prices=None, fym_tonnes=DEFAULT_FYM_TONNES):
+    """Stage-wise cheapest plans for many fields
+
+    deficits is (n_fields x 3) kg/ha of N, P2O5 and K2O still needed. Returns a
+    list of (stage, products, kg_per_hectare array) and the Rs/ha cost per field.
+    """
+    prices = dict(DEFAULT_PRICES, **(prices or {}))
+    deficits = np.clip(np.atleast_2d(np.asarray(deficits, dtype=np.float64)), 0, None)
+
+    # Credit the nutrients of the fixed FYM dose before buying fertilizer
+    fym_kg = fym_tonnes * 1000
+    remaining = np.clip(deficits - fym_kg * np.array(PRODUCTS['FYM']) / 100, 0, None)
+    cost = np.zeros(len(deficits))
+
+    stages = []
+    for i, (stage, shares, products) in enumerate(STAGES):
+        quantities = solve_blends(remaining * np.array(shares), products, prices)
+        if i == 0:
+            quantities[:, products.index('FYM')] += fym_kg
+        cost += quantities @ np.array([prices[name] for name in products])
+        stages.append((stage, products, quantities))
+
+    return stages, cost
+
+
+def plan_to_dict(stages, cost, row, field_size=1):
+    """JSON plan for one field of a batch, amounts per hectare, cost for the field"""
+    plan_stages = []
+    for stage, products, quantities in stages:
+        fertilizers = []
+        for name, kg in zip(products, quantities[row]):
+            if kg < 0.5:
+                continue
+            if name == 'FYM':
+                amount = f'{kg / 1000:.1f} tonnes/hectare'
+            else:
+                amount = f'{kg:.0f} kg/hectare'
+            fertilizers.append({'name': name, 'amount': amount, 'kg_per_hectare': round(float(kg), 1)})
+        plan_stages.append({'stage': stage, 'fertilizers': fertilizers})
+
+    total = float(cost[row]) * field_size
+    return {
+        'stages': plan_stages,
+        'field_size': field_size,
+        'total_cost_inr': round(total),
+        'total_cost': f'₹{total:.0f}'
+    }
+
+
+def procurement_totals(stages, field_sizes):
+    """Total kg of each product across all fields, for bulk ordering"""
+    field_sizes = np.asarray(field_sizes, dtype=np.float64)
+    totals = {}
+    for _, products, quantities in stages:
+        for name, kg in zip(products, field_sizes @ quantities):
+            totals[name] = totals.get(name, 0.0) + float(kg)
+    return {name: round(kg, 1) for name, kg in totals.items()}
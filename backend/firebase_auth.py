@@ -0,0 +1,55 @@
+"""
+KRISHI MITRA - Firebase Sign-in
+Verifies the Firebase ID token a signed-in page sends as
+'Authorization: Bearer <token>', so a farmer's saved analyses are only
+read and written by that farmer. firebase_admin is imported on first
+use; it would otherwise dominate the API's import time.
+"""
+
+import os
+import threading
+
+DEFAULT_CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'serviceAccount.json')
+
+# firebase_admin app name, so this never clashes with a default app
+APP_NAME = 'krishi-mitra-api'
+
+
+class TokenVerifier:
+    """Firebase uid from Authorization headers
+
+    credentials is a service account file path or its parsed JSON (as in
+    FIREBASE_CREDENTIALS); only its project id is used to check tokens.
+    """
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._app = None
+        self._lock = threading.Lock()
+
+    def _firebase_app(self):
+        # First request only, so the preloading gunicorn master never opens sessions
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    import firebase_admin
+                    from firebase_admin import credentials
+                    self._app = firebase_admin.initialize_app(credentials.Certificate(self.credentials),
+                                                              name=APP_NAME)
+        return self._app
+
+    def uid(self, authorization):
+        """uid of a valid, unexpired 'Bearer <token>' header; None when missing or invalid
+
+        Raises firebase_admin's CertificateFetchError when Google's signing
+        keys cannot be fetched, so callers can tell an outage from a bad token.
+        """
+        scheme, _, token = (authorization or '').partition(' ')
+        token = token.strip()
+        if scheme.lower() != 'bearer' or not token:
+            return None
+        from firebase_admin import auth
+        try:
+            return auth.verify_id_token(token, app=self._firebase_app())['uid']
+        except (auth.InvalidIdTokenError, ValueError):
+            return None
@@ -0,0 +1,116 @@
+"""
+KRISHI MITRA - Analysis History
+Per-farmer analysis history in SQLite, indexed on (user_id, created_at)
+with keyset pagination and zlib-compressed result payloads
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    method TEXT,
+    score REAL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_user_created ON analyses (user_id, created_at DESC, id DESC);
+"""
+
+
+def encode_cursor(created_at, row_id):
+    return f'{created_at}-{row_id}'
+
+
+def decode_cursor(cursor):
+    """'1700000000000-42' -> (1700000000000, 42); ValueError if malformed"""
+    created_at, _, row_id = str(cursor).partition('-')
+    return int(created_at), int(row_id)
+
+
+class HistoryStore:
+    """SQLite-backed history; one connection per thread, reopened after fork"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def save(self, user_id, method, score, result):
+        """Store one analysis; returns (id, created_at_ms)"""
+        created_at = int(time.time() * 1000)
+        payload = zlib.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'), 6)
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'INSERT INTO analyses (user_id, created_at, method, score, payload) VALUES (?, ?, ?, ?, ?)',
+                (user_id, created_at, method, score, payload)
+            )
+        return cursor.lastrowid, created_at
+
+    def page(self, user_id, limit=20, before=None, include_result=False):
+        """Newest-first page of a user's analyses and the cursor for the next page
+
+        Seeks straight to the cursor through the (user_id, created_at) index, so
+        every page costs the same however much history lies behind it.
+        """
+        columns = 'id, created_at, method, score' + (', payload' if include_result else '')
+        if before is None:
+            rows = self._connection().execute(
+                f'SELECT {columns} FROM analyses WHERE user_id = ? '
+                'ORDER BY created_at DESC, id DESC LIMIT ?',
+                (user_id, limit + 1)
+            ).fetchall()
+        else:
+            created_at, row_id = decode_cursor(before)
+            rows = self._connection().execute(
+                f'SELECT {columns} FROM analyses WHERE user_id = ? AND (created_at, id) < (?, ?) '
+                'ORDER BY created_at DESC, id DESC LIMIT ?',
+                (user_id, created_at, row_id, limit + 1)
+            ).fetchall()
+
+        items = [self._item(user_id, row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[1], last[0])
+        return items, next_cursor
+
+    def get(self, user_id, analysis_id):
+        """One analysis with its full result, or None"""
+        row = self._connection().execute(
+            'SELECT id, created_at, method, score, payload FROM analyses WHERE user_id = ? AND id = ?',
+            (user_id, analysis_id)
+        ).fetchone()
+        return self._item(user_id, row) if row else None
+
+    @staticmethod
+    def _item(user_id, row):
+        item = {
+            'id': row[0],
+            'userId': user_id,
+            'createdAt': row[1],
+            'method': row[2],
+            'score': row[3],
+        }
+        if len(row) > 4:
+            item['result'] = json.loads(zlib.decompress(row[4]))
+        return item
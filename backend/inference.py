@@ -0,0 +1,230 @@
+"""
+KRISHI MITRA - Model Inference
+Loads model.tflite once per worker (tflite_runtime when installed, the
+NumPy interpreter otherwise) and groups concurrent single predictions into
+micro-batches, so a burst of requests costs one batched CPU pass
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from tflite_numpy import NumpyModel
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model.tflite')
+
+# The model's input features are described by '<model>.json' beside it,
+# written by the training pipeline; without that file the model is not used:
+#   {"features": [{"name": "nitrogen", "scale": 560.0, "default": 280.0}, ...],
+#    "labels": {"<output>": ["<class 0>", ...]}, "top_classes": 3}
+# Features are in model input order; each raw value is divided by its scale,
+# and default fills in a feature the request does not carry. Outputs without
+# labels are reported as scalars (one value) or class_<i>.
+SPEC_DEFAULTS = {
+    'labels': {},
+    'top_classes': 3,
+}
+
+
+class RuntimeModel:
+    """tflite_runtime (or its ai_edge_litert successor) behind the NumpyModel interface"""
+
+    backend = 'tflite_runtime'
+
+    def __init__(self, path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from ai_edge_litert.interpreter import Interpreter
+        self._interpreter_class = Interpreter
+        self.path = path
+        self._lock = threading.Lock()
+        self._runner = None
+        self._pid = None
+        # Fail here, not on the first request, if this runtime cannot run the model
+        runner = self._signature_runner()
+        self.input_name = next(iter(runner.get_input_details()))
+        self.input_size = int(runner.get_input_details()[self.input_name]['shape'][-1])
+        self.output_names = sorted(runner.get_output_details())
+
+    def _signature_runner(self):
+        # Interpreters do not survive fork(); each worker builds its own
+        if self._pid != os.getpid():
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=1)
+            self._runner, self._pid = interpreter.get_signature_runner(), os.getpid()
+        return self._runner
+
+    def predict(self, features):
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.input_size)
+        # One interpreter per process, and it is not thread-safe
+        with self._lock:
+            outputs = self._signature_runner()(**{self.input_name: features})
+        return {name: np.array(value) for name, value in outputs.items()}
+
+
+def load_model(path, backend='auto'):
+    """Model for path: 'tflite' runtime, 'numpy' interpreter, or 'auto' (runtime if it works)"""
+    if backend in ('auto', 'tflite'):
+        try:
+            return RuntimeModel(path)
+        except (ImportError, ValueError, RuntimeError) as e:
+            if backend == 'tflite':
+                raise
+            if not isinstance(e, ImportError):
+                print('TFLite runtime cannot load the model, using the NumPy interpreter:', e)
+    return NumpyModel(path)
+
+
+class _Pending:
+    """One queued prediction waiting for its batch to run"""
+
+    __slots__ = ('features', 'done', 'outputs', 'error')
+
+    def __init__(self, features):
+        self.features = features
+        self.done = threading.Event()
+        self.outputs = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects single predictions from concurrent requests into one model call
+
+    A batch runs when max_batch requests are waiting or the oldest has waited
+    max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait=0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._worker = None
+        self._pid = None
+        self.stats = {'requests': 0, 'batches': 0, 'largest_batch': 0}
+
+    def _ensure_worker(self):
+        # Started lazily and restarted after fork: threads do not survive fork()
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._waiting = []
+            self._worker = threading.Thread(target=self._run, name='model-micro-batcher', daemon=True)
+            self._pid = os.getpid()
+            self._worker.start()
+
+    def predict(self, features, timeout=5.0):
+        """Outputs for one feature vector, {output_name: 1-D array}"""
+        self._ensure_worker()
+        item = _Pending(np.asarray(features, dtype=np.float64))
+        with self._cond:
+            self._waiting.append(item)
+            self._cond.notify()
+        if not item.done.wait(timeout):
+            raise TimeoutError('model prediction timed out')
+        if item.error is not None:
+            raise item.error
+        return item.outputs
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                # Give concurrent requests up to max_wait to join this batch
+                deadline = time.monotonic() + self.max_wait
+                while len(self._waiting) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._waiting[:self.max_batch]
+                del self._waiting[:self.max_batch]
+
+            try:
+                outputs = self.model.predict(np.stack([item.features for item in batch]))
+                for row, item in enumerate(batch):
+                    item.outputs = {name: value[row] for name, value in outputs.items()}
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            finally:
+                for item in batch:
+                    item.done.set()
+
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+
+class InferenceEngine:
+    """Soil parameters in, model signal dicts out"""
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, backend='auto', max_batch=64, max_wait=0.005, spec=None):
+        self.spec = spec or load_spec(path)
+        with open(path, 'rb') as f:
+            self.version = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+        self.model = load_model(path, backend)
+        if len(self.spec['features']) != self.model.input_size:
+            raise ValueError(f"Model takes {self.model.input_size} features, spec lists {len(self.spec['features'])}")
+        self.batcher = MicroBatcher(self.model, max_batch, max_wait)
+        self._scale = np.array([f['scale'] for f in self.spec['features']], dtype=np.float64)
+
+    @property
+    def backend(self):
+        return self.model.backend
+
+    def features(self, params_list):
+        """(n x input_size) scaled model inputs from soil parameter dicts"""
+        raw = np.array([
+            [float(params.get(f['name'], f['default'])) for f in self.spec['features']]
+            for params in params_list
+        ], dtype=np.float64).reshape(len(params_list), len(self._scale))
+        return raw / self._scale
+
+    def predict(self, soil_params):
+        """Model signal for one sample, micro-batched with concurrent requests"""
+        outputs = self.batcher.predict(self.features([soil_params])[0])
+        return self.describe(outputs)
+
+    def predict_batch(self, params_list):
+        """Model signal for many samples in one direct pass"""
+        if not params_list:
+            return []
+        outputs = self.model.predict(self.features(params_list))
+        return [self.describe({name: value[row] for name, value in outputs.items()})
+                for row in range(len(params_list))]
+
+    def describe(self, outputs):
+        """JSON-ready signal for one row of model outputs"""
+        signal = {'model_version': self.version, 'backend': self.backend}
+        for name in sorted(outputs):
+            value = np.ravel(outputs[name])
+            if len(value) == 1:
+                signal[name] = round(float(value[0]), 4)
+                continue
+            labels = self.spec['labels'].get(name) or [f'class_{i}' for i in range(len(value))]
+            top = np.argsort(-value, kind='stable')[:self.spec['top_classes']]
+            signal[name] = [{'label': labels[i], 'probability': round(float(value[i]), 4)} for i in top]
+        return signal
+
+
+def spec_path(model_path):
+    """'<model>.json' beside the model"""
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def load_spec(model_path):
+    """Feature spec for a model; OSError without '<model>.json', ValueError if it lists no features"""
+    with open(spec_path(model_path), encoding='utf-8') as f:
+        spec = dict(SPEC_DEFAULTS, **json.load(f))
+    if not spec.get('features') or not all({'name', 'scale', 'default'} <= set(f) for f in spec['features']):
+        raise ValueError(f"{spec_path(model_path)} needs 'features' with name, scale and default")
+    return spec
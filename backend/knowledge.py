@@ -0,0 +1,196 @@
+"""
+KRISHI MITRA - Crop Knowledge Snapshots
+crop-knowledge.json is the single source for crop data. It is compiled into
+a versioned binary snapshot (ideal-range matrices plus the crop details)
+that loads without parsing per-crop rules, and every worker hot-swaps to a
+new snapshot as soon as one is written.
+
+    python backend/knowledge.py [source.json] [snapshot]
+
+Snapshot layout (little-endian):
+    header   magic 'KMCROPS1', n_crops u32, n_columns u32, details_len u32,
+             4 pad bytes, blake2b-128 digest of everything after the header
+    low      float64[n_crops, n_columns]
+    high     float64[n_crops, n_columns]
+    details  UTF-8 JSON {crop: details} in source order
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+from crop_engine import NUTRIENTS, CropMatrix, compile_crop_database
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_SOURCE_PATH = os.path.join(_ROOT, 'crop-knowledge.json')
+DEFAULT_SNAPSHOT_PATH = os.path.join(_ROOT, 'instance', 'crop-knowledge.snapshot')
+
+MAGIC = b'KMCROPS1'
+HEADER = struct.Struct('<8sIII4x16s')
+
+
+class CropSnapshot:
+    """One immutable version of the crop knowledge"""
+
+    def __init__(self, data, crops, matrix, digest):
+        self.data = data
+        self.crops = crops
+        self.matrix = matrix
+        self.digest = digest
+
+    @property
+    def version(self):
+        return self.digest[:12]
+
+
+def compile_snapshot(crop_database):
+    """Snapshot bytes for a {crop: details} dict"""
+    matrix = compile_crop_database(crop_database)
+    details = json.dumps(crop_database, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    body = matrix.low.tobytes() + matrix.high.tobytes() + details
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    return HEADER.pack(MAGIC, len(matrix), len(NUTRIENTS), len(details), digest) + body
+
+
+def parse_snapshot(data):
+    """CropSnapshot from snapshot bytes; ValueError if truncated or corrupt"""
+    if len(data) < HEADER.size:
+        raise ValueError('Crop snapshot is truncated')
+    magic, n_crops, n_columns, details_len, digest = HEADER.unpack_from(data)
+    if magic != MAGIC or n_columns != len(NUTRIENTS):
+        raise ValueError('Not a crop snapshot for this version of the engine')
+    matrix_bytes = n_crops * n_columns * 8
+    if len(data) != HEADER.size + 2 * matrix_bytes + details_len:
+        raise ValueError('Crop snapshot is truncated')
+    body = memoryview(data)[HEADER.size:]
+    if hashlib.blake2b(body, digest_size=16).digest() != digest:
+        raise ValueError('Crop snapshot digest mismatch')
+
+    # The matrices are views straight into the snapshot bytes
+    low = np.frombuffer(data, np.float64, n_crops * n_columns, HEADER.size).reshape(n_crops, n_columns)
+    high = np.frombuffer(data, np.float64, n_crops * n_columns, HEADER.size + matrix_bytes).reshape(n_crops, n_columns)
+    crops = json.loads(bytes(body[2 * matrix_bytes:]).decode('utf-8'))
+    return CropSnapshot(data, MappingProxyType(crops), CropMatrix(list(crops), low, high), digest.hex())
+
+
+def snapshot_digest(path):
+    """Digest recorded in a snapshot file's header, or None"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    return HEADER.unpack(header)[4].hex() if len(header) == HEADER.size else None
+
+
+def write_snapshot(source_path=DEFAULT_SOURCE_PATH, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    """Compile the source file and atomically replace the snapshot if it changed
+
+    Returns the snapshot digest.
+    """
+    with open(source_path, encoding='utf-8') as f:
+        data = compile_snapshot(json.load(f))
+    digest = HEADER.unpack_from(data)[4].hex()
+    if snapshot_digest(snapshot_path) == digest:
+        return digest
+
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+    tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers see the old file or the new one, never a partial write
+    os.replace(tmp_path, snapshot_path)
+    return digest
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class KnowledgeStore:
+    """Current crop snapshot, swapped atomically when the snapshot file changes
+
+    Callers grab `current` once and keep using that object, so a swap never
+    changes data under a request in flight. The files are checked at most
+    every check_interval seconds. With a source path, an edited source is
+    recompiled first (only rewritten if its content changed), so editing
+    crop-knowledge.json is enough.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, source=None, check_interval=1.0):
+        self.path = path
+        self.source = source
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamp = None
+        self._source_stamp = None
+        self.swaps = 0
+        self._current = None
+        self.check(force=True)
+        if self._current is None:
+            raise ValueError(f'No usable crop snapshot at {path}')
+
+    @property
+    def current(self):
+        if time.monotonic() >= self._next_check:
+            self.check()
+        return self._current
+
+    def check(self, force=False):
+        """Load a new snapshot if the files changed; returns True on a swap"""
+        if not self._lock.acquire(blocking=force):
+            # Another thread is already checking; keep serving what we have
+            return False
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            if self.source is not None:
+                self._compile_if_edited(force)
+
+            stamp = _stamp(self.path)
+            if stamp is None or stamp == self._stamp:
+                return False
+            try:
+                with open(self.path, 'rb') as f:
+                    snapshot = parse_snapshot(f.read())
+            except (OSError, ValueError) as e:
+                print('Crop snapshot not loaded, keeping the current one:', e)
+                return False
+            self._stamp = stamp
+            if self._current is not None and snapshot.digest == self._current.digest:
+                return False
+            if self._current is not None:
+                self.swaps += 1
+            self._current = snapshot
+            return True
+        finally:
+            self._lock.release()
+
+    def _compile_if_edited(self, force):
+        source_stamp = _stamp(self.source)
+        if source_stamp is None or (source_stamp == self._source_stamp and not force):
+            return
+        self._source_stamp = source_stamp
+        try:
+            write_snapshot(self.source, self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print('Crop knowledge not compiled, keeping the current snapshot:', e)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT_PATH
+    print(f'{target}: {write_snapshot(source, target)}')
@@ -0,0 +1,140 @@
+"""
+KRISHI MITRA - Result Memoization
+Serialized responses keyed on canonical soil inputs, so a Soil Health Card
+submitted again (by the same farmer or anyone with the same values) is
+answered from cache. Two tiers: a small per-process LRU in front of a
+SQLite table shared by every gunicorn worker. Entries carry the version of
+everything the response depends on (crop database digest, model version);
+when it changes, stale entries stop matching and are purged.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MEMO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'memo.db')
+
+# Decimal places kept per input, the precision Soil Health Cards print.
+# Inputs are rounded before the analysis runs, so 12.5, "12.50" and
+# 12.500001 share one key and the cached body matches the canonical input
+DECIMALS = {'nitrogen': 1, 'phosphorus': 1, 'potassium': 1, 'ph': 2}
+
+# Shared rows are trimmed to max_entries about every this many inserts
+TRIM_EVERY = 100
+
+# A hit refreshes its shared row's recency at most this often (seconds),
+# so popular keys do not turn every read into a write
+TOUCH_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memo (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    used_at INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memo_used_at ON memo (used_at);
+"""
+
+
+def quantize(soil_params, decimals=DECIMALS):
+    """Soil params rounded to their DECIMALS, as plain floats"""
+    # + 0.0 folds -0.0 into 0.0
+    return {param: round(float(soil_params[param]), places) + 0.0 for param, places in decimals.items()}
+
+
+def canonical_key(namespace, soil_params, decimals=DECIMALS):
+    """'namespace:n:p:k:ph' for quantized soil params"""
+    return ':'.join([namespace] + [repr(float(soil_params[param])) for param in decimals])
+
+
+class ResultCache:
+    """Per-process LRU over a SQLite table shared across workers
+
+    get() returns (etag, body, tier) with tier 'local' or 'shared', or None.
+    Every key is looked up under one version string; entries stored under
+    another version are never returned.
+    """
+
+    def __init__(self, path=DEFAULT_MEMO_PATH, max_entries=50000, local_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.local_entries = local_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._inserts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit: every statement here is a single-row read or write
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _use_version(self, version):
+        """Drop everything cached under an older version (once per change per process)"""
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            self._entries.clear()
+            self._version = version
+        # Whichever worker sees the new version first clears the shared rows
+        self._connection().execute('DELETE FROM memo WHERE version != ?', (version,))
+
+    def get(self, key, version):
+        self._use_version(version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry + ('local',)
+
+        conn = self._connection()
+        row = conn.execute('SELECT etag, body, used_at FROM memo WHERE key = ? AND version = ?',
+                           (key, version)).fetchone()
+        if row is None:
+            return None
+        etag, body, used_at = row[0], bytes(row[1]), row[2]
+        now = int(time.time())
+        if now - used_at >= TOUCH_INTERVAL:
+            conn.execute('UPDATE memo SET used_at = ? WHERE key = ?', (now, key))
+        self._remember(key, etag, body)
+        return etag, body, 'shared'
+
+    def put(self, key, version, etag, body):
+        self._use_version(version)
+        self._remember(key, etag, body)
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO memo (key, version, used_at, etag, body) VALUES (?, ?, ?, ?, ?)',
+                     (key, version, int(time.time()), etag, body))
+        with self._lock:
+            self._inserts += 1
+            trim = self._inserts % TRIM_EVERY == 0
+        if trim:
+            self.trim()
+
+    def _remember(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.local_entries:
+                self._entries.popitem(last=False)
+
+    def trim(self):
+        """Evict the least recently used shared rows beyond max_entries"""
+        conn = self._connection()
+        excess = conn.execute('SELECT count(*) FROM memo').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM memo WHERE key IN (SELECT key FROM memo ORDER BY used_at LIMIT ?)', (excess,))
@@ -0,0 +1,329 @@
+"""
+KRISHI MITRA - Request Metrics
+Per-endpoint latency histograms, in-flight gauges, error counters and named
+spans in Prometheus text format. Each process counts in memory and a
+background thread writes its totals to <METRICS_DIR>/<app>/<pid>.json about
+once a second; /metrics sums the files of every live worker plus an archive
+of exited ones, so any worker answers for the whole server. Without
+METRICS_DIR only the current process is reported.
+
+Standard library only: main.py imports this too and keeps a tight
+import-time budget.
+"""
+
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+PREFIX = 'krishi_'
+
+# Histogram upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# metric -> (type, label names, help)
+METRICS = {
+    'http_requests_total': ('counter', ('endpoint', 'method', 'status'), 'Requests handled'),
+    'http_request_errors_total': ('counter', ('endpoint', 'method'), 'Requests answered with a 5xx status'),
+    'http_request_duration_seconds': ('histogram', ('endpoint', 'method'), 'Time from request start to response'),
+    'http_requests_in_flight': ('gauge', (), 'Requests being handled right now'),
+    'span_duration_seconds': ('histogram', ('span',), 'Time spent in named code sections'),
+    'span_errors_total': ('counter', ('span',), 'Named code sections that raised'),
+    'memo_lookups_total': ('counter', ('cache', 'tier'), 'Memoized response lookups by the tier that answered (or miss)'),
+}
+
+ARCHIVE_NAME = 'archive.json'
+
+# WSGI environ key holding a request's start time
+STARTED_KEY = 'krishi.metrics_started'
+
+
+def _empty():
+    return {'counters': {}, 'gauges': {}, 'histograms': {}}
+
+
+def _merge(total, data, gauges=True):
+    for key, value in data['counters'].items():
+        total['counters'][key] = total['counters'].get(key, 0) + value
+    if gauges:
+        for key, value in data['gauges'].items():
+            total['gauges'][key] = total['gauges'].get(key, 0) + value
+    for key, values in data['histograms'].items():
+        current = total['histograms'].get(key)
+        total['histograms'][key] = values[:] if current is None else [a + b for a, b in zip(current, values)]
+
+
+def _encode(data):
+    # JSON keys must be strings: (metric, (label values...)) -> 'metric\x1flabel\x1f...'
+    return {kind: {'\x1f'.join((key[0],) + key[1]): value for key, value in values.items()}
+            for kind, values in data.items()}
+
+
+def _decode(data):
+    decoded = {}
+    for kind, values in data.items():
+        decoded[kind] = {}
+        for key, value in values.items():
+            parts = key.split('\x1f')
+            decoded[kind][parts[0], tuple(parts[1:])] = value
+    return decoded
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render(data):
+    """Prometheus text exposition (format 0.0.4) for merged metric data"""
+    lines = []
+    for metric, (kind, names, help_text) in METRICS.items():
+        name = PREFIX + metric
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (key_metric, values), counts in sorted(data['histograms'].items()):
+                if key_metric != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f'{name}_bucket{_labels(names, values, le)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(names, values)} {counts[-1]!r}')
+                lines.append(f'{name}_count{_labels(names, values)} {cumulative}')
+        else:
+            series = data['counters'] if kind == 'counter' else data['gauges']
+            for (key_metric, values), value in sorted(series.items()):
+                if key_metric == metric:
+                    lines.append(f'{name}{_labels(names, values)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms for one app"""
+
+    def __init__(self, name, directory=None, dump_interval=1.0):
+        self.name = name
+        self.directory = os.path.join(directory, name) if directory else None
+        self.dump_interval = dump_interval
+        self._lock = threading.Lock()
+        self._data = _empty()
+        self._in_flight = 0
+        self._request_keys = {}
+        self._dirty = False
+        # Counts inherited across fork() belong to the parent's file
+        os.register_at_fork(after_in_child=self._reset)
+        if self.directory:
+            atexit.register(self.dump)
+            self._start_flusher()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._data = _empty()
+        self._in_flight = 0
+        self._dirty = False
+        if self.directory:
+            # Threads do not survive fork(); each worker runs its own flusher
+            self._start_flusher()
+
+    def _start_flusher(self):
+        def flush():
+            while True:
+                time.sleep(self.dump_interval)
+                if self._dirty:
+                    self.dump()
+        threading.Thread(target=flush, name=f'metrics-{self.name}', daemon=True).start()
+
+    # ---------- recording ----------
+
+    def inc(self, metric, labels=(), value=1):
+        key = (metric, labels)
+        with self._lock:
+            counters = self._data['counters']
+            counters[key] = counters.get(key, 0) + value
+        self._dirty = True
+
+    def observe(self, metric, labels, seconds):
+        key = (metric, labels)
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            counts = self._data['histograms'].get(key)
+            if counts is None:
+                # One count per bucket (+Inf last), then the running sum
+                counts = self._data['histograms'][key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += seconds
+        self._dirty = True
+
+    def record_request(self, endpoint, method, status, seconds):
+        """Count one finished request; kept to one lock round trip for the hot path"""
+        keys = self._request_keys.get((endpoint, method, status))
+        if keys is None:
+            labels = (endpoint, method)
+            keys = self._request_keys[endpoint, method, status] = (
+                ('http_request_duration_seconds', labels),
+                ('http_requests_total', labels + (str(status),)),
+                ('http_request_errors_total', labels) if status >= 500 else None,
+            )
+        duration_key, total_key, error_key = keys
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        counters, histograms = self._data['counters'], self._data['histograms']
+        with self._lock:
+            counts = histograms.get(duration_key)
+            if counts is None:
+                counts = histograms[duration_key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += seconds
+            counters[total_key] = counters.get(total_key, 0) + 1
+            if error_key is not None:
+                counters[error_key] = counters.get(error_key, 0) + 1
+        self._dirty = True
+
+    def observe_span(self, name, seconds, error=False):
+        """Record one run of a named section"""
+        self.observe('span_duration_seconds', (name,), seconds)
+        if error:
+            self.inc('span_errors_total', (name,))
+
+    def timed(self, name):
+        """Decorator recording each call of a function as the named span"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException:
+                    self.observe_span(name, time.perf_counter() - started, error=True)
+                    raise
+                self.observe_span(name, time.perf_counter() - started)
+                return result
+            return wrapper
+        return decorate
+
+    # ---------- sharing across processes ----------
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._data['counters']),
+                'gauges': {('http_requests_in_flight', ()): self._in_flight},
+                'histograms': {key: counts[:] for key, counts in self._data['histograms'].items()},
+            }
+
+    def dump(self):
+        """Write this process's totals for other workers to read"""
+        if not self.directory:
+            return
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_encode(self.snapshot()), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                return _decode(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _archive_exited(self):
+        """Fold files of exited workers into the archive (counters and histograms only)"""
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited = [name for name in os.listdir(self.directory)
+                      if name.endswith('.json') and name[:-5].isdigit() and not _alive(int(name[:-5]))]
+            if not exited:
+                return
+            archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+            archive = self._load(archive_path) or _empty()
+            for name in exited:
+                data = self._load(os.path.join(self.directory, name))
+                if data is not None:
+                    _merge(archive, data, gauges=False)
+            with open(f'{archive_path}.tmp', 'w') as f:
+                json.dump(_encode(archive), f, separators=(',', ':'))
+            os.replace(f'{archive_path}.tmp', archive_path)
+            for name in exited:
+                os.remove(os.path.join(self.directory, name))
+
+    def collect(self):
+        """Merged data for the whole server (or just this process without a directory)"""
+        if not self.directory:
+            return self.snapshot()
+        self.dump()
+        self._archive_exited()
+        total = _empty()
+        for name in os.listdir(self.directory):
+            if name == ARCHIVE_NAME or (name.endswith('.json') and name[:-5].isdigit()):
+                data = self._load(os.path.join(self.directory, name))
+                if data is not None:
+                    _merge(total, data)
+        return total
+
+    # ---------- Flask ----------
+
+    def install(self, app, path='/metrics'):
+        """Instrument every request of a Flask app and serve /metrics
+
+        Install before other after_request hooks: Flask runs them in reverse
+        order, so the recorded latency then includes theirs. Latency runs
+        until the response object is ready; streamed bodies are not included.
+        """
+        from flask import Response, request
+
+        wsgi_app = app.wsgi_app
+
+        def timed_wsgi_app(environ, start_response):
+            # Plain WSGI: the start time and in-flight count need no context lookups
+            environ[STARTED_KEY] = time.perf_counter()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                return wsgi_app(environ, start_response)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._dirty = True
+        app.wsgi_app = timed_wsgi_app
+
+        @app.after_request
+        def _record_request(response):
+            # Each access through the request proxy costs ~1-2us; resolve it once
+            req = request._get_current_object()
+            started = req.environ.get(STARTED_KEY)
+            if started is not None:
+                self.record_request(req.endpoint or 'unmatched', req.method,
+                                    response.status_code, time.perf_counter() - started)
+            return response
+
+        def metrics():
+            return Response(render(self.collect()), mimetype='text/plain; version=0.0.4')
+        app.add_url_rule(path, 'metrics', metrics)
+
+        # JSON serialization is its own span (jsonify goes through app.json.dumps)
+        app.json.dumps = self.timed('json_dumps')(app.json.dumps)
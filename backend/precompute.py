@@ -0,0 +1,82 @@
+"""
+KRISHI MITRA - Precomputed Responses
+Serializes deterministic results once and serves the same bytes with a
+strong ETag until the data they were built from changes
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+Precomputed = namedtuple('Precomputed', ['body', 'etag'])
+
+
+def make_entry(body):
+    """Wrap serialized bytes with a content-derived strong ETag"""
+    return Precomputed(body, hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+class PrecomputedResponses:
+    """Key -> pre-serialized body, rebuilt whenever the data version moves
+
+    builder(keys) returns an iterable of (key, body_bytes) pairs for keys, or
+    for every key when keys is None. version() returns any value that changes
+    when the builder's inputs change.
+
+    With max_entries set and count() above it, nothing is built up front:
+    entries are built on first request and the least recently used beyond
+    max_entries are dropped, so memory stays bounded however many keys exist.
+    """
+
+    def __init__(self, builder, version, count=None, max_entries=None):
+        self._builder = builder
+        self._version = version
+        self._count = count
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._built_for = None
+        self._entries = {}
+        self.lazy = False
+
+    def refresh(self, force=False):
+        """Rebuild all entries (or start an empty lazy cache) if the data changed since the last build"""
+        current = self._version()
+        if not force and self._built_for == current:
+            return False
+        with self._lock:
+            current = self._version()
+            if not force and self._built_for == current:
+                return False
+            lazy = self.max_entries is not None and self._count is not None and self._count() > self.max_entries
+            if lazy:
+                entries = OrderedDict()
+            else:
+                entries = {key: make_entry(body) for key, body in self._builder(None)}
+            # Swap in one assignment so readers never see a partial build
+            self._entries, self._built_for, self.lazy = entries, current, lazy
+        return True
+
+    def get(self, key):
+        """Entry for key, rebuilding first if the data is stale"""
+        self.refresh()
+        entries = self._entries
+        if not self.lazy:
+            return entries.get(key)
+
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                return entry
+        # Built outside the lock; concurrent misses for one key just build it twice
+        for built_key, body in self._builder([key]):
+            entry = make_entry(body)
+            with self._lock:
+                # After a version swap this lands in the old dict and is dropped with it
+                entries[built_key] = entry
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
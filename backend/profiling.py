@@ -0,0 +1,312 @@
+"""
+KRISHI MITRA - Request Profiling
+Wall-clock sampling profiler for a random fraction of requests, or for any
+request carrying a signed X-Profile header. A background thread samples the
+stacks of profiled requests only, so unprofiled requests pay one random()
+call and a header lookup. Stacks are appended per route as collapsed-stack
+files (<PROFILE_DIR>/<app>/<route>/<pid>.folded, one 'frame;frame;... us'
+line per stack), the format flamegraph.pl, inferno and speedscope read.
+
+    python backend/profiling.py sign [--ttl 600]          X-Profile header value (needs PROFILE_SECRET)
+    python backend/profiling.py merge [dir] [-o merged.folded] [--svg flame.svg] [--app api] [--route ...]
+
+Standard library only: main.py imports this too and keeps a tight
+import-time budget.
+"""
+
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from html import escape
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'profiles')
+
+HEADER_ENVIRON_KEY = 'HTTP_X_PROFILE'
+
+# Seconds between samples; the GIL switch interval (5 ms) bounds how often
+# the sampler actually runs while a request holds the GIL
+SAMPLE_INTERVAL = 0.002
+
+# Profiled requests a process samples at once; further ones run unprofiled
+MAX_ACTIVE = 4
+
+FOLDED_SUFFIX = '.folded'
+
+
+def sign(secret, ttl=600, now=None):
+    """X-Profile header value valid for ttl seconds: '<expires>.<hmac>'"""
+    expires = int(now if now is not None else time.time()) + int(ttl)
+    digest = hmac.new(secret.encode('utf-8'), str(expires).encode('ascii'), hashlib.sha256).hexdigest()
+    return f'{expires}.{digest}'
+
+
+def verify(secret, value, now=None):
+    """Whether an X-Profile header value was signed with secret and has not expired"""
+    expires, _, digest = value.strip().partition('.')
+    if not secret or not expires.isdigit():
+        return False
+    if int(expires) < (now if now is not None else time.time()):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), expires.encode('ascii'), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class RequestProfiler:
+    """Samples profiled requests' stacks and writes them per route"""
+
+    def __init__(self, name, directory=None, sample_rate=0.0, secret=None,
+                 interval=SAMPLE_INTERVAL, max_active=MAX_ACTIVE):
+        self.name = name
+        self.directory = os.path.join(directory or DEFAULT_PROFILE_DIR, name)
+        self.sample_rate = float(sample_rate or 0)
+        self.secret = secret or None
+        self.interval = interval
+        self.max_active = max_active
+        self._frame_names = {}
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.secret is not None
+
+    def _reset(self):
+        # thread id -> [root frame, {stack: us}, last sample time]
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        # Threads do not survive fork(); the sampler starts on first use
+        self._sampler = None
+
+    def wants(self, environ):
+        """Whether to profile the request with this WSGI environ"""
+        header = environ.get(HEADER_ENVIRON_KEY)
+        if header is not None and self.secret is not None and verify(self.secret, header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    # ---------- sampling ----------
+
+    def _frame_name(self, code):
+        name = self._frame_names.get(code)
+        if name is None:
+            # ';' separates frames in the collapsed format
+            name = self._frame_names[code] = (
+                f'{os.path.basename(code.co_filename)}:{code.co_qualname}'.replace(';', ':'))
+        return name
+
+    def _stack(self, frame, root):
+        """Frame names from root's callee down to frame, outermost first"""
+        names = []
+        while frame is not None and frame is not root:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(names)
+
+    def _sample(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                for thread_id, state in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    root, stacks, last = state
+                    stack = self._stack(frame, root)
+                    if stack:
+                        # Weighted by wall time since the previous sample, so
+                        # irregular wakeups do not skew the picture
+                        stacks[stack] += int((now - last) * 1e6)
+                    state[2] = now
+            del frames
+
+    def start(self, root):
+        """Begin sampling the calling thread above root; False when at capacity"""
+        with self._lock:
+            if len(self._active) >= self.max_active:
+                return False
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name=f'profiler-{self.name}', daemon=True)
+                self._sampler.start()
+            self._active[threading.get_ident()] = [root, Counter(), time.perf_counter()]
+            self._wake.set()
+        return True
+
+    def stop(self, route):
+        """Stop sampling the calling thread and append its stacks to the route's file"""
+        with self._lock:
+            _, stacks, _ = self._active.pop(threading.get_ident())
+        if not stacks:
+            return
+        directory = os.path.join(self.directory, route.replace(os.sep, '_'))
+        os.makedirs(directory, exist_ok=True)
+        lines = ''.join(f'{stack} {us}\n' for stack, us in stacks.items())
+        # One write per request; the file is private to this process
+        with open(os.path.join(directory, f'{os.getpid()}{FOLDED_SUFFIX}'), 'a') as f:
+            f.write(lines)
+
+    # ---------- Flask ----------
+
+    def install(self, app):
+        """Profile sampled or X-Profile-signed requests of a Flask app
+
+        Sampling covers the app from routing to the finished response
+        object, including other WSGI wrappers installed before this one.
+        Does nothing unless a sample rate or a secret is configured.
+        """
+        if not self.enabled:
+            return
+        wsgi_app = app.wsgi_app
+
+        def profiled_wsgi_app(environ, start_response):
+            if not self.wants(environ) or not self.start(sys._getframe()):
+                return wsgi_app(environ, start_response)
+            try:
+                return wsgi_app(environ, start_response)
+            finally:
+                self.stop(route_of(app, environ))
+        app.wsgi_app = profiled_wsgi_app
+
+
+def route_of(app, environ):
+    """Endpoint name for a WSGI environ; only profiled requests pay for the match"""
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+    except Exception:  # 404 / 405 / redirects
+        return 'unmatched'
+    return endpoint
+
+
+# ========== MERGING ==========
+
+def read_folded(paths):
+    """Summed {stack: us} over collapsed-stack files"""
+    stacks = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, value = line.rstrip('\n').rpartition(' ')
+                if stack and value.isdigit():
+                    stacks[stack] += int(value)
+    return stacks
+
+
+def merge(directory, apps=None, routes=None):
+    """{stack: us} over every route file under directory
+
+    With more than one route selected, each stack is rooted at
+    '<app>/<route>' so routes stay apart in the flamegraph.
+    """
+    selected = {}
+    if not os.path.isdir(directory):
+        return Counter()
+    for app_name in sorted(os.listdir(directory)):
+        app_dir = os.path.join(directory, app_name)
+        if not os.path.isdir(app_dir) or (apps and app_name not in apps):
+            continue
+        for route in sorted(os.listdir(app_dir)):
+            route_dir = os.path.join(app_dir, route)
+            if os.path.isdir(route_dir) and (not routes or route in routes):
+                selected[f'{app_name}/{route}'] = [
+                    os.path.join(route_dir, name) for name in sorted(os.listdir(route_dir))
+                    if name.endswith(FOLDED_SUFFIX)]
+    if len(selected) == 1:
+        return read_folded(next(iter(selected.values())))
+    merged = Counter()
+    for root, paths in selected.items():
+        for stack, us in read_folded(paths).items():
+            merged[f'{root};{stack}'] += us
+    return merged
+
+
+def render_svg(stacks, title='Flame graph', width=1200, row_height=16):
+    """Self-contained SVG flame graph (hover a frame for its share)"""
+    # Prefix tree: name -> [us, children]
+    tree = [0, {}]
+    for stack, us in stacks.items():
+        tree[0] += us
+        node = tree
+        for name in stack.split(';'):
+            node = node[1].setdefault(name, [0, {}])
+            node[0] += us
+    total = tree[0] or 1
+    rects = []
+
+    def layout(children, x, depth):
+        for name, (us, grandchildren) in sorted(children.items()):
+            w = us / total * width
+            if w >= 0.3:
+                hue = int(hashlib.md5(name.encode('utf-8')).hexdigest()[:4], 16) % 50
+                # ~7px per character; truncate names that do not fit
+                label = name if w > 7 * len(name) else (name[:int(w / 7) - 2] + '..' if w > 35 else '')
+                info = escape(f'{name} ({us / 1000:.1f} ms, {100 * us / total:.2f}%)')
+                rects.append(
+                    f'<g><title>{info}</title><rect x="{x:.1f}" y="{depth * row_height}" width="{w:.1f}" '
+                    f'height="{row_height - 1}" fill="hsl({hue},85%,60%)"/>'
+                    f'<text x="{x + 3:.1f}" y="{depth * row_height + row_height - 4}">{escape(label)}</text></g>')
+                layout(grandchildren, x, depth + 1)
+            x += w
+
+    layout(tree[1], 0.0, 1)
+    height = (max(len(stack.split(';')) for stack in stacks) + 2) * row_height if stacks else 3 * row_height
+    # Icicle layout (callers on top) keeps the SVG simple; read it downwards
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+            f'<text x="4" y="{row_height - 4}">{escape(title)}: {tree[0] / 1000:.1f} ms sampled</text>'
+            + ''.join(rects) + '</svg>\n')
+
+
+def main():
+    # Only the CLI needs argparse; keep it out of the apps' import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Request profiling: sign X-Profile headers, merge stacks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sign_parser = commands.add_parser('sign', help='print an X-Profile header value (PROFILE_SECRET)')
+    sign_parser.add_argument('--ttl', type=int, default=600, help='seconds the value stays valid')
+
+    merge_parser = commands.add_parser('merge', help='merge collapsed-stack files')
+    merge_parser.add_argument('directory', nargs='?', default=os.environ.get('PROFILE_DIR') or DEFAULT_PROFILE_DIR)
+    merge_parser.add_argument('--app', action='append', help="only this app ('api', 'main'); repeatable")
+    merge_parser.add_argument('--route', action='append', help='only this route (Flask endpoint); repeatable')
+    merge_parser.add_argument('-o', '--output', help='merged collapsed stacks (default: stdout)')
+    merge_parser.add_argument('--svg', help='also write a flame graph SVG here')
+    args = parser.parse_args()
+
+    if args.command == 'sign':
+        secret = os.environ.get('PROFILE_SECRET')
+        if not secret:
+            parser.error('PROFILE_SECRET is not set')
+        print(sign(secret, args.ttl))
+        return
+
+    stacks = merge(args.directory, args.app, args.route)
+    if not stacks:
+        parser.error(f'no profiles under {args.directory}')
+    folded = ''.join(f'{stack} {us}\n' for stack, us in sorted(stacks.items()))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(folded)
+    else:
+        sys.stdout.write(folded)
+    if args.svg:
+        with open(args.svg, 'w') as f:
+            f.write(render_svg(stacks, ', '.join(args.route or args.app or ['all routes'])))
+    print(f'{len(stacks)} stacks, {sum(stacks.values()) / 1000:.1f} ms sampled', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
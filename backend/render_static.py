@@ -0,0 +1,67 @@
+"""
+KRISHI MITRA - Static Analysis Bundles
+Renders every village's location analysis with the API's own scoring code
+into content-hashed JSON files under the hosted frontend tree, plus a small
+manifest, so the location flow is served entirely by Firebase Hosting
+
+    python backend/render_static.py [output_dir]
+
+Runs as the hosting predeploy step (firebase.json). Output layout:
+    data/manifest.json                          version + {slug: {taluk: path}}
+    data/analysis/<taluk>/<slug>.<hash>.json    same bytes as GET /api/analyze/location/<slug>
+
+Hashed files never change, so they are cached as immutable; only the
+manifest is revalidated. Hosting negotiates gzip/brotli for JSON itself.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+from app import build_location_results, crop_snapshot, VILLAGE_STORE
+from precompute import make_entry
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'data')
+
+ANALYSIS_DIR = 'analysis'
+MANIFEST_NAME = 'manifest.json'
+
+
+def render(output_dir=DEFAULT_OUTPUT_DIR):
+    """Write every village bundle and the manifest; returns the manifest"""
+    analysis_dir = os.path.join(output_dir, ANALYSIS_DIR)
+    # Start clean so bundles for removed villages or old data do not pile up
+    shutil.rmtree(analysis_dir, ignore_errors=True)
+    os.makedirs(analysis_dir)
+
+    villages = {}
+    for village_id, body in build_location_results():
+        village = VILLAGE_STORE.village(village_id)
+        entry = make_entry(body)
+        path = f'{ANALYSIS_DIR}/{village.taluk}/{village.slug}.{entry.etag[:12]}.json'
+        os.makedirs(os.path.join(output_dir, ANALYSIS_DIR, village.taluk), exist_ok=True)
+        with open(os.path.join(output_dir, path), 'wb') as f:
+            f.write(entry.body)
+        # First village per slug wins, like VILLAGE_STORE.get without a taluk
+        villages.setdefault(village.slug, {})[village.taluk] = path
+
+    version = hashlib.blake2b(json.dumps(villages, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+    manifest = {
+        'version': version,
+        'crops': crop_snapshot().digest,
+        'villages': villages,
+    }
+    tmp_path = os.path.join(output_dir, f'{MANIFEST_NAME}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
+
+
+if __name__ == '__main__':
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT_DIR
+    manifest = render(output_dir)
+    count = sum(len(taluks) for taluks in manifest['villages'].values())
+    print(f"{output_dir}: {count} village bundles, manifest {manifest['version']}")
@@ -0,0 +1,133 @@
+"""
+KRISHI MITRA - Response Layer
+Helpers for low-bandwidth clients: ?fields= projection of JSON bodies,
+content-hash ETags, and gzip/brotli bodies cached per ETag so static-ish
+responses are compressed once, not per request
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as-is; headers would eat the savings
+MIN_COMPRESS_SIZE = 512
+
+GZIP_LEVEL = 6
+# Per-request bodies get a fast setting; cached bodies are compressed once
+# and served many times, so they get the slow, small one
+BROTLI_QUALITY = 5
+BROTLI_CACHED_QUALITY = 11
+
+
+def parse_fields(text):
+    """'a,b.c,-b.d' -> (include tree, exclude tree); a tree maps key -> True or subtree"""
+    include, exclude = {}, {}
+    for field in str(text).split(','):
+        field = field.strip()
+        tree = include
+        if field.startswith('-'):
+            field, tree = field[1:], exclude
+        parts = [part for part in field.split('.') if part]
+        for i, part in enumerate(parts):
+            if tree.get(part) is True:
+                break
+            if i == len(parts) - 1:
+                tree[part] = True
+            else:
+                tree = tree.setdefault(part, {})
+    return include, exclude
+
+
+def _include(value, tree):
+    if isinstance(value, list):
+        return [_include(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: value[key] if sub is True else _include(value[key], sub)
+            for key, sub in tree.items() if key in value}
+
+
+def _exclude(value, tree):
+    if isinstance(value, list):
+        return [_exclude(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    value = dict(value)
+    for key, sub in tree.items():
+        if key not in value:
+            continue
+        if sub is True:
+            del value[key]
+        else:
+            value[key] = _exclude(value[key], sub)
+    return value
+
+
+def project(payload, fields):
+    """Keep only the included dotted paths, then drop the excluded ones
+
+    Paths apply to every element of a list, so 'recommendations.crop' keeps
+    the crop name of each recommendation. Unknown paths are ignored.
+    """
+    include, exclude = fields
+    if include:
+        payload = _include(payload, include)
+    if exclude:
+        payload = _exclude(payload, exclude)
+    return payload
+
+
+def body_etag(body):
+    """Strong ETag for a serialized body"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a werkzeug Accept-Encoding header"""
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, cached=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodies:
+    """LRU of compressed bodies keyed by (ETag, encoding)
+
+    Only for content-hash ETags, where equal tags mean equal bodies.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag, encoding, body):
+        key = (etag, encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+        compressed = compress(body, encoding, cached=True)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
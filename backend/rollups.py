@@ -0,0 +1,326 @@
+"""
+KRISHI MITRA - Soil Rollups
+Streaming per-village, taluk and district statistics over submitted lab
+reports: Welford mean/variance and a log-bucketed quantile sketch per
+parameter. Both merge exactly, so each worker folds its samples into a
+local delta and periodically merges it into one shared SQLite row per key;
+reads are a single row lookup however many samples have been seen.
+"""
+
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_ROLLUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'rollups.db')
+
+# Lab report parameters that are rolled up, with the largest plausible value
+ROLLUP_PARAMS = {'nitrogen': 2000.0, 'phosphorus': 500.0, 'potassium': 2000.0, 'ph': 14.0}
+
+LEVELS = ('village', 'taluk', 'district')
+
+# Quantiles reported by summaries
+QUANTILES = {'p10': 0.1, 'p50': 0.5, 'p90': 0.9}
+
+# Sketch quantiles are within this relative error of a true sample value
+SKETCH_ACCURACY = 0.01
+
+# Values below this land in the sketch's zero bucket
+SKETCH_MIN_VALUE = 1e-3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (level, key)
+);
+"""
+
+
+class Moments:
+    """Count, mean, sum of squared deviations (Welford), min and max"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def add(self, values):
+        """Fold in an array of values"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            mean = float(values.mean())
+            self.merge(Moments(len(values), mean, float(((values - mean) ** 2).sum()),
+                               float(values.min()), float(values.max())))
+
+    def merge(self, other):
+        """Combine with another Moments (Chan et al.); order does not matter"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self):
+        """Sample variance (0 for fewer than two values)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_list(self):
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch (DDSketch-style log buckets)
+
+    Bucket i holds values in (gamma^(i-1), gamma^i]; merging two sketches
+    adds their bucket counts, so merged quantiles are exactly those of one
+    sketch fed every value. Non-negative values only.
+    """
+
+    __slots__ = ('buckets', 'zero_count')
+
+    gamma = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+    _log_gamma = math.log(gamma)
+
+    def __init__(self, buckets=None, zero_count=0):
+        self.buckets = buckets or {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, values):
+        """Fold in an array of non-negative values"""
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values >= SKETCH_MIN_VALUE]
+        self.zero_count += len(values) - len(positive)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other):
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None when empty"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint (in relative terms) of the bucket's range
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'zero': self.zero_count, 'buckets': {str(i): c for i, c in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({int(i): c for i, c in data['buckets'].items()}, data['zero'])
+
+
+class SoilRollup:
+    """Moments and a quantile sketch for every rolled-up lab parameter"""
+
+    __slots__ = ('moments', 'sketches')
+
+    def __init__(self, moments=None, sketches=None):
+        self.moments = moments or {param: Moments() for param in ROLLUP_PARAMS}
+        self.sketches = sketches or {param: QuantileSketch() for param in ROLLUP_PARAMS}
+
+    @property
+    def count(self):
+        return self.moments['ph'].count
+
+    def add(self, samples):
+        """Fold in an (n x len(ROLLUP_PARAMS)) array of samples"""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, len(ROLLUP_PARAMS))
+        for column, param in enumerate(ROLLUP_PARAMS):
+            self.moments[param].add(samples[:, column])
+            self.sketches[param].add(samples[:, column])
+
+    def merge(self, other):
+        for param in ROLLUP_PARAMS:
+            self.moments[param].merge(other.moments[param])
+            self.sketches[param].merge(other.sketches[param])
+
+    def summary(self):
+        """JSON-ready statistics for every parameter"""
+        summary = {'samples': self.count}
+        for param in ROLLUP_PARAMS:
+            moments, sketch = self.moments[param], self.sketches[param]
+            if not moments.count:
+                summary[param] = None
+                continue
+            stats = {
+                'mean': round(moments.mean, 2),
+                'std': round(math.sqrt(moments.variance), 2),
+                'min': round(moments.min, 2),
+                'max': round(moments.max, 2),
+            }
+            for name, q in QUANTILES.items():
+                # Clamp into the exact range; a bucket midpoint can overshoot it
+                stats[name] = round(min(max(sketch.quantile(q), moments.min), moments.max), 2)
+            summary[param] = stats
+        return summary
+
+    def to_json(self):
+        return json.dumps({
+            param: {'moments': self.moments[param].to_list(), 'sketch': self.sketches[param].to_dict()}
+            for param in ROLLUP_PARAMS
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(
+            {param: Moments.from_list(data[param]['moments']) for param in ROLLUP_PARAMS},
+            {param: QuantileSketch.from_dict(data[param]['sketch']) for param in ROLLUP_PARAMS},
+        )
+
+
+def sample_row(soil_params):
+    """Rollup row for parsed lab parameters, or None if a value is implausible"""
+    row = [soil_params.get(param) for param in ROLLUP_PARAMS]
+    if not all(isinstance(v, (int, float)) and 0 <= v <= limit
+               for v, limit in zip(row, ROLLUP_PARAMS.values())):
+        return None
+    return row
+
+
+class RollupStore:
+    """Shared rollups in SQLite, fed through a per-process pending delta
+
+    add() only touches memory. A background thread merges the delta into
+    the shared rows every flush_interval seconds (as do reads and exit),
+    each key under one IMMEDIATE transaction so concurrent workers never
+    lose an update.
+    """
+
+    def __init__(self, path=DEFAULT_ROLLUP_PATH, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        # Samples pending at fork() belong to the parent, which flushes them
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+        self._start_flusher()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        # Threads do not survive fork(); each worker runs its own flusher
+        self._start_flusher()
+
+    def _start_flusher(self):
+        def flush():
+            while True:
+                time.sleep(self.flush_interval)
+                if self._pending:
+                    try:
+                        self.flush()
+                    except sqlite3.Error:
+                        # Unmerged deltas went back to pending; retried next round
+                        pass
+        threading.Thread(target=flush, name='rollups', daemon=True).start()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit; transactions are opened explicitly in flush()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def add(self, keys, samples):
+        """Fold samples into every (level, key) rollup they belong to"""
+        keys = [key for key in keys if key[1]]
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, len(ROLLUP_PARAMS))
+        if not keys or not len(samples):
+            return
+        with self._lock:
+            for key in keys:
+                self._pending.setdefault(key, SoilRollup()).add(samples)
+
+    def flush(self):
+        """Merge this process's pending samples into the shared rows"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        now = int(time.time() * 1000)
+        for (level, key), delta in list(pending.items()):
+            conn = None
+            try:
+                conn = self._connection()
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('SELECT payload FROM rollups WHERE level = ? AND key = ?', (level, key)).fetchone()
+                if row:
+                    rollup = SoilRollup.from_json(row[0])
+                    rollup.merge(delta)
+                else:
+                    rollup = delta
+                conn.execute('INSERT OR REPLACE INTO rollups (level, key, updated_at, payload) VALUES (?, ?, ?, ?)',
+                             (level, key, now, rollup.to_json()))
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn is not None and conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                self._restore(pending)
+                raise
+            del pending[level, key]
+
+    def _restore(self, pending):
+        # Put deltas that did not reach the shared rows back for the next flush
+        with self._lock:
+            for key, delta in pending.items():
+                self._pending.setdefault(key, SoilRollup()).merge(delta)
+
+    def get(self, level, key):
+        """SoilRollup for one key, or None if no sample has reached it"""
+        self.flush()
+        row = self._connection().execute(
+            'SELECT payload FROM rollups WHERE level = ? AND key = ?', (level, key)
+        ).fetchone()
+        return SoilRollup.from_json(row[0]) if row else None
+
+    def level(self, level):
+        """{key: SoilRollup} for every key at one level"""
+        self.flush()
+        rows = self._connection().execute('SELECT key, payload FROM rollups WHERE level = ?', (level,)).fetchall()
+        return {key: SoilRollup.from_json(payload) for key, payload in rows}
@@ -0,0 +1,105 @@
+"""
+KRISHI MITRA - What-if Sensitivity
+Soil score and crop suitability over a grid of N/P/K/pH values around a
+base sample in one vectorized pass, plus the values along each varied
+input where the recommended crop ranking changes
+"""
+
+import numpy as np
+
+from crop_engine import NUTRIENTS, rank_matrix, soil_score_vector, suitability_grid
+
+# Grid points per request; 100 x 100 answers in a few milliseconds
+MAX_GRID_POINTS = 10_000
+
+
+def axis_values(low, high, step, decimals):
+    """low, low + step, ... up to high (inclusive), rounded to decimals"""
+    count = int(np.floor((high - low) / step + 1e-9)) + 1
+    return np.round(low + step * np.arange(count), decimals)
+
+
+def grid_size(axes):
+    return int(np.prod([len(values) for values in axes.values()]))
+
+
+# Halvings of a grid interval when locating a ranking change; 40 pins it to
+# a trillionth of the step, far below lab precision
+BISECT_STEPS = 40
+
+
+def _change_points(matrix, low_rows, high_rows, before, threshold, limit):
+    """Fractions t in [0, 1] where the ranking first stops being before, one per row pair
+
+    Suitability is piecewise linear with jumps at range edges, so the change
+    is bisected with exact rankings rather than interpolated. Every pair is
+    bisected at once: each step scores one sample per pair.
+    """
+    lo = np.zeros(len(low_rows))
+    hi = np.ones(len(low_rows))
+    for _ in range(BISECT_STEPS):
+        mid = (lo + hi) / 2
+        rows = low_rows + (high_rows - low_rows) * mid[:, None]
+        same = np.all(rank_matrix(suitability_grid(matrix, rows), threshold, limit) == before, axis=1)
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    return (lo + hi) / 2
+
+
+def ranking_flips(matrix, samples, column, suitability, threshold=70, limit=5):
+    """[(i, value, ranking before, ranking after)] along one swept input
+
+    samples are the sweep's input rows and suitability their scores; value
+    is where, between samples[i] and samples[i + 1], the ranking changes.
+    Rankings are tuples of crop indices, best first, as rank_crops returns them.
+    """
+    ranks = rank_matrix(suitability, threshold, limit)
+    changed = np.flatnonzero(np.any(ranks[1:] != ranks[:-1], axis=1))
+    if not len(changed):
+        return []
+    t = _change_points(matrix, samples[changed], samples[changed + 1], ranks[changed], threshold, limit)
+    values = samples[:, column]
+    at = values[changed] + (values[changed + 1] - values[changed]) * t
+    return [
+        (i, float(value), tuple(int(c) for c in ranks[i] if c >= 0), tuple(int(c) for c in ranks[i + 1] if c >= 0))
+        for i, value in zip(changed.tolist(), at)
+    ]
+
+
+def what_if(matrix, base, axes, threshold=70, limit=5):
+    """Evaluate a base sample, the grid over axes and a sweep of each axis alone
+
+    base maps every NUTRIENTS param to a value; axes maps one or more varied
+    params to arrays of values, in the order of the grid dimensions. Every
+    sample goes through one soil_score_vector and one suitability_grid call.
+    Returns (base score, base suitability, score grid, suitability grid with
+    crops as the last axis, {param: flips}).
+    """
+    base_row = np.array([base[nutrient] for nutrient in NUTRIENTS], dtype=np.float64)
+    columns = [NUTRIENTS.index(param) for param in axes]
+
+    mesh = np.meshgrid(*axes.values(), indexing='ij')
+    grid = np.tile(base_row, (grid_size(axes), 1))
+    for column, values in zip(columns, mesh):
+        grid[:, column] = values.ravel()
+
+    # Sweeps hold the other inputs at the base, which grid points need not hit
+    sweeps = []
+    for column, values in zip(columns, axes.values()):
+        sweep = np.tile(base_row, (len(values), 1))
+        sweep[:, column] = values
+        sweeps.append(sweep)
+
+    samples = np.vstack([base_row[None, :], grid] + sweeps)
+    scores = soil_score_vector(samples)
+    suitability = suitability_grid(matrix, samples)
+
+    end = 1 + len(grid)
+    flips = {}
+    for (param, values), column, sweep in zip(axes.items(), columns, sweeps):
+        flips[param] = ranking_flips(matrix, sweep, column, suitability[end:end + len(values)], threshold, limit)
+        end += len(values)
+
+    shape = mesh[0].shape
+    return (int(scores[0]), suitability[0], scores[1:1 + len(grid)].reshape(shape),
+            suitability[1:1 + len(grid)].reshape(shape + (len(matrix),)), flips)
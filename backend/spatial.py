@@ -0,0 +1,124 @@
+"""
+KRISHI MITRA - Spatial Index
+Uniform lat/lon grid over village coordinates for nearest-village and
+k-nearest queries without scanning the whole state
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 110.57
+
+# ~11 km cells keep a handful of villages per cell at statewide density
+DEFAULT_CELL_DEG = 0.1
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance, vectorized over NumPy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialGrid:
+    """Bucket points into fixed-size lat/lon cells and search outward in rings"""
+
+    def __init__(self, lat, lon, ids, cell_deg=DEFAULT_CELL_DEG):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+        keep = ~(np.isnan(lat) | np.isnan(lon))
+
+        self.lat, self.lon, self.ids = lat[keep], lon[keep], ids[keep]
+        self.cell_deg = cell_deg
+        self.cells = {}
+
+        if not len(self.ids):
+            self._row_span = self._col_span = (0, -1)
+            self._km_per_deg_lon = 0.0
+            return
+
+        rows = np.floor(self.lat / cell_deg).astype(np.int64)
+        cols = np.floor(self.lon / cell_deg).astype(np.int64)
+        # One sort groups every cell's points into a contiguous slice
+        order = np.lexsort((cols, rows))
+        keys = np.stack((rows[order], cols[order]), axis=1)
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            self.cells[(int(keys[start, 0]), int(keys[start, 1]))] = order[start:end]
+
+        self._row_span = (int(rows.min()), int(rows.max()))
+        self._col_span = (int(cols.min()), int(cols.max()))
+        # Narrowest longitude degree in the data, so ring bounds stay conservative
+        self._km_per_deg_lon = 111.32 * math.cos(math.radians(float(np.abs(self.lat).max())))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def nearest(self, lat, lon, k=1, max_km=None):
+        """(ids, distances_km) of the k closest points, closest first
+
+        With max_km, returns nothing as soon as the searched rings show no
+        point can be that close, so far-away queries stop after a few rings.
+        """
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        k = min(k, len(self.ids))
+        row = math.floor(lat / self.cell_deg)
+        col = math.floor(lon / self.cell_deg)
+        max_radius = max(
+            abs(row - self._row_span[0]), abs(row - self._row_span[1]),
+            abs(col - self._col_span[0]), abs(col - self._col_span[1])
+        )
+        cell_km = self.cell_deg * min(KM_PER_DEG_LAT, self._km_per_deg_lon)
+
+        found = []
+        radius = 0
+        while radius <= max_radius:
+            for key in self._ring(row, col, radius):
+                members = self.cells.get(key)
+                if members is not None:
+                    found.append(members)
+            if found:
+                candidates = np.concatenate(found)
+                if len(candidates) >= k:
+                    distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+                    kth = np.partition(distances, k - 1)[k - 1]
+                    # Anything outside the searched rings is at least this far away
+                    if kth <= radius * cell_km:
+                        break
+            elif max_km is not None and radius * cell_km > max_km:
+                # Every point beyond the searched rings is farther than max_km
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            radius += 1
+        else:
+            candidates = np.concatenate(found)
+            distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+
+        best = np.argsort(distances, kind='stable')[:k]
+        return self.ids[candidates[best]], distances[best]
+
+
+def idw_weights(distances_km, power=2):
+    """Inverse-distance weights summing to 1; an exact hit takes all the weight"""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    exact = distances_km < 1e-6
+    if exact.any():
+        return exact / exact.sum()
+    weights = 1.0 / distances_km ** power
+    return weights / weights.sum()
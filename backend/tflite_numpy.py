@@ -0,0 +1,199 @@
+"""
+KRISHI MITRA - NumPy TFLite Interpreter
+Reads a .tflite flatbuffer directly and runs the small op set our model
+uses (fully connected, including int8 dynamic-range weights, activations
+and softmax) on whole batches with NumPy
+"""
+
+import struct
+
+import numpy as np
+
+# Builtin operator codes from the TFLite schema
+FULLY_CONNECTED = 9
+LOGISTIC = 14
+RELU = 19
+RELU6 = 21
+RESHAPE = 22
+SOFTMAX = 25
+TANH = 28
+
+# Fused activation function enum
+ACTIVATIONS = {
+    0: lambda x: x,
+    1: lambda x: np.maximum(x, 0),
+    2: lambda x: np.clip(x, -1, 1),
+    3: lambda x: np.clip(x, 0, 6),
+    4: np.tanh,
+}
+
+TENSOR_TYPES = {0: np.float32, 2: np.int32, 3: np.uint8, 4: np.int64, 9: np.int8}
+
+
+class _Table:
+    """Read-only view of one flatbuffer table"""
+
+    __slots__ = ('buf', 'pos')
+
+    def __init__(self, buf, pos):
+        self.buf = buf
+        self.pos = pos
+
+    def _field(self, index):
+        vtable = self.pos - struct.unpack_from('<i', self.buf, self.pos)[0]
+        size = struct.unpack_from('<H', self.buf, vtable)[0]
+        if 4 + 2 * index >= size:
+            return None
+        offset = struct.unpack_from('<H', self.buf, vtable + 4 + 2 * index)[0]
+        return self.pos + offset if offset else None
+
+    def _indirect(self, pos):
+        return pos + struct.unpack_from('<I', self.buf, pos)[0]
+
+    def scalar(self, index, fmt, default=0):
+        pos = self._field(index)
+        return default if pos is None else struct.unpack_from('<' + fmt, self.buf, pos)[0]
+
+    def table(self, index):
+        pos = self._field(index)
+        return None if pos is None else _Table(self.buf, self._indirect(pos))
+
+    def string(self, index):
+        pos = self._field(index)
+        if pos is None:
+            return None
+        start = self._indirect(pos)
+        length = struct.unpack_from('<I', self.buf, start)[0]
+        return bytes(self.buf[start + 4:start + 4 + length]).decode('utf-8')
+
+    def _vector(self, index):
+        pos = self._field(index)
+        if pos is None:
+            return 0, 0
+        start = self._indirect(pos)
+        return start + 4, struct.unpack_from('<I', self.buf, start)[0]
+
+    def tables(self, index):
+        start, length = self._vector(index)
+        return [_Table(self.buf, self._indirect(start + 4 * i)) for i in range(length)]
+
+    def array(self, index, dtype):
+        start, length = self._vector(index)
+        return np.frombuffer(self.buf, dtype=dtype, count=length, offset=start) if length else np.zeros(0, dtype)
+
+
+def quantize_rows(x):
+    """Per-row asymmetric int8 quantization, as TFLite does for hybrid kernels
+
+    Returns (quantized, scale, zero_point) with one scale and zero point per row.
+    """
+    low = np.minimum(x.min(axis=1), 0)
+    high = np.maximum(x.max(axis=1), 0)
+    scale = (high - low) / 255
+    empty = scale == 0
+    scale = np.where(empty, 1, scale)
+    zero_point = np.where(empty, 0, np.clip(np.round(-128 - low / scale), -128, 127))
+    quantized = np.clip(np.round(x / scale[:, None]) + zero_point[:, None], -128, 127)
+    return quantized, scale, zero_point
+
+
+class NumpyModel:
+    """Batched interpreter for a float (or dynamic-range int8) TFLite model"""
+
+    backend = 'numpy'
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            buf = f.read()
+        if buf[4:8] != b'TFL3':
+            raise ValueError(f'{path} is not a TFLite model')
+
+        model = _Table(buf, struct.unpack_from('<I', buf, 0)[0])
+        opcodes = [
+            max(code.scalar(0, 'b'), code.scalar(3, 'i'))
+            for code in model.tables(1)
+        ]
+        buffers = model.tables(4)
+        subgraphs = model.tables(2)
+        if len(subgraphs) != 1:
+            raise ValueError('Only single-subgraph models are supported')
+        graph = subgraphs[0]
+
+        self.constants = {}
+        self.names = []
+        self.scales = {}
+        for index, tensor in enumerate(graph.tables(0)):
+            self.names.append(tensor.string(3))
+            data = buffers[tensor.scalar(2, 'I')].array(0, np.uint8)
+            if not len(data):
+                continue
+            dtype = TENSOR_TYPES.get(tensor.scalar(1, 'b'))
+            if dtype is None:
+                raise ValueError(f'Unsupported tensor type in {self.names[-1]}')
+            shape = tuple(int(d) for d in tensor.array(0, np.int32))
+            self.constants[index] = data.view(dtype).reshape(shape)
+            quantization = tensor.table(4)
+            if quantization is not None and dtype is np.int8:
+                self.scales[index] = quantization.array(2, np.float32).astype(np.float64)
+
+        self.ops = []
+        for op in graph.tables(3):
+            code = opcodes[op.scalar(0, 'I')]
+            if code not in (FULLY_CONNECTED, LOGISTIC, RELU, RELU6, RESHAPE, SOFTMAX, TANH):
+                raise ValueError(f'Unsupported TFLite operator {code}')
+            options = op.table(4)
+            self.ops.append((code, list(op.array(1, np.int32)), list(op.array(2, np.int32)), options))
+
+        inputs = list(graph.array(1, np.int32))
+        outputs = list(graph.array(2, np.int32))
+        # Signature names (output_0, ...) are the stable public names
+        signatures = model.tables(7)
+        if signatures:
+            inputs = [m.scalar(1, 'I') for m in signatures[0].tables(0)] or inputs
+            self.output_map = {m.string(0): m.scalar(1, 'I') for m in signatures[0].tables(1)}
+        else:
+            self.output_map = {self.names[i]: i for i in outputs}
+        if len(inputs) != 1:
+            raise ValueError('Only single-input models are supported')
+        self.input_index = inputs[0]
+        self.input_size = int(graph.tables(0)[self.input_index].array(0, np.int32)[-1])
+        self.output_names = sorted(self.output_map)
+
+    def _fully_connected(self, x, weights_index, bias_index, options):
+        activation = options.scalar(0, 'b') if options else 0
+        weights = self.constants[weights_index]
+        x = x.reshape(len(x), -1)
+        if weights.dtype == np.int8:
+            # Dynamic-range weights: quantize the activations per row and
+            # accumulate in integers, matching the reference hybrid kernel
+            quantized, scale, zero_point = quantize_rows(x)
+            acc = (quantized - zero_point[:, None]) @ weights.T.astype(np.float64)
+            y = acc * scale[:, None] * self.scales[weights_index]
+        else:
+            y = x @ weights.T.astype(np.float64)
+        if bias_index >= 0:
+            y = y + self.constants[bias_index]
+        return ACTIVATIONS[activation](y)
+
+    def predict(self, features):
+        """Run a batch (n x input_size) and return {output_name: array with n rows}"""
+        values = dict(self.constants)
+        values[self.input_index] = np.asarray(features, dtype=np.float64).reshape(-1, self.input_size)
+
+        for code, inputs, outputs, options in self.ops:
+            x = values[inputs[0]]
+            if code == FULLY_CONNECTED:
+                y = self._fully_connected(x, inputs[1], inputs[2] if len(inputs) > 2 else -1, options)
+            elif code == SOFTMAX:
+                beta = options.scalar(0, 'f', 1.0) if options else 1.0
+                z = beta * (x - x.max(axis=-1, keepdims=True))
+                y = np.exp(z)
+                y /= y.sum(axis=-1, keepdims=True)
+            elif code == RESHAPE:
+                y = x.reshape(len(x), *self.constants[inputs[1]][1:]) if len(inputs) > 1 else x
+            else:
+                y = {LOGISTIC: lambda v: 1 / (1 + np.exp(-v)), RELU: ACTIVATIONS[1],
+                     RELU6: ACTIVATIONS[3], TANH: np.tanh}[code](x)
+            values[outputs[0]] = y
+
+        return {name: values[index].astype(np.float32) for name, index in self.output_map.items()}
@@ -0,0 +1,356 @@
+"""
+KRISHI MITRA - Memory-Mapped Village File
+Fixed-width columnar village file read through mmap. Every column is a
+NumPy view straight into the mapped pages, so all gunicorn workers share
+one page-cache copy however many villages there are, and opening the file
+costs the same for 26 villages or 600,000.
+
+    python backend/village_file.py mysuru-data.json instance/villages.kmv \\
+        --gazetteer mysuru-gazetteer.json
+
+Layout: magic 'KMVILL01', u64 header length, UTF-8 JSON header (row count,
+taluk table, soil types, and dtype/offset/length of every column), then the
+columns, each 64-byte aligned. Lookup indexes (slug, pincode, taluk, search
+keys) are stored pre-sorted, so lookups are binary searches over the map.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from spatial import SpatialGrid
+from villages import (SOIL_DTYPE, SOIL_RANGES, DEFAULT_DATA_PATH, DEFAULT_GAZETTEER_PATH,
+                      Village, slugify, load_village_store, load_gazetteer)
+
+DEFAULT_VILLAGE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'villages.kmv')
+
+MAGIC = b'KMVILL01'
+PREAMBLE = struct.Struct('<8sQ')
+ALIGN = 64
+
+
+def _fixed_width(values):
+    """Fixed-width bytes column wide enough for the longest UTF-8 value"""
+    encoded = [v.encode('utf-8') for v in values]
+    width = max([len(v) for v in encoded] + [1])
+    return np.array(encoded, dtype=f'S{width}')
+
+
+def _search_keys(village):
+    keys = set(village.slug.split('_')) | {village.slug}
+    if village.pincode:
+        keys.add(village.pincode)
+    return keys
+
+
+def build_columns(store):
+    """{column: array} for every village in a VillageStore, plus the header tables"""
+    villages = store.villages
+    taluk_slugs = list(store.taluks)
+    taluk_index = {slug: i for i, slug in enumerate(taluk_slugs)}
+    taluk_meta = {}
+    for village in villages:
+        taluk_meta.setdefault(village.taluk, {
+            'slug': village.taluk, 'name': village.taluk_name,
+            'district': village.district, 'state': village.state
+        })
+    soil_types = sorted({v.soil_type for v in villages if v.soil_type})
+    soil_type_index = {name: i for i, name in enumerate(soil_types)}
+
+    ids = np.arange(len(villages), dtype=np.uint32)
+    columns = {
+        'name': _fixed_width([v.name for v in villages]),
+        'slug': _fixed_width([v.slug for v in villages]),
+        'taluk': np.array([taluk_index[v.taluk] for v in villages], dtype=np.uint32),
+        'pincode': _fixed_width([v.pincode or '' for v in villages]),
+        'soil_type': np.array([soil_type_index.get(v.soil_type, -1) for v in villages], dtype=np.int32),
+        'lat': np.full(len(villages), np.nan),
+        'lon': np.full(len(villages), np.nan),
+    }
+    for village in villages:
+        location = store.location(village)
+        if location is not None:
+            columns['lat'][village.id], columns['lon'][village.id] = location
+    soil = store.soil
+    for field in SOIL_DTYPE.names:
+        columns[f'soil_{field}'] = np.ascontiguousarray(soil[field])
+
+    # Sorted indexes; ties keep id order so lookups match insertion order
+    order = np.lexsort((ids, columns['slug']))
+    columns['slug_ids'], columns['slug_sorted'] = ids[order], columns['slug'][order]
+
+    has_pin = np.flatnonzero(columns['pincode'] != b'')
+    order = has_pin[np.lexsort((has_pin, columns['pincode'][has_pin]))]
+    columns['pincode_ids'], columns['pincode_sorted'] = ids[order], columns['pincode'][order]
+
+    order = np.lexsort((ids, columns['taluk']))
+    columns['taluk_ids'] = ids[order]
+    columns['taluk_offsets'] = np.searchsorted(
+        columns['taluk'][order], np.arange(len(taluk_slugs) + 1)
+    ).astype(np.uint32)
+
+    pairs = sorted((key, v.id) for v in villages for key in _search_keys(v))
+    columns['search_keys'] = _fixed_width([key for key, _ in pairs])
+    columns['search_ids'] = np.array([i for _, i in pairs], dtype=np.uint32)
+
+    tables = {
+        'taluks': [taluk_meta[slug] for slug in taluk_slugs],
+        'soil_types': soil_types,
+        'max_search_keys': max([len(_search_keys(v)) for v in villages] + [1]),
+    }
+    return columns, tables
+
+
+def encode_village_file(store):
+    """Village file bytes for a VillageStore"""
+    columns, tables = build_columns(store)
+    layout, offset = {}, 0
+    for name, array in columns.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+        offset += array.nbytes
+
+    body = bytearray(offset)
+    for name, array in columns.items():
+        start = layout[name]['offset']
+        body[start:start + array.nbytes] = array.tobytes()
+    meta = dict(tables, rows=len(store), columns=layout)
+    digest = hashlib.blake2b(json.dumps(meta, sort_keys=True).encode('utf-8') + body, digest_size=16).hexdigest()
+
+    header = json.dumps(dict(meta, digest=digest), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # Pad the header so the first column starts aligned
+    pad = -(PREAMBLE.size + len(header)) % ALIGN
+    header += b' ' * pad
+    return PREAMBLE.pack(MAGIC, len(header)) + header + bytes(body), digest
+
+
+def write_village_file(store, path=DEFAULT_VILLAGE_FILE):
+    """Write a village file atomically unless an identical one exists; returns its digest"""
+    data, digest = encode_village_file(store)
+    if file_digest(path) == digest:
+        return digest
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Processes that already mapped the old file keep reading the old inode
+    os.replace(tmp_path, path)
+    return digest
+
+
+def read_header(f):
+    """Parsed JSON header and the offset where the columns start"""
+    preamble = f.read(PREAMBLE.size)
+    if len(preamble) < PREAMBLE.size:
+        raise ValueError('Not a village file')
+    magic, header_len = PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise ValueError('Not a village file')
+    return json.loads(f.read(header_len)), PREAMBLE.size + header_len
+
+
+def file_digest(path):
+    """Digest of an existing village file, or None"""
+    try:
+        with open(path, 'rb') as f:
+            return read_header(f)[0]['digest']
+    except (OSError, ValueError):
+        return None
+
+
+class _VillageSequence:
+    """Lazy list-like view creating Village objects on access"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, village_id):
+        return self._store.village(village_id)
+
+    def __iter__(self):
+        return (self._store.village(i) for i in range(len(self._store)))
+
+
+class MappedVillageStore:
+    """Read-only village repository over a memory-mapped village file
+
+    Same lookup API as VillageStore; Village objects are built on demand
+    from the mapped columns, never kept for the whole dataset.
+    """
+
+    def __init__(self, path=DEFAULT_VILLAGE_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            header, body_start = read_header(f)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.digest = header['digest']
+        # Derived caches key on this; a new file means a new version
+        self.version = self.digest
+        self._rows = header['rows']
+        self._taluks = header['taluks']
+        self._soil_types = header['soil_types']
+        self._max_search_keys = header['max_search_keys']
+        self.taluks = {t['slug']: t['name'] for t in self._taluks}
+        self._taluk_number = {t['slug']: i for i, t in enumerate(self._taluks)}
+
+        self.columns = {}
+        for name, spec in header['columns'].items():
+            dtype = np.dtype(spec['dtype'])
+            end = body_start + spec['offset'] + spec['length'] * dtype.itemsize
+            if end > len(self._map):
+                raise ValueError(f'{path} is truncated')
+            # Zero-copy: the array reads straight from the shared mapping
+            self.columns[name] = np.frombuffer(self._map, dtype, spec['length'], body_start + spec['offset'])
+
+        self.villages = _VillageSequence(self)
+        self._spatial = None
+
+    def __len__(self):
+        return self._rows
+
+    def village(self, village_id):
+        """Village for an id, built from the mapped columns"""
+        village_id = int(village_id)
+        c = self.columns
+        taluk = self._taluks[c['taluk'][village_id]]
+        soil_type = int(c['soil_type'][village_id])
+        return Village(
+            village_id,
+            c['name'][village_id].decode('utf-8'),
+            taluk['name'], taluk['district'], taluk['state'],
+            pincode=c['pincode'][village_id].decode('utf-8') or None,
+            soil_type=self._soil_types[soil_type] if soil_type >= 0 else None
+        )
+
+    def district(self, taluk):
+        """District a taluk belongs to, or None for an unknown taluk"""
+        number = self._taluk_number.get(slugify(taluk))
+        return None if number is None else self._taluks[number]['district']
+
+    # ---------- soil ----------
+
+    def _soil_columns(self, ids):
+        c = self.columns
+        values = {'ph': c['soil_ph'][ids]}
+        for column, _, _ in SOIL_RANGES:
+            values[column] = c[f'soil_{column}_mid'][ids]
+        return values
+
+    def soil_params(self, village):
+        """Average soil parameters for a village, read from the soil columns"""
+        params = {key: float(value) for key, value in self._soil_columns(village.id).items()}
+        params['type'] = village.soil_type
+        return params
+
+    def taluk_soil_means(self, taluk):
+        """Mean ph and midpoint nutrients across a taluk's villages"""
+        ids = self._taluk_ids(taluk)
+        if not len(ids):
+            return None
+        return {key: float(values.mean()) for key, values in self._soil_columns(ids).items()}
+
+    def blended_soil_params(self, villages, weights):
+        """Weighted average of several villages' soil parameters"""
+        weights = np.asarray(weights, dtype=np.float64)
+        values = self._soil_columns([v.id for v in villages])
+        params = {key: float(column @ weights) for key, column in values.items()}
+        params['type'] = villages[int(np.argmax(weights))].soil_type
+        return params
+
+    # ---------- lookups ----------
+
+    def _equal_range(self, sorted_column, value):
+        if len(value) > sorted_column.dtype.itemsize:
+            return 0, 0
+        lo = np.searchsorted(sorted_column, value, 'left')
+        hi = np.searchsorted(sorted_column, value, 'right')
+        return lo, hi
+
+    def _taluk_ids(self, taluk):
+        number = self._taluk_number.get(slugify(taluk))
+        if number is None:
+            return self.columns['taluk_ids'][:0]
+        offsets = self.columns['taluk_offsets']
+        return self.columns['taluk_ids'][offsets[number]:offsets[number + 1]]
+
+    def get(self, slug, taluk=None):
+        """Resolve a village slug, optionally within a taluk"""
+        lo, hi = self._equal_range(self.columns['slug_sorted'], slugify(slug).encode('utf-8'))
+        wanted = None if taluk is None else self._taluk_number.get(slugify(taluk), -1)
+        for village_id in self.columns['slug_ids'][lo:hi]:
+            if wanted is None or self.columns['taluk'][village_id] == wanted:
+                return self.village(village_id)
+        return None
+
+    def by_pin(self, pincode):
+        """All villages sharing a pincode"""
+        lo, hi = self._equal_range(self.columns['pincode_sorted'], str(pincode).encode('utf-8'))
+        return [self.village(i) for i in self.columns['pincode_ids'][lo:hi]]
+
+    def in_taluk(self, taluk):
+        """All villages in a taluk"""
+        return [self.village(i) for i in self._taluk_ids(taluk)]
+
+    def search(self, query, limit=10):
+        """Villages whose name words, slug or pincode start with query"""
+        prefix = slugify(query).encode('utf-8')
+        keys = self.columns['search_keys']
+        if not prefix or len(prefix) > keys.dtype.itemsize:
+            return []
+        lo = np.searchsorted(keys, prefix, 'left')
+        # Keys are [a-z0-9_]; 0x7f sorts after every continuation
+        hi = np.searchsorted(keys, prefix + b'\x7f', 'left')
+        ids = self.columns['search_ids'][lo:hi]
+        # Lowest ids first, like the trie. A village repeats at most
+        # max_search_keys times, so the smallest limit * max_search_keys
+        # entries hold the first `limit` distinct ids without sorting them all.
+        keep = limit * self._max_search_keys
+        if len(ids) > keep:
+            ids = np.partition(ids, keep - 1)[:keep]
+        return [self.village(i) for i in np.unique(ids)[:limit]]
+
+    # ---------- coordinates ----------
+
+    @property
+    def spatial(self):
+        """Grid index over villages with coordinates, built on first use"""
+        if self._spatial is None:
+            lat, lon = self.columns['lat'], self.columns['lon']
+            ids = np.flatnonzero(~np.isnan(lat))
+            self._spatial = SpatialGrid(lat[ids], lon[ids], ids)
+        return self._spatial
+
+    def nearest(self, lat, lon, k=1, max_km=None):
+        """[(village, distance_km)] for the k villages closest to a point (none if none within max_km)"""
+        ids, distances = self.spatial.nearest(lat, lon, k, max_km)
+        return [(self.village(i), float(d)) for i, d in zip(ids, distances)]
+
+
+def convert(data_path=DEFAULT_DATA_PATH, output=DEFAULT_VILLAGE_FILE, gazetteer=DEFAULT_GAZETTEER_PATH):
+    """mysuru-data.json layout (+ optional gazetteer) -> village file"""
+    store = load_village_store(data_path)
+    if gazetteer:
+        load_gazetteer(store, gazetteer)
+    return store, write_village_file(store, output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a district JSON file into a memory-mapped village file')
+    parser.add_argument('data', nargs='?', default=DEFAULT_DATA_PATH)
+    parser.add_argument('output', nargs='?', default=DEFAULT_VILLAGE_FILE)
+    parser.add_argument('--gazetteer', default=DEFAULT_GAZETTEER_PATH, help="coordinates file ('' to skip)")
+    args = parser.parse_args()
+    store, digest = convert(args.data, args.output, args.gazetteer)
+    print(f'{args.output}: {len(store)} villages, {os.path.getsize(args.output)} bytes, digest {digest}')
@@ -0,0 +1,278 @@
+"""
+KRISHI MITRA - Village Store
+Loads village data once and indexes it by slug, pincode and taluk,
+with a prefix trie for location autocomplete
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+from spatial import SpatialGrid
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mysuru-data.json')
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mysuru-gazetteer.json')
+
+# Ids kept per trie node; bounds memory at statewide scale
+TRIE_NODE_CAP = 50
+
+# ========== SOIL COLUMNS ==========
+
+# Range-valued nutrients: (column, source field, expected unit)
+SOIL_RANGES = (
+    ('nitrogen', 'nitrogen_range', 'kg/ha'),
+    ('phosphorus', 'phosphorus_range', 'kg/ha'),
+    ('potassium', 'potassium_range', 'kg/ha'),
+    ('organic_carbon', 'organic_carbon', '%'),
+)
+
+# One row per village id, parsed once at load time
+SOIL_DTYPE = np.dtype(
+    [('ph', 'f8')] +
+    [(f'{column}_{part}', 'f8') for column, _, _ in SOIL_RANGES for part in ('low', 'high', 'mid')]
+)
+
+RANGE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(?:-\s*(\d+(?:\.\d+)?))?\s*(\S*)\s*$')
+
+
+def slugify(text):
+    """'T. Narasipura Town' -> 't_narasipura_town'"""
+    return re.sub(r'[^a-z0-9]+', '_', str(text).lower()).strip('_')
+
+
+def parse_range(text, unit):
+    """'350-600 kg/ha' -> (350.0, 600.0), checking the unit"""
+    match = RANGE_PATTERN.match(str(text))
+    if not match:
+        raise ValueError(f'Unparseable range {text!r}')
+    low, high, found_unit = match.groups()
+    if found_unit != unit:
+        raise ValueError(f'Expected unit {unit!r} in {text!r}')
+    low = float(low)
+    high = float(high) if high is not None else low
+    if low > high:
+        raise ValueError(f'Inverted range {text!r}')
+    return low, high
+
+
+def soil_row(record):
+    """Numeric soil row for a village record (range strings or legacy avg_soil)"""
+    if 'avg_soil' in record:
+        soil = record['avg_soil']
+        row = [float(soil['ph'])]
+        for column, _, _ in SOIL_RANGES:
+            value = float(soil[column])
+            row += [value, value, value]
+        return tuple(row)
+
+    row = [float(record['typical_ph'])]
+    for column, field, unit in SOIL_RANGES:
+        low, high = parse_range(record[field], unit)
+        row += [low, high, (low + high) / 2]
+    return tuple(row)
+
+
+class Village:
+    """One village record with its taluk and source fields"""
+
+    __slots__ = ('id', 'slug', 'name', 'taluk', 'taluk_name', 'district', 'state', 'pincode', 'soil_type', 'record')
+
+    def __init__(self, id, name, taluk_name, district=None, state=None, pincode=None, soil_type=None, record=None):
+        self.id = id
+        self.slug = slugify(name)
+        self.name = name
+        self.taluk = slugify(taluk_name)
+        self.taluk_name = taluk_name
+        self.district = district
+        self.state = state
+        self.pincode = pincode
+        self.soil_type = soil_type
+        self.record = record
+
+    @classmethod
+    def from_record(cls, id, name, taluk_name, record, district=None, state=None):
+        """Village from a source record (mysuru-data.json or legacy avg_soil layout)"""
+        return cls(
+            id, name, taluk_name, district, state,
+            pincode=str(record.get('pincode', '')) or None,
+            soil_type=record.get('soil_type') or record.get('avg_soil', {}).get('type'),
+            record=record
+        )
+
+    def summary(self):
+        """Small JSON-ready description used by search results"""
+        return {
+            'slug': self.slug,
+            'name': self.name,
+            'taluk': self.taluk,
+            'taluk_name': self.taluk_name,
+            'pincode': self.pincode,
+            'soil_type': self.soil_type
+        }
+
+
+class VillageStore:
+    """In-memory village repository with O(1) lookups and prefix search"""
+
+    def __init__(self):
+        self.villages = []
+        self.taluks = {}
+        self.by_slug = {}
+        self.by_pincode = {}
+        self.by_taluk = {}
+        self._trie = {}
+        self._soil_rows = []
+        self._soil = None
+        # Bumped on every change so derived caches know to rebuild
+        self.version = 0
+        self._coordinates = {}
+        self._spatial = None
+
+    def __len__(self):
+        return len(self.villages)
+
+    def add(self, name, taluk_name, record, district=None, state=None):
+        """Register a village and index it"""
+        village = Village.from_record(len(self.villages), name, taluk_name, record, district, state)
+        try:
+            self._soil_rows.append(soil_row(record))
+        except (KeyError, ValueError) as e:
+            raise ValueError(f'Village {name!r} ({taluk_name}): {e}') from None
+        self._soil = None
+        self._spatial = None
+        self.version += 1
+        self.villages.append(village)
+        self.taluks.setdefault(village.taluk, taluk_name)
+
+        self.by_slug.setdefault(village.slug, []).append(village.id)
+        self.by_taluk.setdefault(village.taluk, []).append(village.id)
+        if village.pincode:
+            self.by_pincode.setdefault(village.pincode, []).append(village.id)
+
+        keys = set(village.slug.split('_')) | {village.slug}
+        if village.pincode:
+            keys.add(village.pincode)
+        for key in keys:
+            self._index_prefix(key, village.id)
+        return village
+
+    def _index_prefix(self, key, village_id):
+        node = self._trie
+        for char in key:
+            node = node.setdefault(char, {})
+            ids = node.setdefault('', [])
+            if len(ids) < TRIE_NODE_CAP and village_id not in ids:
+                ids.append(village_id)
+
+    @property
+    def soil(self):
+        """Columnar soil table (NumPy structured array) indexed by village id"""
+        if self._soil is None:
+            self._soil = np.array(self._soil_rows, dtype=SOIL_DTYPE)
+        return self._soil
+
+    def soil_params(self, village):
+        """Average soil parameters for a village, read from the soil table"""
+        row = self.soil[village.id]
+        params = {'ph': float(row['ph'])}
+        for column, _, _ in SOIL_RANGES:
+            params[column] = float(row[f'{column}_mid'])
+        params['type'] = village.soil_type
+        return params
+
+    def taluk_soil_means(self, taluk):
+        """Mean ph and midpoint nutrients across a taluk's villages"""
+        rows = self.soil[self.by_taluk.get(slugify(taluk), [])]
+        if not len(rows):
+            return None
+        means = {'ph': float(rows['ph'].mean())}
+        for column, _, _ in SOIL_RANGES:
+            means[column] = float(rows[f'{column}_mid'].mean())
+        return means
+
+    def blended_soil_params(self, villages, weights):
+        """Weighted average of several villages' soil parameters"""
+        rows = self.soil[[v.id for v in villages]]
+        weights = np.asarray(weights, dtype=np.float64)
+        params = {'ph': float(rows['ph'] @ weights)}
+        for column, _, _ in SOIL_RANGES:
+            params[column] = float(rows[f'{column}_mid'] @ weights)
+        params['type'] = villages[int(np.argmax(weights))].soil_type
+        return params
+
+    def set_coordinates(self, village, lat, lon):
+        """Attach a village's location for nearest-village lookups"""
+        self._coordinates[village.id] = (float(lat), float(lon))
+        self._spatial = None
+
+    def location(self, village):
+        """(lat, lon) of a village, or None if the gazetteer has no entry"""
+        return self._coordinates.get(village.id)
+
+    @property
+    def spatial(self):
+        """Grid index over villages with coordinates, built on first use"""
+        if self._spatial is None:
+            ids = list(self._coordinates)
+            lat = [self._coordinates[i][0] for i in ids]
+            lon = [self._coordinates[i][1] for i in ids]
+            self._spatial = SpatialGrid(lat, lon, ids)
+        return self._spatial
+
+    def nearest(self, lat, lon, k=1, max_km=None):
+        """[(village, distance_km)] for the k villages closest to a point (none if none within max_km)"""
+        ids, distances = self.spatial.nearest(lat, lon, k, max_km)
+        return [(self.villages[int(i)], float(d)) for i, d in zip(ids, distances)]
+
+    def get(self, slug, taluk=None):
+        """Resolve a village slug, optionally within a taluk"""
+        for village_id in self.by_slug.get(slugify(slug), ()):
+            village = self.villages[village_id]
+            if taluk is None or village.taluk == slugify(taluk):
+                return village
+        return None
+
+    def by_pin(self, pincode):
+        """All villages sharing a pincode"""
+        return [self.villages[i] for i in self.by_pincode.get(str(pincode), ())]
+
+    def in_taluk(self, taluk):
+        """All villages in a taluk"""
+        return [self.villages[i] for i in self.by_taluk.get(slugify(taluk), ())]
+
+    def search(self, query, limit=10):
+        """Villages whose name words, slug or pincode start with query"""
+        node = self._trie
+        for char in slugify(query):
+            node = node.get(char)
+            if node is None:
+                return []
+        return [self.villages[i] for i in node.get('', ())[:limit]]
+
+
+def load_village_store(path=DEFAULT_DATA_PATH):
+    """Build a VillageStore from a district JSON file (mysuru-data.json layout)"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    store = VillageStore()
+    for taluk in data.get('taluks', []):
+        for record in taluk.get('villages', []):
+            store.add(record['name'], taluk['name'], record, data.get('district'), data.get('state'))
+    return store
+
+
+def load_gazetteer(store, path=DEFAULT_GAZETTEER_PATH):
+    """Attach coordinates from a gazetteer file, matched on taluk and village name"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    matched = 0
+    for entry in data.get('villages', []):
+        village = store.get(entry['name'], entry['taluk'])
+        if village is not None:
+            store.set_coordinates(village, entry['lat'], entry['lon'])
+            matched += 1
+    return matched
@@ -0,0 +1,188 @@
+"""
+KRISHI MITRA - Weather Proxy
+Server-side OpenWeatherMap proxy: coordinates snap to a grid cell, cells
+share one entry in a bounded LRU+TTL cache, and concurrent misses for the
+same cell wait on a single upstream call
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+OPENWEATHERMAP_URL = 'https://api.openweathermap.org/data/2.5/weather'
+
+# 0.05 degrees is ~5.5 km: one village shares one cell
+DEFAULT_CELL_DEG = 0.05
+
+
+def snap_to_cell(lat, lon, cell_deg=DEFAULT_CELL_DEG):
+    """Cell key and the cell-centre coordinates sent upstream"""
+    row = math.floor(lat / cell_deg)
+    col = math.floor(lon / cell_deg)
+    centre = (round((row + 0.5) * cell_deg, 4), round((col + 0.5) * cell_deg, 4))
+    return (row, col), centre
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire; expired entries are kept for stale fallback"""
+
+    def __init__(self, maxsize=2048, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(value, seconds_left) - seconds_left <= 0 means stale; (None, 0) if absent"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None, 0
+            self._data.move_to_end(key)
+            expires, value = entry
+            return value, expires - time.monotonic()
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Flight:
+    """One in-progress upstream call that other requests can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class WeatherService:
+    """Cached, coalescing front for a weather upstream"""
+
+    def __init__(self, upstream, cache_size=2048, ttl=600, cell_deg=DEFAULT_CELL_DEG):
+        self.upstream = upstream
+        self.cache = TTLCache(cache_size, ttl)
+        self.cell_deg = cell_deg
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stale': 0, 'upstream_errors': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def get(self, lat, lon):
+        """(weather, cell_centre, status, seconds_left); status is HIT/MISS/COALESCED/STALE"""
+        key, centre = snap_to_cell(lat, lon, self.cell_deg)
+        cached, left = self.cache.get(key)
+        if cached is not None and left > 0:
+            self._count('hits')
+            return cached, centre, 'HIT', left
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                # A flight may have landed since the first look
+                fresh, left = self.cache.get(key)
+                if fresh is not None and left > 0:
+                    self.stats['hits'] += 1
+                    return fresh, centre, 'HIT', left
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._count('coalesced')
+            flight.done.wait()
+            if flight.error is None:
+                return flight.value, centre, 'COALESCED', self.cache.ttl
+            return self._stale_or_raise(cached, centre, flight.error)
+
+        self._count('misses')
+        try:
+            flight.value = self.upstream.fetch(*centre)
+            self.cache.set(key, flight.value)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        if flight.error is not None:
+            self._count('upstream_errors')
+            return self._stale_or_raise(cached, centre, flight.error)
+        return flight.value, centre, 'MISS', self.cache.ttl
+
+    def _stale_or_raise(self, cached, centre, error):
+        if cached is None:
+            raise error
+        self._count('stale')
+        return cached, centre, 'STALE', 0
+
+
+# ========== UPSTREAMS ==========
+
+class OpenWeatherMapUpstream:
+    """Current conditions from OpenWeatherMap, normalized for weather.js"""
+
+    def __init__(self, api_key, timeout=5):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._session = None
+
+    @property
+    def session(self):
+        # requests is imported on first fetch; it is a large share of startup import time
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
+
+    def fetch(self, lat, lon):
+        response = self.session.get(OPENWEATHERMAP_URL, params={
+            'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return {
+            'temp': round(data['main']['temp']),
+            'condition': data['weather'][0]['main'],
+            'humidity': data['main']['humidity'],
+            'windSpeed': data['wind']['speed'],
+            'icon': data['weather'][0]['icon'],
+            'description': data['weather'][0]['description']
+        }
+
+
+class StubUpstream:
+    """Deterministic local weather for tests and offline development"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def fetch(self, lat, lon):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError('stub upstream unavailable')
+        return {
+            'temp': 22 + int(abs(lat * 7 + lon * 3)) % 10,
+            'condition': 'Clouds',
+            'humidity': 55 + int(abs(lat * 13)) % 30,
+            'windSpeed': 3.5,
+            'icon': '03d',
+            'description': 'scattered clouds'
+        }
@@ -0,0 +1,491 @@
+"""
+Benchmark suite for the Krishi Mitra API (replaces the old test_api.py).
+
+Two layers, each saved as a JSON report so runs can be compared:
+
+  micro  times the scoring functions on synthetic soil samples, one call
+         per sample (the request path) and as one vectorized batch (the
+         kernel behind the batch endpoints), for 1 to 1M samples
+  load   runs concurrent clients against every API endpoint for a fixed
+         time, reporting p50/p95/p99 latency and throughput per endpoint.
+         Targets the app in-process (Flask test client), a local gunicorn,
+         or a running server
+
+    python benchmark.py micro                                # sizes 1 .. 1M
+    python benchmark.py micro --sizes 1 1000 --only recommend_crops
+    python benchmark.py load                                 # in-process
+    python benchmark.py load --gunicorn 2 --concurrency 8    # production config
+    python benchmark.py load --url http://localhost:5000 --duration 5
+    python benchmark.py compare old.json new.json            # exit 1 on regressions
+
+Reports go to instance/benchmarks/<layer>-<timestamp>.json unless -o is given.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(HERE, "backend")
+DEFAULT_REPORT_DIR = os.path.join(HERE, "instance", "benchmarks")
+
+REPORT_VERSION = 1
+
+DEFAULT_SIZES = [1, 100, 10_000, 1_000_000]
+
+# One call per sample gets slow past this; larger sizes only time the batch path
+DEFAULT_SCALAR_MAX = 10_000
+
+# Batch kernels run in chunks of this many rows so 1M samples fit in memory
+BATCH_CHUNK = 100_000
+
+# Plausible field ranges for synthetic samples, in crop_engine.NUTRIENTS order
+SAMPLE_RANGES = {"ph": (4.0, 9.0), "nitrogen": (50.0, 600.0), "phosphorus": (5.0, 120.0), "potassium": (50.0, 600.0)}
+
+# A stable pick from the default crop database
+BENCH_CROP = "ragi"
+
+
+def report_path(layer, output):
+    if output:
+        return output
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(DEFAULT_REPORT_DIR, f"{layer}-{stamp}.json")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_report(layer, config, results, output=None):
+    path = report_path(layer, output)
+    report = {
+        "version": REPORT_VERSION,
+        "layer": layer,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport: {path}")
+    return path
+
+
+# ========== MICRO-BENCHMARKS ==========
+
+def synthetic_samples(n, seed=0):
+    """(n x 4) soil samples spread uniformly over SAMPLE_RANGES"""
+    rng = np.random.default_rng(seed)
+    low = np.array([r[0] for r in SAMPLE_RANGES.values()])
+    high = np.array([r[1] for r in SAMPLE_RANGES.values()])
+    return np.round(rng.uniform(low, high, size=(n, len(SAMPLE_RANGES))), 1)
+
+
+def synthetic_assessments(n, seed=0):
+    """n (color, texture, drainage, moisture) tuples, including some unknown values"""
+    from backend.assessment import ASSESSMENT_RULES, PROPERTIES
+
+    rng = np.random.default_rng(seed)
+    columns = []
+    for prop in PROPERTIES:
+        choices = list(ASSESSMENT_RULES[prop]) + ["unknown"]
+        columns.append([choices[i] for i in rng.integers(len(choices), size=n)])
+    return list(zip(*columns))
+
+
+def chunks(x):
+    for start in range(0, len(x), BATCH_CHUNK):
+        yield x[start:start + BATCH_CHUNK]
+
+
+def micro_cases():
+    """{name: (make_input(x), scalar(inputs) or None, batch(x) or None)}
+
+    scalar runs the function as a request does, once per sample; batch runs
+    the vectorized kernel the function is built on over the whole array.
+    """
+    sys.path.insert(0, BACKEND)
+    import app
+    from crop_engine import NUTRIENTS, soil_score_vector, suitability_grid
+    from fertilizer import plan_fertilizer_batch
+    from main import generate_soil_assessment
+
+    snapshot = app.crop_snapshot()
+    ideals = [crop["ideal_conditions"] for crop in snapshot.crops.values()]
+
+    def as_dicts(x):
+        return [dict(zip(NUTRIENTS, row)) for row in x.tolist()]
+
+    def soil_scores(samples):
+        for s in samples:
+            app.calculate_soil_score(s["nitrogen"], s["phosphorus"], s["potassium"], s["ph"])
+
+    def suitabilities(samples):
+        for s in samples:
+            for ideal in ideals:
+                app.calculate_crop_suitability(ideal, s)
+
+    def recommendations(samples):
+        for s in samples:
+            app.recommend_crops(s)
+
+    def fertilizer_plans(samples):
+        for s in samples:
+            app.generate_fertilizer_plan(BENCH_CROP, s)
+
+    def ranked_grid(x):
+        for chunk in chunks(x):
+            # As the lab report batch endpoint does
+            for row in suitability_grid(snapshot.matrix, chunk):
+                app.crops_from_scores(row)
+
+    def batch_plans(x):
+        for chunk in chunks(x):
+            plan_fertilizer_batch(app.fertilizer_deficits([BENCH_CROP] * len(chunk), chunk))
+
+    def assessments(combos):
+        for combo in combos:
+            generate_soil_assessment(*combo, None)
+
+    return {
+        "calculate_soil_score": (as_dicts, soil_scores, lambda x: [soil_score_vector(c) for c in chunks(x)]),
+        "calculate_crop_suitability": (
+            as_dicts, suitabilities, lambda x: [suitability_grid(snapshot.matrix, c) for c in chunks(x)]),
+        "recommend_crops": (as_dicts, recommendations, ranked_grid),
+        "generate_fertilizer_plan": (as_dicts, fertilizer_plans, batch_plans),
+        # Precompiled lookups; there is no batch form
+        "generate_soil_assessment": (lambda x: synthetic_assessments(len(x)), assessments, None),
+    }
+
+
+def time_call(func, min_time):
+    """Seconds per call: best and median over a few timeit rounds"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed >= min_time:
+        # Already slow enough that one more round would only add wall time
+        rounds = [elapsed]
+    else:
+        rounds = timer.repeat(repeat=3, number=number)
+    per_call = sorted(t / number for t in rounds)
+    return {"calls": number * len(rounds), "best_s": per_call[0], "median_s": per_call[len(per_call) // 2]}
+
+
+def run_micro(args):
+    cases = micro_cases()
+    unknown = set(args.only or []) - set(cases)
+    if unknown:
+        sys.exit(f"Unknown functions: {sorted(unknown)} (choose from {sorted(cases)})")
+
+    results = []
+    print(f"{'function':<28} {'path':<7} {'samples':>9} {'per call':>12} {'per sample':>12} {'samples/s':>12}")
+    for name, (make_input, scalar, batch) in cases.items():
+        if args.only and name not in args.only:
+            continue
+        for size in args.sizes:
+            x = synthetic_samples(size, args.seed)
+            variants = [("batch", batch, x)] if batch else []
+            if scalar and size <= args.scalar_max:
+                inputs = make_input(x)
+                variants.insert(0, ("scalar", scalar, inputs))
+            for variant, func, data in variants:
+                timing = time_call(lambda: func(data), args.min_time)
+                per_sample = timing["best_s"] / size
+                results.append(dict(
+                    key=f"{name}/{variant}/{size}", function=name, variant=variant, samples=size,
+                    per_sample_us=per_sample * 1e6, samples_per_s=1 / per_sample, **timing))
+                print(f"{name:<28} {variant:<7} {size:>9} {format_seconds(timing['best_s']):>12} "
+                      f"{format_seconds(per_sample):>12} {1 / per_sample:>12,.0f}")
+
+    config = {"sizes": args.sizes, "scalar_max": args.scalar_max, "seed": args.seed, "min_time": args.min_time}
+    save_report("micro", config, results, args.output)
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+# ========== LOAD GENERATOR ==========
+
+def lab_row(i):
+    return {"sample_id": f"S{i}", "nitrogen": 140 + i, "phosphorus": 20 + i % 30, "potassium": 180, "ph": 6.2}
+
+
+# name -> (method, path, JSON body or None, expected status)
+ENDPOINTS = {
+    "health": ("GET", "/health", None, 200),
+    "locations": ("GET", "/api/locations/mysuru", None, 200),
+    "location_search": ("GET", "/api/locations/search?q=he", None, 200),
+    "analyze_location": ("POST", "/api/analyze/location", {"village": "hebbal"}, 200),
+    "analyze_location_get": ("GET", "/api/analyze/location/hebbal", None, 200),
+    "analyze_coordinates": ("POST", "/api/analyze/location", {"lat": 12.31, "lon": 76.65, "k": 8}, 200),
+    "analyze_assessment": ("POST", "/api/analyze/assessment", {"soil_color": "red", "texture": "loamy"}, 200),
+    "analyze_lab_report": ("POST", "/api/analyze/lab-report",
+                           {"nitrogen": 240, "phosphorus": 35, "potassium": 180, "ph": 6.2}, 200),
+    "lab_report_batch_50": ("POST", "/api/analyze/lab-report/batch", [lab_row(i) for i in range(50)], 200),
+    "fertilizer_batch_50": ("POST", "/api/fertilizer/plan/batch",
+                            {"fields": [dict(lab_row(i), crop=BENCH_CROP) for i in range(50)]}, 200),
+    "what_if_50x61": ("POST", "/api/analyze/what-if", {
+        "base": {"nitrogen": 240, "phosphorus": 35, "potassium": 180, "ph": 6.2},
+        "ranges": {"ph": {"min": 4.5, "max": 9.4, "step": 0.1}, "nitrogen": {"min": 0, "max": 600, "step": 10}},
+    }, 200),
+    "crop_details": ("GET", f"/api/crops/recommendations/{BENCH_CROP}", None, 200),
+    "crop_recommendations": ("POST", "/api/crops/recommendations", {"crop": BENCH_CROP}, 200),
+}
+
+
+class InProcessClient:
+    """Flask test client against the imported app; one per thread"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self._client.open(path, method=method, json=body)
+        # Drain streamed bodies so the whole response is timed
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    """Keep-alive HTTP session against a running server; one per thread"""
+
+    def __init__(self, base_url):
+        import requests
+
+        self._session = requests.Session()
+        self._base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body):
+        response = self._session.request(method, self._base_url + path, json=body, timeout=30)
+        return response.status_code
+
+
+class LocalGunicorn:
+    """The production gunicorn config on a spare port, for the duration of a run"""
+
+    def __init__(self, workers, port):
+        self.workers = workers
+        self.url = f"http://127.0.0.1:{port}"
+        self._server = None
+
+    def __enter__(self):
+        import requests
+
+        env = dict(os.environ, WEB_CONCURRENCY=str(self.workers))
+        port = self.url.rsplit(":", 1)[1]
+        self._server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", os.path.join(HERE, "gunicorn.conf.py"),
+             "--bind", f"127.0.0.1:{port}", "--access-logfile", "/dev/null"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self._server.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                requests.get(f"{self.url}/health", timeout=1).raise_for_status()
+                return self
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("gunicorn did not come up within 60s")
+
+    def __exit__(self, *exc):
+        self._server.terminate()
+        self._server.wait(timeout=30)
+
+
+def load_endpoint(make_client, spec, concurrency, duration, warmup):
+    """Closed-loop clients hitting one endpoint; latency stats and throughput"""
+    method, path, body, expected = spec
+    clients = [make_client() for _ in range(concurrency)]
+    for _ in range(warmup):
+        clients[0].request(method, path, body)
+
+    latencies = [[] for _ in clients]
+    errors = [0] * concurrency
+    start = threading.Barrier(concurrency + 1)
+
+    def worker(i):
+        client, timings = clients[i], latencies[i]
+        start.wait()
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            try:
+                ok = client.request(method, path, body) == expected
+            except Exception:
+                ok = False
+            timings.append(time.perf_counter() - began)
+            errors[i] += not ok
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    began = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    ms = np.concatenate([np.array(t) for t in latencies]) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (float("nan"),) * 3
+    return {
+        "requests": int(len(ms)),
+        "errors": int(sum(errors)),
+        "throughput_rps": len(ms) / elapsed,
+        "mean_ms": float(ms.mean()) if len(ms) else None,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()) if len(ms) else None,
+    }
+
+
+def run_load(args):
+    selected = args.only or list(ENDPOINTS)
+    unknown = set(selected) - set(ENDPOINTS)
+    if unknown:
+        sys.exit(f"Unknown endpoints: {sorted(unknown)} (choose from {sorted(ENDPOINTS)})")
+
+    def run(make_client, target):
+        results = []
+        print(f"{'endpoint':<22} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'max ms':>8}")
+        for name in selected:
+            stats = load_endpoint(make_client, ENDPOINTS[name], args.concurrency, args.duration, args.warmup)
+            results.append(dict(key=f"{target}/{name}", endpoint=name, path=ENDPOINTS[name][1], **stats))
+            print(f"{name:<22} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>9.1f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+        return results
+
+    if args.url:
+        target = "http"
+        results = run(lambda: HttpClient(args.url), target)
+    elif args.gunicorn:
+        target = f"gunicorn-{args.gunicorn}"
+        with LocalGunicorn(args.gunicorn, args.port) as server:
+            results = run(lambda: HttpClient(server.url), target)
+    else:
+        target = "inprocess"
+        sys.path.insert(0, BACKEND)
+        from app import app
+
+        results = run(lambda: InProcessClient(app), target)
+
+    config = {"target": target, "url": args.url, "concurrency": args.concurrency,
+              "duration_s": args.duration, "warmup": args.warmup}
+    save_report("load", config, results, args.output)
+    if any(result["errors"] for result in results):
+        sys.exit("Some requests failed (see the errors column)")
+
+
+# ========== COMPARISON ==========
+
+# layer -> [(metric, higher is better)]
+COMPARED_METRICS = {
+    "micro": [("best_s", False)],
+    "load": [("p95_ms", False), ("p99_ms", False), ("throughput_rps", True)],
+}
+
+
+def compare(old, new, threshold):
+    """[(key, metric, old, new, relative change, regressed)] for results in both reports"""
+    if old["layer"] != new["layer"]:
+        raise ValueError(f"cannot compare a {old['layer']} report with a {new['layer']} report")
+    old_results = {result["key"]: result for result in old["results"]}
+    rows = []
+    for result in new["results"]:
+        before = old_results.get(result["key"])
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS[new["layer"]]:
+            a, b = before.get(metric), result.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            worse = -change if higher_is_better else change
+            rows.append((result["key"], metric, a, b, change, worse > threshold))
+    return rows
+
+
+def run_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    try:
+        rows = compare(old, new, args.threshold)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"{old.get('commit')} -> {new.get('commit')}, regression threshold {args.threshold:.0%}")
+    print(f"{'result':<48} {'metric':<15} {'old':>12} {'new':>12} {'change':>8}")
+    for key, metric, a, b, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{key:<48} {metric:<15} {a:>12.6g} {b:>12.6g} {change:>+8.1%}{flag}")
+    regressions = sum(row[-1] for row in rows)
+    if regressions:
+        sys.exit(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    micro = commands.add_parser("micro", help="time scoring functions on synthetic samples")
+    micro.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    micro.add_argument("--only", nargs="+", help="function names to run")
+    micro.add_argument("--scalar-max", type=int, default=DEFAULT_SCALAR_MAX,
+                       help="largest size timed one call per sample")
+    micro.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    micro.add_argument("--seed", type=int, default=0)
+    micro.add_argument("-o", "--output", help="report path")
+
+    load = commands.add_parser("load", help="concurrent requests per endpoint")
+    target = load.add_mutually_exclusive_group()
+    target.add_argument("--url", help="running server to load (default: the app in-process)")
+    target.add_argument("--gunicorn", type=int, metavar="WORKERS", help="start gunicorn.conf.py with this many workers")
+    load.add_argument("--port", type=int, default=int(os.environ.get("BENCH_PORT", 5098)))
+    load.add_argument("--only", nargs="+", help="endpoint names to run")
+    load.add_argument("--concurrency", type=int, default=4)
+    load.add_argument("--duration", type=float, default=3.0, help="seconds per endpoint")
+    load.add_argument("--warmup", type=int, default=20, help="untimed requests per endpoint")
+    load.add_argument("-o", "--output", help="report path")
+
+    diff = commands.add_parser("compare", help="compare two reports of the same layer")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    {"micro": run_micro, "load": run_load, "compare": run_compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
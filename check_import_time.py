@@ -0,0 +1,88 @@
+"""
+Import-time budget for cold starts.
+
+Imports each app module in a fresh interpreter under `python -X importtime`,
+reports the slowest top-level imports and exits non-zero if the total goes
+over budget or if a module that must stay lazy (the Firebase SDK) was
+imported at startup.
+
+    python check_import_time.py                 # both apps, default budgets
+    python check_import_time.py --budget-ms 250 main
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# module -> (directory it is imported from, default budget in ms)
+TARGETS = {
+    "main": (HERE, 400),
+    "app": (os.path.join(HERE, "backend"), 600),
+}
+
+# Only ever needed on the first write, never at startup
+LAZY_MODULES = ("firebase_admin", "google.cloud.firestore", "grpc", "requests")
+
+
+def import_times(module, cwd):
+    """[(cumulative_us, depth, name)] for every import made by `import module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative), depth, name.strip()))
+    return rows
+
+
+def check(module, budget_ms, top=8):
+    cwd, _ = TARGETS.get(module, (HERE, None))
+    # Warm the bytecode cache so the measurement is of imports, not compilation
+    import_times(module, cwd)
+    rows = import_times(module, cwd)
+
+    # The module's own cumulative time; interpreter startup (site, .pth hooks) is not ours
+    total_ms = next(us for us, depth, name in rows if depth == 0 and name == module) / 1000
+    eager = sorted(name for _, _, name in rows
+                   if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES))
+
+    print(f"{module}: {total_ms:.0f} ms (budget {budget_ms} ms)")
+    for us, _, name in sorted((r for r in rows if r[1] <= 1), reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    ok = total_ms <= budget_ms
+    if not ok:
+        print(f"  FAIL: over budget by {total_ms - budget_ms:.0f} ms")
+    if eager:
+        ok = False
+        print(f"  FAIL: imported at startup but must stay lazy: {', '.join(eager)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(TARGETS))
+    parser.add_argument("--budget-ms", type=int, help="override the per-module default budget")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.modules:
+        budget = args.budget_ms or TARGETS.get(module, (HERE, 400))[1]
+        ok = check(module, budget, args.top) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,32 @@
 // KRISHI-MITRA - Analytics Module
 
+// What-if sliders: range around the analysed value, step, and the API's upper bound
+const WHAT_IF_INPUTS = {
+    ph: { label: 'pH', span: 1.5, step: 0.1, max: 14, decimals: 2 },
+    nitrogen: { label: 'Nitrogen (kg/ha)', span: 150, step: 5, max: 2000, decimals: 1 },
+    phosphorus: { label: 'Phosphorus (kg/ha)', span: 40, step: 1, max: 500, decimals: 1 },
+    potassium: { label: 'Potassium (kg/ha)', span: 150, step: 5, max: 2000, decimals: 1 }
+};
+
+// Same cut-off and length as the API's crop ranking
+const RECOMMEND_THRESHOLD = 70;
+const RECOMMEND_LIMIT = 5;
+
 class AnalyticsManager {
     constructor() {
         this.currentAnalysis = null;
-        this.cropDatabase = {
-            'ragi': {
-                name_english: 'Finger Millet',
-                name_kannada: 'ರಾಗಿ',
-                image: '🌾',
-                varieties: ['GPU-28', 'MR-1', 'MR-6'],
-                ideal_conditions: {
-                    ph: [5.5, 7.0],
-                    nitrogen: [150, 300],
-                    phosphorus: [30, 50],
-                    potassium: [20, 40]
-                },
-                economics: {
-                    input_cost_per_acre: 15000,
-                    expected_revenue_per_acre: 35000,
-                    expected_yield: '25-30 quintals/hectare'
-                },
-                timeline: {
-                    sowing: 'June-July',
-                    flowering: 'August',
-                    harvest: 'October-November',
-                    duration: '120-130 days'
-                },
-                best_variety: 'GPU-28'
-            },
-            'maize': {
-                name_english: 'Maize',
-                name_kannada: 'ಮೆಕ್ಕೆಜೋಳ',
-                image: '🌽',
-                varieties: ['DHM 117', 'DHM 121', 'NK 6240'],
-                ideal_conditions: {
-                    ph: [6.0, 7.5],
-                    nitrogen: [180, 300],
-                    phosphorus: [25, 50],
-                    potassium: [150, 250]
-                },
-                economics: {
-                    input_cost_per_acre: 20000,
-                    expected_revenue_per_acre: 45000,
-                    expected_yield: '40-50 quintals/hectare'
-                },
-                timeline: {
-                    sowing: 'June',
-                    flowering: 'August',
-                    harvest: 'September-October',
-                    duration: '110-120 days'
-                },
-                best_variety: 'DHM 117'
-            },
-            'wheat': {
-                name_english: 'Wheat',
-                name_kannada: 'ಗೋಧಿ',
-                image: '🌾',
-                varieties: ['HI 1544', 'HD 3086', 'PBW 343'],
-                ideal_conditions: {
-                    ph: [6.5, 7.5],
-                    nitrogen: [200, 300],
-                    phosphorus: [30, 60],
-                    potassium: [150, 250]
-                },
-                economics: {
-                    input_cost_per_acre: 18000,
-                    expected_revenue_per_acre: 40000,
-                    expected_yield: '35-45 quintals/hectare'
-                },
-                timeline: {
-                    sowing: 'November',
-                    flowering: 'February',
-                    harvest: 'March-April',
-                    duration: '120-130 days'
-                },
-                best_variety: 'HI 1544'
-            }
-        };
+        // Filled from the server's crop knowledge snapshot (see loadCropDatabase)
+        this.cropDatabase = {};
+    }
+
+    // Load crop details shared with the backend; cards fall back to defaults
+    async loadCropDatabase() {
+        if (typeof api === 'undefined') return;
+        try {
+            this.cropDatabase = await api.getCropKnowledge();
+        } catch (error) {
+            console.warn('Crop knowledge unavailable, using defaults:', error);
+        }
     }
 
     // Load analysis results from session storage
@@ -343,13 +293,15 @@ class AnalyticsManager {
     }
 
     // Initialize analytics page
-    init() {
+    async init() {
         const analysis = this.loadAnalysisResults();
         if (!analysis) {
             console.warn('No analysis results found');
             return;
         }
 
+        await this.loadCropDatabase();
+
         this.currentAnalysis = analysis;
 
         // Render all components
@@ -365,10 +317,112 @@ class AnalyticsManager {
             this.renderCropTimeline(analysis.recommendations[0].crop);
         }
 
+        if (analysis.soil_params) {
+            this.initWhatIf(analysis.soil_params);
+        }
+
         // Add CSS for modal if not exists
         this.addModalStyles();
     }
 
+    // What-if sliders. Moving one asks the API for a sweep of that input
+    // with the others fixed; further moves of the same slider are answered
+    // from the sweep without another request
+    initWhatIf(soilParams) {
+        const section = document.getElementById('whatIfSection');
+        const sliders = document.getElementById('whatIfSliders');
+        if (!section || !sliders || typeof api === 'undefined') return;
+
+        this.whatIf = { base: soilParams, values: { ...soilParams }, sweep: null, timer: null };
+        sliders.innerHTML = Object.entries(WHAT_IF_INPUTS).map(([param, input]) => {
+            const [min, max] = this.whatIfRange(param);
+            return `
+                <label class="whatif-slider">
+                    <span>${input.label}: <strong id="whatIf-${param}">${soilParams[param]}</strong></span>
+                    <input type="range" min="${min}" max="${max}" step="${input.step}" value="${soilParams[param]}" data-param="${param}">
+                </label>
+            `;
+        }).join('');
+        sliders.querySelectorAll('input').forEach(slider => {
+            slider.addEventListener('input', () => this.onWhatIfInput(slider.dataset.param, parseFloat(slider.value)));
+        });
+        section.style.display = '';
+    }
+
+    // Slider bounds: whole steps below the analysed value (not under 0), span above
+    whatIfRange(param) {
+        const { span, step, max } = WHAT_IF_INPUTS[param];
+        const base = this.whatIf.base[param];
+        const below = Math.min(span, Math.floor(base / step) * step);
+        return [Number((base - below).toFixed(2)), Number(Math.min(max, base + span).toFixed(2))];
+    }
+
+    onWhatIfInput(param, value) {
+        this.whatIf.values[param] = value;
+        document.getElementById(`whatIf-${param}`).textContent = value;
+
+        if (this.whatIfSweepFits(param)) {
+            this.renderWhatIf(param, value);
+            return;
+        }
+        clearTimeout(this.whatIf.timer);
+        this.whatIf.timer = setTimeout(() => this.fetchWhatIf(param), 150);
+    }
+
+    // Whether the last sweep was along param with every other slider where it is now
+    whatIfSweepFits(param) {
+        const sweep = this.whatIf.sweep;
+        return sweep !== null && sweep.param === param && Object.keys(WHAT_IF_INPUTS).every(
+            other => other === param || sweep.values[other] === this.whatIf.values[other]);
+    }
+
+    async fetchWhatIf(param) {
+        const values = { ...this.whatIf.values };
+        const [min, max] = this.whatIfRange(param);
+        try {
+            const result = await api.whatIf(values, { [param]: { min, max, step: WHAT_IF_INPUTS[param].step } });
+            this.whatIf.sweep = { param, values, result };
+        } catch (error) {
+            document.getElementById('whatIfResult').textContent = 'What-if analysis is unavailable right now.';
+            return;
+        }
+        // Another slider may have moved while the request was in flight
+        if (this.whatIfSweepFits(param)) {
+            this.renderWhatIf(param, this.whatIf.values[param]);
+        }
+    }
+
+    renderWhatIf(param, value) {
+        const { result } = this.whatIf.sweep;
+        const values = result.axes[0].values;
+        let index = 0;
+        values.forEach((v, i) => {
+            if (Math.abs(v - value) < Math.abs(values[index] - value)) index = i;
+        });
+
+        const score = result.soil_score[index];
+        const change = score - this.currentAnalysis.soil_score;
+        const crops = result.crops
+            .map(crop => ({ crop, suitability: result.suitability[crop][index] }))
+            .filter(entry => entry.suitability >= RECOMMEND_THRESHOLD)
+            .sort((a, b) => b.suitability - a.suitability)
+            .slice(0, RECOMMEND_LIMIT);
+        const cropName = crop => (this.cropDatabase[crop] || this.getDefaultCropData(crop)).name_english;
+        const ranking = names => names.map(cropName).join(', ') || 'none';
+
+        document.getElementById('whatIfResult').innerHTML = `
+            <div><strong>Soil score: ${score}</strong> (${change >= 0 ? '+' : ''}${change} from your soil)</div>
+            <div>Recommended: ${ranking(crops.map(entry => entry.crop))}</div>
+            ${result.flips[param].length ? `
+                <ul class="whatif-flips">
+                    ${result.flips[param].map(flip => `
+                        <li>${WHAT_IF_INPUTS[param].label} around ${+flip.at.toFixed(WHAT_IF_INPUTS[param].decimals)}: ${ranking(flip.from)} &rarr; ${ranking(flip.to)}</li>
+                    `).join('')}
+                </ul>
+            ` : ''}
+        `;
+    }
+
     // Add modal styles
     addModalStyles() {
         if (document.getElementById('modal-styles')) return;
@@ -3,17 +3,19 @@
 class APIClient {
     constructor(baseURL = (typeof CONFIG !== 'undefined' && CONFIG.API_BASE_URL) ? CONFIG.API_BASE_URL : 'http://localhost:5000/api') {
         this.baseURL = baseURL;
+        this.staticBaseURL = (typeof CONFIG !== 'undefined' && CONFIG.STATIC_DATA_URL) ? CONFIG.STATIC_DATA_URL : '/data';
+        this.staticManifest = null;
     }
     
     // Generic request method
     async request(endpoint, options = {}) {
         const url = `${this.baseURL}${endpoint}`;
         const config = {
+            ...options,
             headers: {
                 'Content-Type': 'application/json',
                 ...options.headers
-            },
-            ...options
+            }
         };
         
         try {
@@ -57,8 +59,47 @@ class APIClient {
     }
     
     // Soil Analysis Endpoints
-    async analyzeLocation(village, fieldSize) {
-        return this.post('/analyze/location', { village, field_size: fieldSize });
+    async analyzeLocation(village, fieldSize, taluk = null) {
+        // Every village is pre-rendered onto Hosting; the API is only the fallback
+        try {
+            const result = await this.getStaticAnalysis(village, taluk);
+            if (result) {
+                return result;
+            }
+        } catch (error) {
+            console.warn('Static analysis unavailable, asking the API:', error);
+        }
+        // GET so the browser can revalidate the precomputed result by ETag
+        return this.get(`/analyze/location/${encodeURIComponent(village)}`);
+    }
+    
+    async getStaticAnalysis(village, taluk = null) {
+        // The manifest is revalidated per page load; bundle paths are content-hashed
+        if (!this.staticManifest) {
+            this.staticManifest = fetch(`${this.staticBaseURL}/manifest.json`).then(response => {
+                if (!response.ok) {
+                    throw new Error(`Static manifest: ${response.status}`);
+                }
+                return response.json();
+            });
+            this.staticManifest.catch(() => { this.staticManifest = null; });
+        }
+        const manifest = await this.staticManifest;
+        const taluks = manifest.villages[village];
+        if (!taluks) {
+            return null;
+        }
+        // Same choice as the API: the requested taluk, else the first village with this name
+        const path = (taluk && taluks[taluk]) || Object.values(taluks)[0];
+        const response = await fetch(`${this.staticBaseURL}/${path}`);
+        if (!response.ok) {
+            throw new Error(`Static analysis: ${response.status}`);
+        }
+        return response.json();
+    }
+    
+    async analyzeCoordinates(lat, lon, k = 1) {
+        return this.post('/analyze/location', { lat, lon, k });
     }
     
     async analyzeVisual(data) {
@@ -69,24 +110,84 @@ class APIClient {
         return this.post('/analyze/lab-report', data);
     }
     
+    // Score and crop suitability over ranges of pH/N/P/K around a sample
+    async whatIf(base, ranges) {
+        return this.post('/analyze/what-if', { base, ranges });
+    }
+    
     // Location Data
     async getMysuruLocations() {
         return this.get('/locations/mysuru');
     }
     
+    async searchLocations(query) {
+        return this.get(`/locations/search?q=${encodeURIComponent(query)}`);
+    }
+    
+    // Crop Knowledge
+    async getCropKnowledge() {
+        // The version lookup is revalidated every time; the snapshot URL is
+        // content-hashed, so the browser caches the snapshot itself forever
+        const { version } = await this.get('/crops/snapshot');
+        const response = await fetch(`${this.baseURL}/crops/snapshot/${version}`);
+        if (!response.ok) {
+            throw new Error(`API Error: ${response.status}`);
+        }
+        return parseCropSnapshot(await response.arrayBuffer());
+    }
+    
     // Weather Data
     async getWeather(lat, lon) {
         return this.get(`/weather/${lat}/${lon}`);
     }
     
-    // User History
+    // User History (the API checks the signed-in user's Firebase ID token)
+    async authHeaders() {
+        const user = (typeof firebase !== 'undefined' && firebase.auth) ? firebase.auth().currentUser : null;
+        return user ? { 'Authorization': `Bearer ${await user.getIdToken()}` } : {};
+    }
+    
     async getUserHistory(userId) {
-        return this.get(`/history/${userId}`);
+        return (await this.getUserHistoryPage(userId)).items;
+    }
+    
+    // One newest-first page; pass the returned cursor as `before` for the next
+    async getUserHistoryPage(userId, before = null, limit = 20) {
+        const params = new URLSearchParams({ limit });
+        if (before) {
+            params.set('before', before);
+        }
+        const response = await fetch(`${this.baseURL}/history/${encodeURIComponent(userId)}?${params}`, {
+            headers: await this.authHeaders()
+        });
+        if (!response.ok) {
+            throw new Error(`API Error: ${response.status}`);
+        }
+        return { items: await response.json(), cursor: response.headers.get('X-Next-Cursor') };
     }
     
     async saveAnalysis(analysisData) {
-        return this.post('/save-analysis', analysisData);
+        return this.request('/save-analysis', {
+            method: 'POST',
+            headers: await this.authHeaders(),
+            body: JSON.stringify(analysisData)
+        });
+    }
+}
+
+// Crop details from a binary crop snapshot (layout in backend/knowledge.py):
+// 40-byte header, two float64 range matrices, then the details as UTF-8 JSON
+function parseCropSnapshot(buffer) {
+    const view = new DataView(buffer);
+    const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 8));
+    if (magic !== 'KMCROPS1') {
+        throw new Error('Not a crop snapshot');
     }
+    const crops = view.getUint32(8, true);
+    const columns = view.getUint32(12, true);
+    const detailsLength = view.getUint32(16, true);
+    const detailsStart = 40 + 2 * crops * columns * 8;
+    return JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, detailsStart, detailsLength)));
 }
 
 // Create global instance
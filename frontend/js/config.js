@@ -4,6 +4,9 @@ const CONFIG = {
     // API Configuration
     API_BASE_URL: window.location.hostname === 'localhost' ? 'http://localhost:5000/api' : 'https://krishi-mitra-api.herokuapp.com/api',
     
+    // Pre-rendered location analyses on Firebase Hosting (backend/render_static.py)
+    STATIC_DATA_URL: '/data',
+    
     // Firebase Configuration
     FIREBASE_CONFIG: {
         apiKey: "AIzaSyBXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX",
@@ -17,9 +17,10 @@ class WeatherWidget {
                 return cached.data;
             }
             
-            // For demo, return mock data
-            // In production, call: const data = await this.fetchWeatherAPI(lat, lon);
-            const data = this.getMockWeatherData();
+            // Backend proxy shares one cached reading per village-sized cell
+            const data = (typeof api !== 'undefined')
+                ? await api.getWeather(lat, lon)
+                : this.getMockWeatherData();
             
             // Cache the result
             this.cacheWeather(data);
@@ -0,0 +1,84 @@
+"""
+Gunicorn configuration for the Krishi Mitra API.
+
+The app is loaded once in the master (preload_app) through the
+create_app() factory, so the crop matrix, village store and precomputed
+results are built before forking and shared copy-on-write by the workers.
+Each boot phase is timed and every worker logs its private vs shared
+memory, so adding workers can be checked not to multiply either.
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import time
+
+wsgi_app = "app:create_app()"
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = True
+
+# Scoring is CPU-bound NumPy: one process per core. Threads cover the
+# I/O-bound routes (weather upstream, SQLite history) inside each worker.
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count())))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+# Every worker writes its request metrics here so /metrics covers them all
+METRICS_DIR = os.environ.setdefault(
+    "METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "metrics"))
+
+accesslog = "-"
+errorlog = "-"
+
+_started = time.monotonic()
+
+
+def memory_kb(pid="self"):
+    """(rss, pss, private) in kB from /proc; zeros where unavailable"""
+    values = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in values:
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values["Rss"], values["Pss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def on_starting(server):
+    # Files left by a previous run would be summed as exited workers
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+
+def when_ready(server):
+    rss, pss, private = memory_kb()
+    server.log.info("Preload finished in %.0f ms; master rss=%d kB private=%d kB",
+                    (time.monotonic() - _started) * 1000, rss, private)
+
+
+def pre_fork(server, worker):
+    # Move preloaded objects out of the collector's reach so GC passes in the
+    # workers do not write to (and un-share) the pages holding them
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    worker._forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    rss, pss, private = memory_kb()
+    worker.log.info("Worker %s ready in %.1f ms; rss=%d kB pss=%d kB private=%d kB shared=%d kB",
+                    worker.pid, (time.monotonic() - worker._forked_at) * 1000,
+                    rss, pss, private, rss - private)
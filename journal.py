@@ -0,0 +1,141 @@
+"""
+Durable local journal for soil entries.
+
+Entries are appended to a SQLite database in WAL mode before the request
+is acknowledged. Concurrent appends are group-committed: one caller commits
+everything that arrived within a short window, so many requests share one
+fsync. Entries stay in the journal until Firestore confirms the write.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "soil-journal.db")
+
+
+def content_id(collection, data):
+    """Deterministic document id from the entry content, so replays overwrite, not duplicate"""
+    canonical = json.dumps([collection, data], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:20]
+
+
+class SoilJournal:
+    """Append-only SQLite journal with group commit"""
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, group_window=0.002):
+        self.path = path
+        self.group_window = group_window
+        self._cond = threading.Condition()
+        self._db = threading.Lock()
+        self._pending = []
+        self._leader = False
+        self._conn = None
+        self._pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        # Connections must not cross fork(); each process opens its own
+        if self._pid == os.getpid():
+            return self._conn
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._conn, self._pid = conn, os.getpid()
+        return conn
+
+    def append(self, collection, data):
+        """Durably record an entry; returns (seq, doc_id) once it is on disk"""
+        record = {
+            "collection": collection,
+            "doc_id": content_id(collection, data),
+            "payload": json.dumps(data, default=str),
+            "seq": None,
+            "error": None,
+        }
+        with self._cond:
+            self._pending.append(record)
+            # Wait for a leader to commit us, or become the leader ourselves
+            while record["seq"] is None and record["error"] is None and self._leader:
+                self._cond.wait()
+            if record["seq"] is None and record["error"] is None:
+                self._leader = True
+                leading = True
+            else:
+                leading = False
+
+        if leading:
+            # Let concurrent appends pile up, then commit them in one transaction
+            time.sleep(self.group_window)
+            with self._cond:
+                group, self._pending = self._pending, []
+            try:
+                self._commit(group)
+            except Exception as e:
+                for item in group:
+                    item["error"] = e
+            finally:
+                with self._cond:
+                    self._leader = False
+                    self._cond.notify_all()
+
+        if record["error"] is not None:
+            raise record["error"]
+        return record["seq"], record["doc_id"]
+
+    def _commit(self, group):
+        with self._db:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for item in group:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO entries (collection, doc_id, payload, created) VALUES (?, ?, ?, ?)",
+                        (item["collection"], item["doc_id"], item["payload"], time.time())
+                    )
+                    # Same content already journaled: reuse that entry
+                    item["seq"] = conn.execute(
+                        "SELECT seq FROM entries WHERE doc_id = ?", (item["doc_id"],)
+                    ).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def pending(self, limit=500, older_than=0.0, exclude=()):
+        """Oldest un-replayed entries as (seq, collection, doc_id, data)"""
+        with self._db:
+            rows = self._connect().execute(
+                "SELECT seq, collection, doc_id, payload FROM entries WHERE created <= ? ORDER BY seq LIMIT ?",
+                (time.time() - older_than, limit + len(exclude))
+            ).fetchall()
+        entries = [(seq, c, doc_id, json.loads(p)) for seq, c, doc_id, p in rows if seq not in exclude]
+        return entries[:limit]
+
+    def remove(self, seqs):
+        """Drop entries Firestore has confirmed"""
+        seqs = [seq for seq in seqs if seq is not None]
+        if not seqs:
+            return
+        with self._db:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM entries WHERE seq = ?", [(seq,) for seq in seqs])
+            conn.execute("COMMIT")
+
+    def __len__(self):
+        with self._db:
+            return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
@@ -1,26 +1,101 @@
 from flask import Flask, request, jsonify, render_template
-import firebase_admin, json, os
-from firebase_admin import credentials, firestore
+import json, os, threading, time
+from datetime import datetime, timezone
+from write_behind import WriteBehindQueue, InMemoryFirestore
+from journal import SoilJournal, DEFAULT_JOURNAL_PATH
+from backend.assessment import lookup_assessment
+from backend.metrics import MetricsRegistry
+from backend.profiling import RequestProfiler
 
 app = Flask(__name__)
 
+# Request latency, errors and Firestore spans on /metrics (shared across
+# worker processes when METRICS_DIR is set)
+METRICS = MetricsRegistry("main", os.getenv("METRICS_DIR"))
+METRICS.install(app)
+
+# Sampled stacks of PROFILE_SAMPLE_RATE of requests, plus any carrying a
+# signed X-Profile header (backend/profiling.py sign); off when neither is set
+PROFILER = RequestProfiler("main", os.getenv("PROFILE_DIR"),
+                           os.getenv("PROFILE_SAMPLE_RATE"), os.getenv("PROFILE_SECRET"))
+PROFILER.install(app)
+
 # Debug helpers
 print("MAIN.PY file:", __file__)
 
-# Initialize Firebase (but don't fail if serviceAccount missing during debug)
-try:
-    if os.path.exists("serviceAccount.json"):
-        cred = credentials.Certificate("serviceAccount.json")
-        firebase_admin.initialize_app(cred)
-    elif os.getenv("FIREBASE_CREDENTIALS"):
-        cred = credentials.Certificate(json.loads(os.getenv("FIREBASE_CREDENTIALS")))
-        firebase_admin.initialize_app(cred)
-    else:
-        print("WARNING: No serviceAccount.json and no FIREBASE_CREDENTIALS env var. Firestore calls will fail until provided.")
-    db = firestore.client()
-except Exception as e:
-    print("Firebase init error (expected in debug if credentials missing):", e)
-    db = None
+# Firebase and the write queue are built on first use, not at import: the
+# Firebase SDK alone roughly triples cold-start time, and routes like /health
+# never need it
+_init_lock = threading.Lock()
+_db = None
+_writes = None
+_initialized = False
+
+@METRICS.timed("firestore.init")
+def init_firestore():
+    """Firestore client, or None if credentials are missing (don't fail during debug)"""
+    # FIRESTORE_FAKE=1 keeps writes in memory (tests / offline development)
+    if os.getenv("FIRESTORE_FAKE") == "1":
+        return InMemoryFirestore()
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if os.path.exists("serviceAccount.json"):
+            cred = credentials.Certificate("serviceAccount.json")
+            firebase_admin.initialize_app(cred)
+        elif os.getenv("FIREBASE_CREDENTIALS"):
+            cred = credentials.Certificate(json.loads(os.getenv("FIREBASE_CREDENTIALS")))
+            firebase_admin.initialize_app(cred)
+        else:
+            print("WARNING: No serviceAccount.json and no FIREBASE_CREDENTIALS env var. Firestore calls will fail until provided.")
+        return firestore.client()
+    except Exception as e:
+        print("Firebase init error (expected in debug if credentials missing):", e)
+        return None
+
+def _initialize():
+    global _db, _writes, _initialized
+    # Double-checked so concurrent first requests initialize exactly once
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        _db = init_firestore()
+        # Handlers journal locally and enqueue; a background worker batches the
+        # actual Firestore writes and replays the journal after outages
+        _writes = WriteBehindQueue(
+            _db,
+            max_batch=int(os.getenv("FIRESTORE_BATCH_SIZE", "100")),
+            flush_interval=float(os.getenv("FIRESTORE_FLUSH_SECONDS", "0.5")),
+            journal=SoilJournal(os.getenv("SOIL_JOURNAL_PATH", DEFAULT_JOURNAL_PATH)),
+        ) if _db else None
+        if _writes:
+            _writes.on_commit = lambda seconds, error: METRICS.observe_span("firestore.commit", seconds, error is not None)
+        _initialized = True
+
+def get_db():
+    """Shared Firestore client, initialized on first call (None if unavailable)"""
+    _initialize()
+    return _db
+
+def get_writes():
+    """Shared write-behind queue, initialized on first call (None without Firestore)"""
+    _initialize()
+    return _writes
+
+def save_entry(collection, data):
+    """Journal and queue a Firestore write, returning its document id (None if not saved)"""
+    writes = get_writes()
+    if writes is None:
+        return None
+    # Timestamp keeps identical submissions distinct under content-hash ids
+    data["created_at"] = datetime.now(timezone.utc).isoformat()
+    started = time.perf_counter()
+    try:
+        return writes.enqueue(collection, data)
+    finally:
+        METRICS.observe_span("firestore.enqueue", time.perf_counter() - started)
 
 @app.route("/", methods=["GET"])
 def index():
@@ -30,6 +105,21 @@ def index():
 def health():
     return jsonify({"status": "ok"})
 
+# /soil/manual takes field-kit readings (N as a percentage, moisture in %),
+# not the kg/ha lab values crop-knowledge.json's ideal ranges are written in,
+# so it keeps its own bands rather than scoring against the crop snapshot
+MANUAL_SCORE_RULES = (
+    ("pH", lambda v: 6 <= v <= 7.5),
+    ("N", lambda v: v > 0.12),
+    ("P", lambda v: v > 10),
+    ("K", lambda v: v > 100),
+    ("moisture", lambda v: 15 <= v <= 35),
+)
+MANUAL_POINTS = 20
+MANUAL_GOOD_SCORE = 70
+MANUAL_GOOD_CROPS = ("Maize", "Ragi")
+MANUAL_FALLBACK_CROPS = ("Groundnut",)
+
 @app.route("/soil/manual", methods=["POST"])
 def soil_manual():
     data = request.get_json(silent=True)
@@ -49,26 +139,16 @@ def soil_manual():
     if pH is None or N is None or P is None or K is None:
         return jsonify({"error": "Missing or invalid N,P,K or pH"}), 400
 
-    score = 0
-    if 6 <= pH <= 7.5: score += 20
-    if N > 0.12: score += 20
-    if P > 10: score += 20
-    if K > 100: score += 20
-    if 15 <= (moisture or 0) <= 35: score += 20
+    readings = {"pH": pH, "N": N, "P": P, "K": K, "moisture": moisture or 0}
+    score = sum(MANUAL_POINTS for field, ok in MANUAL_SCORE_RULES if ok(readings[field]))
 
-    recs = ["Maize", "Ragi"] if score > 70 else ["Groundnut"]
+    recs = list(MANUAL_GOOD_CROPS if score > MANUAL_GOOD_SCORE else MANUAL_FALLBACK_CROPS)
 
-    # Try to save but don't crash if Firestore missing
-    soil_entry_id = None
-    try:
-        if db:
-            ref, _ = db.collection("soil_entries").add({
-                "N": N, "P": P, "K": K, "pH": pH, "moisture": moisture,
-                "soil_score": score, "recommendations": recs
-            })
-            soil_entry_id = ref.id
-    except Exception as e:
-        print("Firestore write error:", e)
+    # Saved in the background; don't wait on Firestore
+    soil_entry_id = save_entry("soil_entries", {
+        "N": N, "P": P, "K": K, "pH": pH, "moisture": moisture,
+        "soil_score": score, "recommendations": recs
+    })
 
     return jsonify({
         "soil_score": score,
@@ -92,19 +172,13 @@ def soil_location():
     # Location-based advice logic
     advice = generate_location_advice(state, district, crop_type)
     
-    # Try to save to Firestore
-    location_entry_id = None
-    try:
-        if db:
-            ref, _ = db.collection("location_entries").add({
-                "state": state,
-                "district": district,
-                "crop_type": crop_type,
-                "advice": advice
-            })
-            location_entry_id = ref.id
-    except Exception as e:
-        print("Firestore write error:", e)
+    # Saved in the background; don't wait on Firestore
+    location_entry_id = save_entry("location_entries", {
+        "state": state,
+        "district": district,
+        "crop_type": crop_type,
+        "advice": advice
+    })
 
     return jsonify({
         "location_advice": advice,
@@ -129,21 +203,15 @@ def soil_questions():
     # Soil assessment logic
     assessment = generate_soil_assessment(soil_color, soil_texture, drainage, moisture_level, crop_intended)
     
-    # Try to save to Firestore
-    assessment_entry_id = None
-    try:
-        if db:
-            ref, _ = db.collection("soil_assessments").add({
-                "soil_color": soil_color,
-                "soil_texture": soil_texture,
-                "drainage": drainage,
-                "moisture_level": moisture_level,
-                "crop_intended": crop_intended,
-                "assessment": assessment
-            })
-            assessment_entry_id = ref.id
-    except Exception as e:
-        print("Firestore write error:", e)
+    # Saved in the background; don't wait on Firestore
+    assessment_entry_id = save_entry("soil_assessments", {
+        "soil_color": soil_color,
+        "soil_texture": soil_texture,
+        "drainage": drainage,
+        "moisture_level": moisture_level,
+        "crop_intended": crop_intended,
+        "assessment": assessment
+    })
 
     return jsonify({
         "soil_advice": assessment["advice"],
@@ -186,99 +254,25 @@ def generate_location_advice(state, district, crop_type):
 
 def generate_soil_assessment(soil_color, soil_texture, drainage, moisture_level, crop_intended):
     """Generate soil assessment based on visual and physical properties"""
-    
-    # Soil color analysis
-    color_analysis = {
-        "black": "Black soil indicates high organic matter and fertility. Excellent for most crops.",
-        "brown": "Brown soil shows good organic matter content. Suitable for most agricultural crops.",
-        "red": "Red soil indicates iron oxide presence. May need pH adjustment and organic matter addition.",
-        "yellow": "Yellow soil suggests leaching of nutrients. Requires fertilization and organic matter.",
-        "gray": "Gray soil may indicate poor drainage or waterlogging. Needs drainage improvement."
-    }
-    
-    # Soil texture analysis
-    texture_analysis = {
-        "clay": "Clay soil has good water retention but poor drainage. Add organic matter and sand for better structure.",
-        "sandy": "Sandy soil drains well but has poor water retention. Add organic matter and clay for better fertility.",
-        "loamy": "Loamy soil is ideal for most crops. Maintain organic matter content for optimal productivity.",
-        "silty": "Silty soil has moderate drainage and fertility. Add organic matter to improve structure."
-    }
-    
-    # Drainage analysis
-    drainage_analysis = {
-        "good": "Good drainage prevents waterlogging and root diseases. Maintain proper field drainage.",
-        "moderate": "Moderate drainage may cause occasional waterlogging. Improve field drainage systems.",
-        "poor": "Poor drainage can cause root rot and nutrient leaching. Install proper drainage systems."
-    }
-    
-    # Moisture level analysis
-    moisture_analysis = {
-        "dry": "Dry soil needs irrigation management and mulching to retain moisture.",
-        "moist": "Moist soil is ideal for most crops. Maintain consistent moisture levels.",
-        "wet": "Wet soil may cause root diseases. Improve drainage and avoid over-irrigation."
-    }
-    
-    # Generate recommendations based on soil properties
-    recommendations = []
-    tips = []
-    
-    # Color-based recommendations
-    if soil_color == "black":
-        recommendations.extend(["Rice", "Sugarcane", "Cotton"])
-        tips.append("Black soil is highly fertile - use balanced fertilization")
-    elif soil_color == "red":
-        recommendations.extend(["Groundnut", "Ragi", "Sunflower"])
-        tips.append("Red soil may need lime application to adjust pH")
-    elif soil_color == "yellow":
-        recommendations.extend(["Maize", "Soybean", "Wheat"])
-        tips.append("Yellow soil needs organic matter and proper fertilization")
-    
-    # Texture-based recommendations
-    if soil_texture == "clay":
-        recommendations.extend(["Rice", "Wheat", "Sugarcane"])
-        tips.append("Clay soil benefits from deep plowing and organic matter addition")
-    elif soil_texture == "sandy":
-        recommendations.extend(["Groundnut", "Sunflower", "Pearl Millet"])
-        tips.append("Sandy soil needs frequent irrigation and organic matter")
-    elif soil_texture == "loamy":
-        recommendations.extend(["Maize", "Soybean", "Vegetables"])
-        tips.append("Loamy soil is ideal - maintain organic matter content")
-    
-    # Drainage-based tips
-    if drainage == "poor":
-        tips.append("Install proper drainage systems to prevent waterlogging")
-    elif drainage == "good":
-        tips.append("Maintain good drainage with proper field leveling")
-    
-    # Moisture-based tips
-    if moisture_level == "dry":
-        tips.append("Implement mulching and drip irrigation for water conservation")
-    elif moisture_level == "wet":
-        tips.append("Improve drainage and avoid over-irrigation")
-    
+    # Every combination is precompiled from the shared rule table
+    assessment = lookup_assessment(soil_color, soil_texture, drainage, moisture_level)
+    tips = list(assessment.tips)
+
     # Crop-specific advice
     if crop_intended:
         tips.append(f"For {crop_intended}, ensure proper spacing and timely irrigation")
-    
-    # Remove duplicates and limit recommendations
-    recommendations = list(set(recommendations))[:3]
-    
-    # Generate comprehensive advice
-    advice_parts = [
-        color_analysis.get(soil_color, ""),
-        texture_analysis.get(soil_texture, ""),
-        drainage_analysis.get(drainage, ""),
-        moisture_analysis.get(moisture_level, "")
-    ]
-    
-    advice = " ".join([part for part in advice_parts if part])
-    
+
     return {
-        "advice": advice,
-        "recommendations": recommendations,
+        "advice": assessment.advice,
+        "recommendations": list(assessment.recommendations),
         "tips": tips
     }
 
+@app.route("/_writes")
+def write_queue_stats():
+    writes = get_writes()
+    return jsonify(writes.stats() if writes else {"enabled": False})
+
 # Debug route to list all routes
 @app.route("/_routes")
 def list_routes():
@@ -0,0 +1,82 @@
+"""
+Measure gunicorn boot time and per-worker memory for several worker counts.
+
+Starts the production config with each worker count, waits until /health
+answers, then reads /proc for the master and every worker. With preload_app
+the shared data is built once in the master, so proportional (PSS) memory
+per worker should fall as workers are added while private memory stays flat.
+
+    python measure_startup.py 1 2 4
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PORT = int(os.environ.get("MEASURE_PORT", 5099))
+
+
+def memory_kb(pid):
+    """(rss, pss, private) in kB from /proc/<pid>/smaps_rollup"""
+    values = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in values:
+                values[key] = int(rest.split()[0])
+    return values["Rss"], values["Pss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def measure(workers, timeout=60):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(PORT))
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(HERE, "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{PORT}", "--access-logfile", "/dev/null"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            if time.monotonic() - started > timeout:
+                raise RuntimeError(f"server did not come up within {timeout}s")
+            try:
+                requests.get(f"http://127.0.0.1:{PORT}/health", timeout=1).raise_for_status()
+                if len(children(server.pid)) == workers:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        ready_ms = (time.monotonic() - started) * 1000
+
+        master = memory_kb(server.pid)
+        per_worker = [memory_kb(pid) for pid in children(server.pid)]
+        return ready_ms, master, per_worker
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4]
+    print(f"{'workers':>7} {'ready ms':>9} {'master MB':>10} {'worker PSS MB':>14} "
+          f"{'worker private MB':>18} {'total PSS MB':>13}")
+    for workers in counts:
+        ready_ms, master, per_worker = measure(workers)
+        pss = sum(w[1] for w in per_worker) / len(per_worker)
+        private = sum(w[2] for w in per_worker) / len(per_worker)
+        total = master[1] + sum(w[1] for w in per_worker)
+        print(f"{workers:>7} {ready_ms:>9.0f} {master[0] / 1024:>10.1f} {pss / 1024:>14.1f} "
+              f"{private / 1024:>18.1f} {total / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Test setup: backend modules import each other flat (as backend/app.py runs),
+and the app's SQLite stores go to a throwaway directory.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "backend"), ROOT]
+
+# Before anything imports backend/app.py, which opens these at import time
+_STATE = tempfile.mkdtemp(prefix="krishi-mitra-tests-")
+for name, filename in (("HISTORY_DB_PATH", "history.db"), ("ROLLUP_DB_PATH", "rollups.db"),
+                       ("MEMO_DB_PATH", "memo.db")):
+    os.environ.setdefault(name, os.path.join(_STATE, filename))
@@ -0,0 +1,59 @@
+import pytest
+
+from assessment import ASSESSMENT_RULES, ASSESSMENTS, PROPERTIES, lookup_assessment, lookup_estimate
+
+
+def test_every_combination_is_compiled():
+    expected = 1
+    for prop in PROPERTIES:
+        expected *= len(ASSESSMENT_RULES[prop]) + 1
+    assert len(ASSESSMENTS) == expected
+    with pytest.raises(TypeError):
+        ASSESSMENTS["red", None, None, None] = None
+
+
+def test_ties_rank_in_table_order():
+    # Rice and Sugarcane have two votes; Cotton and Wheat tie on one
+    assert lookup_assessment("black", "clay", "good", "moist").recommendations == ("Rice", "Sugarcane", "Cotton")
+    # Groundnut and Sunflower have two votes; Ragi beats Pearl Millet on table order
+    assert lookup_assessment("red", "sandy", None, None).recommendations == ("Groundnut", "Sunflower", "Ragi")
+    assert lookup_assessment("yellow", "loamy", "poor", "dry").recommendations == ("Maize", "Soybean", "Wheat")
+
+
+def test_advice_and_tips_follow_property_order():
+    assessment = lookup_assessment("red", "clay", "poor", "wet")
+    rules = [ASSESSMENT_RULES[prop][value] for prop, value in zip(PROPERTIES, ("red", "clay", "poor", "wet"))]
+    assert assessment.advice == " ".join(rule["advice"] for rule in rules)
+    assert assessment.tips == tuple(rule["tip"] for rule in rules)
+
+
+def test_unknown_values_are_ignored():
+    assert lookup_assessment("purple", ["clay"], None, "wet") == lookup_assessment(None, None, None, "wet")
+    assert lookup_estimate("purple", "silty") == lookup_estimate("brown", None)
+
+
+def test_estimates_do_not_drift():
+    first = lookup_estimate("black", "clay")
+    assert first == {"nitrogen": 180, "phosphorus": 25, "potassium": 320, "ph": 7.5}
+    first["potassium"] += 50
+    assert lookup_estimate("black", "clay")["potassium"] == 320
+
+
+def test_assessment_endpoint_is_repeatable():
+    from app import app
+
+    client = app.test_client()
+    body = {"soil_color": "black", "texture": "clay"}
+    responses = [client.post("/api/analyze/assessment", json=body).get_json() for _ in range(3)]
+    assert responses[0]["soil_params"]["potassium"] == 320
+    assert responses[0] == responses[1] == responses[2]
+
+
+def test_main_assessment_does_not_accumulate_tips():
+    import main
+
+    first = main.generate_soil_assessment("black", "clay", "good", "moist", "Rice")
+    second = main.generate_soil_assessment("black", "clay", "good", "moist", None)
+    assert first["tips"][-1] == "For Rice, ensure proper spacing and timely irrigation"
+    assert second["tips"] == first["tips"][:-1]
+    assert first["recommendations"] == ["Rice", "Sugarcane", "Cotton"]
@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+
+from batch import iter_json_array, iter_ndjson
+
+
+def stream(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_items_split_across_reads():
+    rows = [{"nitrogen": n, "ph": 6.5, "sample_id": f"s{n}"} for n in range(200)]
+    assert list(iter_json_array(stream(json.dumps(rows)), read_size=7)) == rows
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+    read1 = read
+
+    def readinto(self, buffer):
+        n = super().readinto(buffer)
+        self.consumed += n
+        return n
+
+
+def test_malformed_item_fails_without_reading_to_eof():
+    body = b'[{"nitrogen": 1}, {"nitrogen" 2}, ' + b'{"nitrogen": 3}, ' * 100_000 + b'{}]'
+    source = CountingStream(body)
+    items = iter_json_array(source, read_size=1024)
+    assert next(items) == {"nitrogen": 1}
+    with pytest.raises(ValueError, match="Malformed"):
+        next(items)
+    assert source.consumed < 64 * 1024
+
+
+def test_oversized_item_fails_at_the_cap():
+    source = CountingStream(b'[{"note": "' + b"x" * 10_000_000 + b'"}]')
+    with pytest.raises(ValueError, match="longer than"):
+        list(iter_json_array(source, read_size=4096, max_item_size=100_000))
+    assert source.consumed < 1_000_000
+
+
+def test_truncated_array_is_malformed():
+    with pytest.raises(ValueError):
+        list(iter_json_array(stream('[{"nitrogen": 1}, {"nitrogen": tr')))
+
+
+def test_non_finite_rows_are_per_row_errors():
+    from app import app
+
+    body = "\n".join(json.dumps(row) for row in (
+        {"nitrogen": 250, "phosphorus": 30, "potassium": 200, "ph": 6.5},
+        {"nitrogen": "nan", "phosphorus": 30, "potassium": 200, "ph": 6.5},
+        {"nitrogen": 250, "phosphorus": "inf", "potassium": 200, "ph": 6.5},
+    ))
+    response = app.test_client().post("/api/analyze/lab-report/batch", data=body,
+                                      content_type="application/x-ndjson")
+    # json.loads rejects NaN, so every line is strict JSON
+    lines = [json.loads(line, parse_constant=pytest.fail) for line in response.get_data(as_text=True).splitlines()]
+    assert "soil_score" in lines[0]
+    assert [line["row"] for line in lines] == [0, 1, 2]
+    assert "finite" in lines[1]["error"] and "finite" in lines[2]["error"]
+
+
+def post_batch(body, content_type):
+    from app import app
+
+    response = app.test_client().post("/api/analyze/lab-report/batch", data=body, content_type=content_type)
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_oversized_csv_field_ends_with_a_fatal_row():
+    body = "nitrogen,phosphorus,potassium,ph,note\n250,30,200,6.5,ok\n250,30,200,6.5," + "x" * 200_000 + "\n"
+    lines = post_batch(body, "text/csv")
+    assert "soil_score" in lines[0]
+    assert lines[-1]["fatal"] is True and "CSV" in lines[-1]["error"]
+
+
+def test_oversized_ndjson_line_fails_without_reading_it_whole():
+    source = CountingStream(b'{"nitrogen": 250}\n{"note": "' + b"x" * 10_000_000 + b'"}\n')
+    items = iter_ndjson(source, max_line_size=100_000)
+    assert next(items) == {"nitrogen": 250}
+    with pytest.raises(ValueError, match="Line 2 longer than"):
+        next(items)
+    assert source.consumed < 1_000_000
+
+
+def test_ndjson_lines_at_the_limit_are_read():
+    assert list(iter_ndjson(stream('{"a": 1}\n\n{"b": 2}'), max_line_size=9)) == [{"a": 1}, {"b": 2}]
+
+
+def test_oversized_ndjson_line_ends_with_a_fatal_row():
+    lines = post_batch('{"nitrogen": 250}\n{"note": "' + "x" * 2_000_000 + '"}\n', "application/x-ndjson")
+    assert [line["row"] for line in lines] == [0, 1]
+    assert lines[-1]["fatal"] is True and "longer than" in lines[-1]["error"]
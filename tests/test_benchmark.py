@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark import compare
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def report(layer, **results):
+    return {"layer": layer, "commit": "abc1234",
+            "results": [dict(key=key, **metrics) for key, metrics in results.items()]}
+
+
+def run_benchmark(*args):
+    return subprocess.run([sys.executable, os.path.join(ROOT, "benchmark.py"), *args], cwd=ROOT,
+                          capture_output=True, text=True, timeout=120)
+
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    old = report("load", health={"p95_ms": 10.0, "p99_ms": 20.0, "throughput_rps": 1000.0},
+                 gone={"p95_ms": 1.0})
+    new = report("load", health={"p95_ms": 10.5, "p99_ms": 30.0, "throughput_rps": 850.0},
+                 added={"p95_ms": 1.0})
+    rows = {(key, metric): (change, regressed) for key, metric, _, _, change, regressed in compare(old, new, 0.10)}
+    assert rows[("health", "p95_ms")] == (pytest.approx(0.05), False)
+    assert rows[("health", "p99_ms")] == (pytest.approx(0.5), True)
+    # Lower throughput is the regression
+    assert rows[("health", "throughput_rps")] == (pytest.approx(-0.15), True)
+    assert {key for key, _ in rows} == {"health"}
+
+    with pytest.raises(ValueError):
+        compare(report("micro"), new, 0.10)
+
+
+def test_compare_command_exits_nonzero_on_regressions(tmp_path):
+    old, same, slower = tmp_path / "old.json", tmp_path / "same.json", tmp_path / "slower.json"
+    old.write_text(json.dumps(report("micro", **{"calculate_soil_score/batch/100": {"best_s": 1e-4}})))
+    same.write_text(json.dumps(report("micro", **{"calculate_soil_score/batch/100": {"best_s": 1.05e-4}})))
+    slower.write_text(json.dumps(report("micro", **{"calculate_soil_score/batch/100": {"best_s": 2e-4}})))
+
+    assert run_benchmark("compare", str(old), str(same)).returncode == 0
+    regressed = run_benchmark("compare", str(old), str(slower))
+    assert regressed.returncode == 1
+    assert "REGRESSION" in regressed.stdout and "1 regression(s)" in regressed.stderr
+    assert run_benchmark("compare", str(old), str(slower), "--threshold", "1.5").returncode == 0
+
+
+def test_micro_reports_scalar_and_batch_timings(tmp_path):
+    output = tmp_path / "micro.json"
+    result = run_benchmark("micro", "--sizes", "1", "10", "--only", "calculate_soil_score",
+                           "--min-time", "0.01", "-o", str(output))
+    assert result.returncode == 0, result.stderr
+    data = json.loads(output.read_text())
+    assert data["layer"] == "micro"
+    assert [r["key"] for r in data["results"]] == [
+        "calculate_soil_score/scalar/1", "calculate_soil_score/batch/1",
+        "calculate_soil_score/scalar/10", "calculate_soil_score/batch/10",
+    ]
+    assert all(r["best_s"] > 0 for r in data["results"])
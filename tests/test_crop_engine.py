@@ -0,0 +1,116 @@
+"""
+The vectorized kernels against the scalar scoring they replaced: scores
+must match exactly, and rankings must break ties in crop database order.
+"""
+
+import numpy as np
+import pytest
+
+import app as api
+from crop_engine import NUTRIENTS, SOIL_SCORE_BANDS, rank_crops, soil_score_vector, suitability_grid
+
+
+def reference_soil_score(n, p, k, ph):
+    """calculate_soil_score as it was before crop_engine"""
+    score = 0
+    bands = {
+        "nitrogen": (n, ((180, 300), (150, 350), (120, 400))),
+        "phosphorus": (p, ((30, 50), (20, 70), (15, 90))),
+        "potassium": (k, ((150, 250), (120, 280), (100, 300))),
+        "ph": (ph, ((6.0, 7.5), (5.5, 8.0), (5.0, 8.5))),
+    }
+    for value, ((lo1, hi1), (lo2, hi2), (lo3, hi3)) in bands.values():
+        if lo1 <= value <= hi1:
+            score += 25
+        elif lo2 <= value < lo1 or hi1 < value <= hi2:
+            score += 20
+        elif lo3 <= value < lo2 or hi2 < value <= hi3:
+            score += 15
+        else:
+            score += 10
+    return min(score, 100)
+
+
+def reference_recommendations(crops, soil_params):
+    """recommend_crops as it was before crop_engine: (crop, confidence) best first"""
+    scored = [(name, api.calculate_crop_suitability(crop["ideal_conditions"], soil_params))
+              for name, crop in crops.items()]
+    scored = [(name, score) for name, score in scored if score >= 70]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:5]
+
+
+def boundary_samples(crops):
+    """Every crop range edge and soil band edge, just inside and just outside"""
+    edges = {nutrient: set() for nutrient in NUTRIENTS}
+    for crop in crops.values():
+        for nutrient in NUTRIENTS:
+            lo, hi = crop["ideal_conditions"][nutrient]
+            edges[nutrient].update((lo, hi, (lo + hi) / 2))
+    for nutrient, bands in SOIL_SCORE_BANDS.items():
+        edges[nutrient].update(edge for band in bands for edge in band)
+    rows = []
+    rng = np.random.default_rng(1)
+    for nutrient, values in edges.items():
+        for value in sorted(values):
+            for v in (value, np.nextafter(value, -np.inf), np.nextafter(value, np.inf)):
+                row = {"ph": 6.5, "nitrogen": 250.0, "phosphorus": 40.0, "potassium": 200.0}
+                row.update({other: float(rng.choice(sorted(edges[other]))) for other in NUTRIENTS
+                            if other != nutrient and rng.random() < 0.5})
+                row[nutrient] = float(v)
+                rows.append(row)
+    return rows
+
+
+def random_samples(n, seed, integers=False):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform([3.0, 0.0, 0.0, 0.0], [10.0, 700.0, 150.0, 700.0], size=(n, 4))
+    if integers:
+        # Whole kg/ha values make equal suitabilities, so ties get exercised
+        x[:, 1:] = np.round(x[:, 1:])
+        x[:, 0] = np.round(x[:, 0], 1)
+    return [dict(zip(NUTRIENTS, row)) for row in x.tolist()]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return api.crop_snapshot()
+
+
+@pytest.fixture(scope="module")
+def samples(snapshot):
+    return boundary_samples(snapshot.crops) + random_samples(2000, 0) + random_samples(2000, 1, integers=True)
+
+
+def test_soil_scores_match_the_scalar_rules(samples):
+    vector = soil_score_vector(samples)
+    expected = [reference_soil_score(s["nitrogen"], s["phosphorus"], s["potassium"], s["ph"]) for s in samples]
+    assert vector.tolist() == expected
+    assert [api.calculate_soil_score(s["nitrogen"], s["phosphorus"], s["potassium"], s["ph"])
+            for s in samples[:200]] == expected[:200]
+
+
+def test_suitability_matches_the_scalar_rules_exactly(snapshot, samples):
+    grid = suitability_grid(snapshot.matrix, samples)
+    ideals = [snapshot.crops[name]["ideal_conditions"] for name in snapshot.matrix.names]
+    expected = np.array([[api.calculate_crop_suitability(ideal, s) for ideal in ideals] for s in samples])
+    # Bit for bit, not approximately
+    assert np.array_equal(grid, expected)
+
+
+def test_rankings_match_including_ties(snapshot, samples):
+    grid = suitability_grid(snapshot.matrix, samples)
+    ties = 0
+    for s, scores in zip(samples, grid):
+        ranked = [(snapshot.matrix.names[i], score) for i, score in rank_crops(snapshot.matrix, scores)]
+        expected = reference_recommendations(snapshot.crops, s)
+        assert ranked == expected
+        confidences = [score for _, score in expected]
+        ties += len(confidences) != len(set(confidences))
+    assert ties > 100
+
+
+def test_recommend_crops_matches_the_scalar_path(snapshot):
+    for s in random_samples(200, 2, integers=True):
+        recommended = [(c["crop"], c["confidence"]) for c in api.recommend_crops(s)]
+        assert recommended == reference_recommendations(snapshot.crops, s)
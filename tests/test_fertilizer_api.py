@@ -0,0 +1,24 @@
+import pytest
+
+from app import app
+
+FIELD = {"crop": "ragi", "nitrogen": 150, "phosphorus": 10, "potassium": 100, "ph": 6.5}
+
+
+def plan(**body):
+    return app.test_client().post("/api/fertilizer/plan/batch", json=dict({"fields": [FIELD]}, **body))
+
+
+@pytest.mark.parametrize("price", [True, False, float("nan"), float("inf"), -1, "12"])
+def test_invalid_prices_are_rejected(price):
+    assert plan(prices={"Urea": price}).status_code == 400
+
+
+@pytest.mark.parametrize("body", [{"fym_tonnes": "nan"}, {"fields": [dict(FIELD, field_size="inf")]}])
+def test_non_finite_quantities_are_rejected(body):
+    assert plan(**body).status_code == 400
+
+
+def test_valid_prices_are_used():
+    cheap, dear = plan(prices={"Urea": 1}).get_json(), plan(prices={"Urea": 100}).get_json()
+    assert cheap["total_cost_inr"] <= dear["total_cost_inr"]
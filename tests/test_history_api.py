@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import app as api
+from firebase_auth import DEFAULT_CREDENTIALS_PATH, TokenVerifier
+
+ORIGIN = "https://krishi-mitra-3da67.web.app"
+
+
+class FakeVerifier:
+    """'Bearer token-<uid>' signs in as <uid>"""
+
+    def uid(self, authorization):
+        scheme, _, token = (authorization or "").partition(" ")
+        return token[len("token-"):] if scheme == "Bearer" and token.startswith("token-") else None
+
+
+def signed_in(uid):
+    return {"Authorization": f"Bearer token-{uid}"}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "AUTH", FakeVerifier())
+    monkeypatch.setattr(api, "HISTORY", api.HistoryStore(str(tmp_path / "history.db")))
+    return api.app.test_client()
+
+
+def save(client, uid, score, headers=None):
+    return client.post("/api/save-analysis", json={"userId": uid, "method": "lab_report", "soil_score": score},
+                       headers=signed_in(uid) if headers is None else headers)
+
+
+def test_history_needs_the_owners_token(client):
+    assert save(client, "alice", 71).status_code == 201
+    assert save(client, "alice", 72, headers={}).status_code == 401
+    assert save(client, "alice", 73, headers=signed_in("mallory")).status_code == 403
+
+    assert client.get("/api/history/alice").status_code == 401
+    assert client.get("/api/history/alice", headers={"Authorization": "Bearer forged"}).status_code == 401
+    assert client.get("/api/history/alice", headers=signed_in("mallory")).status_code == 403
+    items = client.get("/api/history/alice", headers=signed_in("alice")).get_json()
+    assert [item["score"] for item in items] == [71]
+
+    item_url = f"/api/history/alice/{items[0]['id']}"
+    assert client.get(item_url, headers=signed_in("mallory")).status_code == 403
+    assert client.get(item_url, headers=signed_in("alice")).status_code == 200
+
+
+def test_cursor_is_readable_cross_origin(client):
+    for score in range(5):
+        save(client, "alice", score)
+
+    headers = dict(signed_in("alice"), Origin=ORIGIN)
+    response = client.get("/api/history/alice?limit=3", headers=headers)
+    assert "X-Next-Cursor" in response.headers["Access-Control-Expose-Headers"]
+    rest = client.get(f"/api/history/alice?limit=3&before={response.headers['X-Next-Cursor']}", headers=headers)
+    assert [item["score"] for item in response.get_json() + rest.get_json()] == [4, 3, 2, 1, 0]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_history_is_unavailable_without_verification(client, monkeypatch):
+    monkeypatch.setattr(api, "AUTH", None)
+    assert client.get("/api/history/alice", headers=signed_in("alice")).status_code == 503
+
+
+@pytest.mark.skipif(not os.path.exists(DEFAULT_CREDENTIALS_PATH), reason="no service account file")
+def test_malformed_tokens_are_rejected_without_network():
+    verifier = TokenVerifier(DEFAULT_CREDENTIALS_PATH)
+    assert verifier.uid(None) is None
+    assert verifier.uid("Basic abc") is None
+    assert verifier.uid("Bearer not-a-jwt") is None
@@ -0,0 +1,65 @@
+import json
+import shutil
+
+import pytest
+
+import app as api
+from inference import InferenceEngine, load_spec
+
+SOIL = {"nitrogen": 250, "phosphorus": 30, "potassium": 200, "ph": 6.5}
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / "model.tflite"
+    shutil.copy(api.DEFAULT_MODEL_PATH, path)
+    return path
+
+
+def write_spec(model_path, **spec):
+    features = [{"name": name, "scale": 10.0, "default": 1.0}
+                for name in ("nitrogen", "phosphorus", "potassium", "ph", "organic_carbon", "moisture")]
+    model_path.with_suffix(".json").write_text(json.dumps(dict({"features": features}, **spec)))
+
+
+def test_a_model_without_a_spec_is_not_loaded(model_path):
+    with pytest.raises(OSError):
+        load_spec(str(model_path))
+    with pytest.raises(OSError):
+        InferenceEngine(str(model_path), backend="numpy")
+
+
+def test_spec_must_describe_the_features(model_path):
+    model_path.with_suffix(".json").write_text(json.dumps({"features": [{"name": "nitrogen"}]}))
+    with pytest.raises(ValueError):
+        load_spec(str(model_path))
+
+
+def test_spec_names_model_outputs(model_path):
+    labels = [f"crop {i}" for i in range(10)]
+    write_spec(model_path, labels={"output_2": labels}, top_classes=2)
+    engine = InferenceEngine(str(model_path), backend="numpy")
+    single, batch = engine.predict(SOIL), engine.predict_batch([SOIL])[0]
+    assert single == batch
+    assert single["model_version"] == engine.version
+    assert isinstance(single["output_0"], float)
+    assert len(single["output_2"]) == 2 and {c["label"] for c in single["output_2"]} <= set(labels)
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "/api/analyze/lab-report", SOIL),
+    ("post", "/api/analyze/assessment", {"soil_color": "red", "texture": "sandy"}),
+    ("get", "/api/analyze/location/hebbal", None),
+])
+def test_responses_omit_the_prediction_without_a_model(monkeypatch, method, path, body):
+    monkeypatch.setattr(api, "MODEL", None)
+    response = getattr(api.app.test_client(), method)(path, json=body)
+    assert response.status_code == 200
+    assert "model_prediction" not in response.get_json()
+
+
+def test_responses_carry_the_prediction_with_a_model(monkeypatch, model_path):
+    write_spec(model_path)
+    monkeypatch.setattr(api, "MODEL", InferenceEngine(str(model_path), backend="numpy"))
+    result = api.app.test_client().post("/api/analyze/assessment", json={}).get_json()
+    assert result["model_prediction"]["model_version"] == api.MODEL.version
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from journal import SoilJournal, content_id
+from write_behind import InMemoryFirestore, WriteBehindQueue
+
+
+def test_entries_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "journal.db")
+    seq, doc_id = SoilJournal(path).append("soil", {"ph": 6.5})
+    assert doc_id == content_id("soil", {"ph": 6.5})
+
+    reopened = SoilJournal(path)
+    assert len(reopened) == 1
+    assert reopened.pending() == [(seq, "soil", doc_id, {"ph": 6.5})]
+
+
+def test_same_content_reuses_one_entry(tmp_path):
+    journal = SoilJournal(str(tmp_path / "journal.db"))
+    first = journal.append("soil", {"ph": 6.5, "n": 300})
+    assert journal.append("soil", {"n": 300, "ph": 6.5}) == first
+    other = journal.append("history", {"ph": 6.5, "n": 300})
+    assert other[1] != first[1]
+    assert len(journal) == 2
+
+
+def test_concurrent_appends_share_commits(tmp_path):
+    journal = SoilJournal(str(tmp_path / "journal.db"), group_window=0.05)
+    commits = []
+    commit = journal._commit
+    journal._commit = lambda group: (commits.append(len(group)), commit(group))
+
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(journal.append("soil", {"n": i})))
+               for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == len({seq for seq, _ in results}) == len(journal) == 20
+    assert sum(commits) == 20 and len(commits) < 20
+
+
+def test_pending_filters_and_remove_drops(tmp_path):
+    journal = SoilJournal(str(tmp_path / "journal.db"))
+    seqs = [journal.append("soil", {"n": i})[0] for i in range(5)]
+
+    assert [entry[0] for entry in journal.pending(limit=3)] == seqs[:3]
+    assert [entry[0] for entry in journal.pending(limit=3, exclude={seqs[0]})] == seqs[1:4]
+    assert journal.pending(older_than=60) == []
+
+    journal.remove([seqs[1], None, seqs[3]])
+    assert [entry[3]["n"] for entry in journal.pending()] == [0, 2, 4]
+
+
+def test_entries_written_during_an_outage_replay_once(tmp_path):
+    journal = SoilJournal(str(tmp_path / "journal.db"))
+    client = InMemoryFirestore()
+    client.fail_commits = 1_000
+    q = WriteBehindQueue(client, flush_interval=0.01, max_retries=0, retry_backoff=0.001,
+                         journal=journal, replay_interval=0.05)
+    try:
+        ids = [q.enqueue("soil", {"n": i}) for i in range(5)]
+        deadline = time.monotonic() + 5
+        while q.stats()["failed"] < 5 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        # Nothing reached Firestore, but nothing was lost either
+        assert client.documents == {} and len(journal) == 5
+
+        client.fail_commits = 0
+        while len(journal) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert len(journal) == 0
+        assert set(client.documents) == {("soil", doc_id) for doc_id in ids}
+        assert q.stats()["replayed"] >= 5
+    finally:
+        q.close()
@@ -0,0 +1,31 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    saved = []
+    monkeypatch.setattr(main, "save_entry", lambda collection, data: saved.append((collection, data)) or "entry-1")
+    client = main.app.test_client()
+    client.saved = saved
+    return client
+
+
+@pytest.mark.parametrize("reading,score,recommendations", [
+    ({"N": 0.2, "P": 20, "K": 150, "pH": 6.5, "moisture": 25}, 100, ["Maize", "Ragi"]),
+    ({"N": 0.2, "P": 20, "K": 150, "pH": 7.5}, 80, ["Maize", "Ragi"]),
+    ({"N": 0.12, "P": 20, "K": 150, "pH": 6.5}, 60, ["Groundnut"]),
+    ({"N": 0.1, "P": 5, "K": 50, "pH": 8, "moisture": 40}, 0, ["Groundnut"]),
+])
+def test_manual_readings_are_scored_on_the_kit_bands(client, reading, score, recommendations):
+    response = client.post("/soil/manual", json=reading)
+    assert response.status_code == 201
+    assert response.get_json() == {"soil_score": score, "recommendations": recommendations,
+                                   "soil_entry_id": "entry-1"}
+    assert client.saved[0][1]["soil_score"] == score
+
+
+def test_manual_readings_need_npk_and_ph(client):
+    assert client.post("/soil/manual", json={"N": 0.2, "P": 20, "K": "lots", "pH": 6.5}).status_code == 400
+    assert client.saved == []
@@ -0,0 +1,115 @@
+import json
+import sqlite3
+
+import pytest
+
+import memo
+from memo import ResultCache, canonical_key, quantize
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT key, version FROM memo ORDER BY key").fetchall()
+
+
+def test_equal_cards_share_a_key():
+    a = quantize({"nitrogen": 280.04, "phosphorus": "25", "potassium": 140, "ph": 6.499999})
+    b = quantize({"nitrogen": 280.0, "phosphorus": 25.0, "potassium": 140.0, "ph": 6.5})
+    assert a == b
+    assert canonical_key("lab-report", a) == "lab-report:280.0:25.0:140.0:6.5"
+    assert quantize({"nitrogen": -0.0, "phosphorus": 0, "potassium": 0, "ph": 7})["nitrogen"] == 0.0
+
+
+def test_second_worker_reads_the_shared_tier(tmp_path):
+    path = str(tmp_path / "memo.db")
+    first, second = ResultCache(path), ResultCache(path)
+    first.put("k", "v1", "etag-1", b'{"score":80}')
+
+    assert first.get("k", "v1") == ("etag-1", b'{"score":80}', "local")
+    assert second.get("k", "v1") == ("etag-1", b'{"score":80}', "shared")
+    assert second.get("k", "v1")[2] == "local"
+    assert second.get("other", "v1") is None
+
+
+def test_new_version_stops_matching_and_purges_old_entries(tmp_path):
+    path = str(tmp_path / "memo.db")
+    old_worker, new_worker = ResultCache(path), ResultCache(path)
+    old_worker.put("a", "v1", "etag-a", b"a")
+    old_worker.put("b", "v1", "etag-b", b"b")
+
+    assert new_worker.get("a", "v2") is None
+    assert rows(path) == []
+    # The other worker's local copies go too once it sees the new version
+    assert old_worker.get("a", "v2") is None
+    new_worker.put("a", "v2", "etag-a2", b"a2")
+    assert old_worker.get("a", "v2") == ("etag-a2", b"a2", "shared")
+
+
+def test_trim_evicts_the_least_recently_used_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "memo.db")
+    now = [1_000]
+    monkeypatch.setattr(memo.time, "time", lambda: now[0])
+    cache = ResultCache(path, max_entries=2, local_entries=0)
+    for key in ("a", "b", "c"):
+        cache.put(key, "v1", key, key.encode())
+        now[0] += 1
+    # Reading 'a' after TOUCH_INTERVAL makes 'b' the oldest
+    now[0] += memo.TOUCH_INTERVAL
+    assert cache.get("a", "v1")[2] == "shared"
+
+    cache.trim()
+    assert rows(path) == [("a", "v1"), ("c", "v1")]
+
+
+def test_every_trim_every_inserts_bound_the_table(tmp_path):
+    path = str(tmp_path / "memo.db")
+    cache = ResultCache(path, max_entries=10, local_entries=5)
+    for i in range(memo.TRIM_EVERY):
+        cache.put(f"k{i}", "v1", str(i), b"x")
+    assert len(rows(path)) == 10
+
+
+@pytest.fixture
+def lab_client(monkeypatch, tmp_path):
+    import app
+
+    cache = ResultCache(str(tmp_path / "memo.db"))
+    tiers = []
+    get = cache.get
+
+    def recording_get(key, version):
+        hit = get(key, version)
+        tiers.append(hit[2] if hit else "miss")
+        return hit
+    monkeypatch.setattr(cache, "get", recording_get)
+    monkeypatch.setattr(app, "MEMO", cache)
+    client = app.app.test_client()
+    client.tiers = tiers
+    return client
+
+
+def test_crop_database_change_invalidates_memoized_reports(lab_client, monkeypatch, tmp_path):
+    import app
+    from knowledge import DEFAULT_SOURCE_PATH, KnowledgeStore
+
+    source = tmp_path / "crop-knowledge.json"
+    crops = json.loads(open(DEFAULT_SOURCE_PATH, encoding="utf-8").read())
+    source.write_text(json.dumps(crops))
+    knowledge = KnowledgeStore(str(tmp_path / "crops.snapshot"), source=str(source), check_interval=0)
+    monkeypatch.setattr(app, "KNOWLEDGE", knowledge)
+
+    card = {"nitrogen": 280, "phosphorus": 25, "potassium": 140, "ph": 6.5}
+    first = lab_client.post("/api/analyze/lab-report", json=card)
+    again = lab_client.post("/api/analyze/lab-report", json=dict(card, nitrogen="280.04"))
+    assert lab_client.tiers == ["miss", "local"]
+    assert again.get_data() == first.get_data() and again.headers["ETag"] == first.headers["ETag"]
+
+    # An edited crop database is a new digest, so a new memo version
+    crops["ragi"]["ideal_conditions"]["ph"] = [6.0, 7.0]
+    source.write_text(json.dumps(crops))
+    knowledge.check(force=True)
+    assert knowledge.swaps == 1
+
+    lab_client.post("/api/analyze/lab-report", json=card)
+    assert lab_client.tiers == ["miss", "local", "miss"]
+    assert {version for _, version in rows(app.MEMO.path)} == {app.memo_version()}
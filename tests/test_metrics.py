@@ -0,0 +1,65 @@
+import os
+
+from flask import Flask
+
+from metrics import ARCHIVE_NAME, MetricsRegistry, render
+
+
+def make_app(directory):
+    app = Flask("metrics-test")
+    registry = MetricsRegistry("api", str(directory), dump_interval=60)
+    registry.install(app)
+    app.add_url_rule("/ping", "ping", lambda: "pong")
+    return app, registry
+
+
+def requests_total(client):
+    text = client.get("/metrics").get_data(as_text=True)
+    line = 'krishi_http_requests_total{endpoint="ping",method="GET",status="200"} '
+    return sum(int(row[len(line):]) for row in text.splitlines() if row.startswith(line))
+
+
+def test_metrics_add_up_across_workers(tmp_path):
+    app, registry = make_app(tmp_path)
+    ready_r, ready_w = os.pipe()
+    done_r, done_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            client = app.test_client()
+            for _ in range(3):
+                client.get("/ping")
+            registry.dump()
+            os.write(ready_w, b"x")
+            os.read(done_r, 1)
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.read(ready_r, 1)
+    client = app.test_client()
+    for _ in range(2):
+        client.get("/ping")
+    # Any worker answers for every live worker
+    assert requests_total(client) == 5
+    assert os.path.exists(tmp_path / "api" / f"{pid}.json")
+
+    os.write(done_w, b"x")
+    assert os.waitpid(pid, 0)[1] == 0
+    # An exited worker's counts move to the archive rather than vanishing
+    assert requests_total(client) == 5
+    assert not os.path.exists(tmp_path / "api" / f"{pid}.json")
+    assert os.path.exists(tmp_path / "api" / ARCHIVE_NAME)
+
+
+def test_without_a_directory_only_this_process_is_reported():
+    registry = MetricsRegistry("solo")
+    registry.record_request("ping", "GET", 500, 0.003)
+    registry.observe_span("firestore.commit", 0.02, error=True)
+    text = render(registry.collect())
+    assert 'krishi_http_request_errors_total{endpoint="ping",method="GET"} 1' in text
+    assert 'krishi_http_request_duration_seconds_bucket{endpoint="ping",method="GET",le="0.005"} 1' in text
+    assert 'krishi_http_request_duration_seconds_bucket{endpoint="ping",method="GET",le="0.0025"} 0' in text
+    assert 'krishi_span_errors_total{span="firestore.commit"} 1' in text
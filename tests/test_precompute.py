@@ -0,0 +1,81 @@
+from precompute import PrecomputedResponses
+
+
+class Source:
+    def __init__(self, size):
+        self.size = size
+        self.version = 1
+        self.built = []
+
+    def build(self, keys):
+        keys = range(self.size) if keys is None else keys
+        self.built.extend(keys)
+        for key in keys:
+            yield key, f"{key}@{self.version}".encode()
+
+
+def responses(source, max_entries):
+    return PrecomputedResponses(source.build, lambda: source.version, lambda: source.size, max_entries)
+
+
+def test_small_key_sets_are_built_up_front():
+    source = Source(5)
+    cache = responses(source, max_entries=10)
+    cache.refresh()
+    assert not cache.lazy and len(cache) == 5
+    assert cache.get(3).body == b"3@1"
+    assert source.built == [0, 1, 2, 3, 4]
+
+
+def test_large_key_sets_build_on_demand_within_the_bound():
+    source = Source(1_000)
+    cache = responses(source, max_entries=3)
+    cache.refresh()
+    assert cache.lazy and len(cache) == 0
+
+    for key in (1, 2, 3, 1, 4):
+        assert cache.get(key).body == f"{key}@1".encode()
+    # 1 was a hit, then 4 pushed out the least recently used (2)
+    assert source.built == [1, 2, 3, 4]
+    assert len(cache) == 3
+    cache.get(2)
+    assert source.built[-1] == 2
+
+
+def test_version_change_drops_lazy_entries():
+    source = Source(1_000)
+    cache = responses(source, max_entries=3)
+    etag = cache.get(7).etag
+    source.version = 2
+    entry = cache.get(7)
+    assert entry.body == b"7@2" and entry.etag != etag
+
+
+def test_lazy_and_eager_location_bodies_match():
+    from app import LOCATION_RESULTS, VILLAGE_STORE, build_location_results
+
+    eager = dict(build_location_results())
+    lazy = PrecomputedResponses(build_location_results, lambda: VILLAGE_STORE.version,
+                                lambda: len(VILLAGE_STORE), max_entries=2)
+    for village_id in (0, len(VILLAGE_STORE) - 1):
+        assert lazy.get(village_id).body == eager[village_id] == LOCATION_RESULTS.get(village_id).body
+    assert lazy.lazy
+
+
+def test_location_lookups_serve_precomputed_bytes_with_304s():
+    from app import LOCATION_RESULTS, VILLAGE_STORE, app
+
+    client = app.test_client()
+    entry = LOCATION_RESULTS.get(VILLAGE_STORE.get("hebbal").id)
+    response = client.get("/api/analyze/location/hebbal")
+    assert response.status_code == 200
+    assert response.get_data() == entry.body
+    assert response.headers["ETag"] == f'"{entry.etag}"'
+
+    posted = client.post("/api/analyze/location", json={"village": "hebbal"})
+    assert posted.get_data() == entry.body
+
+    revalidated = client.get("/api/analyze/location/hebbal", headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304 and revalidated.get_data() == b""
+    assert client.get("/api/analyze/location/hebbal", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get("/api/analyze/location/nowhere").status_code == 404
@@ -0,0 +1,57 @@
+import time
+
+from flask import Flask
+
+from profiling import RequestProfiler, merge, read_folded, render_svg, sign, verify
+
+
+def test_signed_headers_verify_until_they_expire():
+    value = sign("s3cret", ttl=60, now=1_000)
+    assert verify("s3cret", value, now=1_059)
+    assert not verify("s3cret", value, now=1_061)
+    assert not verify("other", value, now=1_000)
+    assert not verify(None, value, now=1_000)
+    expires, digest = value.split(".")
+    assert not verify("s3cret", f"{int(expires) + 600}.{digest}", now=1_000)
+    assert not verify("s3cret", "garbage", now=1_000)
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_merge_sums_workers_and_keeps_routes_apart(tmp_path):
+    write(tmp_path / "api" / "analyze" / "1.folded", "app;score 100\napp;rank 50\n")
+    write(tmp_path / "api" / "analyze" / "2.folded", "app;score 25\nbroken line\n")
+    write(tmp_path / "main" / "health" / "3.folded", "health 10\n")
+
+    assert read_folded([tmp_path / "api" / "analyze" / "1.folded"]) == {"app;score": 100, "app;rank": 50}
+    assert merge(str(tmp_path), apps=["api"]) == {"app;score": 125, "app;rank": 50}
+    assert merge(str(tmp_path)) == {"api/analyze;app;score": 125, "api/analyze;app;rank": 50,
+                                    "main/health;health": 10}
+    assert merge(str(tmp_path / "missing")) == {}
+
+    svg = render_svg(merge(str(tmp_path), routes=["analyze"]), title="analyze <1>")
+    assert svg.startswith("<svg") and "analyze &lt;1&gt;" in svg and "score" in svg
+
+
+def test_only_signed_requests_are_profiled(tmp_path):
+    app = Flask("profiling-test")
+
+    def slow():
+        time.sleep(0.05)
+        return "done"
+    app.add_url_rule("/slow", "slow", slow)
+    profiler = RequestProfiler("api", str(tmp_path), secret="s3cret", interval=0.001)
+    profiler.install(app)
+    client = app.test_client()
+
+    client.get("/slow")
+    client.get("/slow", headers={"X-Profile": "1.forged"})
+    assert not (tmp_path / "api").exists()
+
+    client.get("/slow", headers={"X-Profile": sign("s3cret")})
+    stacks = merge(str(tmp_path))
+    assert stacks and any("slow" in stack for stack in stacks)
+    assert sum(stacks.values()) >= 30_000
@@ -0,0 +1,33 @@
+import json
+
+from app import LOCATION_RESULTS, VILLAGE_STORE, app, crop_snapshot
+from render_static import ANALYSIS_DIR, MANIFEST_NAME, render
+
+
+def test_bundles_match_the_api_bytes(tmp_path):
+    manifest = render(str(tmp_path))
+    assert manifest == json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert manifest["crops"] == crop_snapshot().digest
+    assert sum(len(taluks) for taluks in manifest["villages"].values()) == len(VILLAGE_STORE)
+
+    client = app.test_client()
+    for slug, taluks in manifest["villages"].items():
+        for taluk, path in taluks.items():
+            village = VILLAGE_STORE.get(slug, taluk)
+            body = (tmp_path / path).read_bytes()
+            assert body == LOCATION_RESULTS.get(village.id).body
+            assert path.startswith(f"{ANALYSIS_DIR}/{taluk}/{slug}.")
+    slug, taluks = next(iter(manifest["villages"].items()))
+    assert (tmp_path / next(iter(taluks.values()))).read_bytes() == \
+        client.get(f"/api/analyze/location/{slug}").get_data()
+
+
+def test_rerendering_is_stable_and_drops_old_bundles(tmp_path):
+    first = render(str(tmp_path))
+    stale = tmp_path / ANALYSIS_DIR / "old" / "gone.json"
+    stale.parent.mkdir()
+    stale.write_text("{}")
+
+    assert render(str(tmp_path)) == first
+    assert not stale.exists()
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,66 @@
+import brotli
+import pytest
+
+import app as api
+from responses import CompressedBodies
+
+BR = {"Accept-Encoding": "br"}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    bodies = CompressedBodies()
+    monkeypatch.setattr(api, "COMPRESSED_BODIES", bodies)
+    return bodies
+
+
+def test_handler_etagged_bodies_use_the_compressed_cache(cache):
+    client = api.app.test_client()
+    first = client.get("/api/analyze/location/hebbal", headers=BR)
+    second = client.get("/api/analyze/location/hebbal", headers=BR)
+    assert first.headers["Content-Encoding"] == "br"
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert first.get_data() == second.get_data()
+
+
+def test_location_tree_uses_the_compressed_cache(cache):
+    client = api.app.test_client()
+    response = client.get("/api/locations/mysuru", headers=BR)
+    assert response.headers["Content-Encoding"] == "br"
+    assert (cache.misses, cache.hits) == (1, 0)
+    assert client.get("/api/locations/mysuru", headers=BR).get_data() == response.get_data()
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/locations/mysuru", headers=dict(BR, **{"If-None-Match": etag})).status_code == 304
+    plain = client.get("/api/locations/mysuru")
+    assert brotli.decompress(response.get_data()) == plain.get_data()
+    assert plain.headers["ETag"] == f'"{api.body_etag(plain.get_data())}"'
+
+
+def test_crop_details_carry_content_etags(cache):
+    client = api.app.test_client()
+    details = client.get("/api/crops/recommendations/ragi")
+    posted = client.post("/api/crops/recommendations", json={"crop": "ragi"})
+    assert details.get_data() == posted.get_data()
+    assert details.headers["ETag"] == posted.headers["ETag"] == f'"{api.body_etag(details.get_data())}"'
+    revalidated = client.get("/api/crops/recommendations/ragi", headers={"If-None-Match": details.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_dynamic_bodies_skip_the_compressed_cache(cache):
+    client = api.app.test_client()
+    response = client.get("/api/locations/search?q=h&limit=50", headers=BR)
+    assert response.headers["Content-Encoding"] == "br"
+    assert (cache.misses, cache.hits) == (0, 0)
+
+    # Still revalidated by the computed ETag
+    etag = response.headers["ETag"]
+    headers = dict(BR, **{"If-None-Match": etag})
+    assert client.get("/api/locations/search?q=h&limit=50", headers=headers).status_code == 304
+
+
+def test_projection_drops_the_handler_etag(cache):
+    response = api.app.test_client().get("/api/analyze/location/hebbal?fields=recommendations", headers=BR)
+    assert cache.misses == 0
+    assert list(api.app.json.loads(brotli.decompress(response.get_data()))) == ["recommendations"]
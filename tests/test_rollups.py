@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from rollups import ROLLUP_PARAMS, SKETCH_ACCURACY, Moments, QuantileSketch, RollupStore, SoilRollup
+
+RNG = np.random.default_rng(7)
+
+
+def samples(n):
+    return np.column_stack([RNG.uniform(100, 600, n), RNG.uniform(5, 80, n),
+                            RNG.uniform(50, 400, n), RNG.uniform(4.5, 8.5, n)])
+
+
+def test_merged_moments_match_numpy():
+    values = RNG.normal(300, 50, 1_000)
+    merged = Moments()
+    for part in np.array_split(values, 7):
+        moments = Moments()
+        moments.add(part)
+        merged.merge(moments)
+    assert merged.count == 1_000
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.variance == pytest.approx(values.var(ddof=1))
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_sketch_quantiles_are_within_the_relative_error():
+    values = RNG.lognormal(5, 1, 5_000)
+    sketch, halves = QuantileSketch(), [QuantileSketch(), QuantileSketch()]
+    sketch.add(values)
+    halves[0].add(values[:2_000])
+    halves[1].add(values[2_000:])
+    halves[0].merge(halves[1])
+    for q in (0.1, 0.5, 0.9):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= 2 * SKETCH_ACCURACY * exact
+        assert halves[0].quantile(q) == sketch.quantile(q)
+
+
+def test_rollups_round_trip_through_json():
+    rollup = SoilRollup()
+    rollup.add(samples(50))
+    assert SoilRollup.from_json(rollup.to_json()).summary() == rollup.summary()
+
+
+def test_workers_merge_into_one_shared_row(tmp_path):
+    path = str(tmp_path / "rollups.db")
+    store = RollupStore(path, flush_interval=60)
+    parent, child = samples(40), samples(60)
+    store.add([("taluk", "mysuru"), ("district", "mysuru")], parent)
+
+    pid = os.fork()
+    if pid == 0:
+        # The parent's pending samples are not the worker's to flush
+        status = 1
+        try:
+            store.add([("taluk", "mysuru")], child)
+            store.flush()
+            status = 0
+        finally:
+            os._exit(status)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    merged = store.get("taluk", "mysuru")
+    expected = SoilRollup()
+    expected.add(np.vstack([parent, child]))
+    assert merged.count == 100
+    for column, param in enumerate(ROLLUP_PARAMS):
+        assert merged.moments[param].mean == pytest.approx(expected.moments[param].mean)
+        assert merged.moments[param].variance == pytest.approx(expected.moments[param].variance)
+        assert merged.sketches[param].buckets == expected.sketches[param].buckets
+    assert store.get("district", "mysuru").count == 40
+    assert store.get("village", "hebbal") is None
+
+
+def test_pending_samples_are_flushed_in_the_background(tmp_path):
+    path = str(tmp_path / "rollups.db")
+    store = RollupStore(path, flush_interval=0.05)
+    store.add([("village", "hebbal")], samples(5))
+
+    conn = sqlite3.connect(path)
+    deadline = time.monotonic() + 5
+    while not conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]:
+        assert time.monotonic() < deadline, "flusher never wrote the pending delta"
+        time.sleep(0.01)
+    assert RollupStore(path).get("village", "hebbal").count == 5
+
+
+def test_failed_flushes_keep_the_delta(tmp_path):
+    path = str(tmp_path / "rollups.db")
+    store = RollupStore(path, flush_interval=60)
+    store.add([("village", "hebbal"), ("taluk", "mysuru")], samples(5))
+
+    blocker = sqlite3.connect(path, timeout=0, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    store._connection().execute("PRAGMA busy_timeout = 0")
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    blocker.execute("ROLLBACK")
+
+    assert store.get("village", "hebbal").count == 5
+    assert store.get("taluk", "mysuru").count == 5
+
+
+def test_location_tree_merges_lab_reports_into_the_cached_taluks(monkeypatch, tmp_path):
+    import app
+
+    monkeypatch.setattr(app, "ROLLUPS", RollupStore(str(tmp_path / "rollups.db"), flush_interval=60))
+    client = app.app.test_client()
+    before = client.get("/api/locations/mysuru").get_json()["taluks"]
+    assert all(taluk["lab_reports"] is None for taluk in before.values())
+
+    app.ROLLUPS.add([("taluk", "mysuru")], samples(3))
+    after = client.get("/api/locations/mysuru").get_json()["taluks"]
+    assert after["mysuru"]["lab_reports"]["samples"] == 3
+    assert {key: value for key, value in after["mysuru"].items() if key != "lab_reports"} == \
+        {key: value for key, value in before["mysuru"].items() if key != "lab_reports"}
+    assert app.taluk_locations() is app.taluk_locations()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import app as api
+from crop_engine import NUTRIENTS, rank_matrix, suitability_grid
+from memo import DECIMALS
+from sensitivity import axis_values, what_if
+
+# Sweeps over the whole plausible range, coarse enough that several
+# ranking changes fall inside one grid interval
+SWEEPS = {"ph": (3.0, 10.0, 0.5), "nitrogen": (0.0, 800.0, 40.0),
+          "phosphorus": (0.0, 150.0, 10.0), "potassium": (0.0, 800.0, 40.0)}
+
+
+def ranking(matrix, base, param, value):
+    row = np.array([[value if nutrient == param else base[nutrient] for nutrient in NUTRIENTS]])
+    return tuple(int(c) for c in rank_matrix(suitability_grid(matrix, row))[0] if c >= 0)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_ranking_changes_at_each_reported_flip(seed):
+    matrix = api.crop_snapshot().matrix
+    rng = np.random.default_rng(seed)
+    base = {"ph": round(rng.uniform(5, 8.5), 2), "nitrogen": round(rng.uniform(100, 500), 1),
+            "phosphorus": round(rng.uniform(10, 90), 1), "potassium": round(rng.uniform(100, 500), 1)}
+
+    for param, (low, high, step) in SWEEPS.items():
+        values = axis_values(low, high, step, DECIMALS[param])
+        flips = what_if(matrix, base, {param: values})[4][param]
+        # Tolerance well under the step, above the rounding the API applies to 'at'
+        eps = 10 ** -(DECIMALS[param] + 2)
+        for i, at, before, after in flips:
+            assert values[i] < at <= values[i + 1]
+            assert ranking(matrix, base, param, at - eps) == before
+            assert ranking(matrix, base, param, at + eps) != before
+        # Every interval whose ends rank differently has its flip
+        ends = [ranking(matrix, base, param, value) for value in values]
+        assert [i for i, _, _, _ in flips] == [i for i in range(len(values) - 1) if ends[i] != ends[i + 1]]
+
+
+def test_what_if_endpoint_reports_flip_positions():
+    response = api.app.test_client().post("/api/analyze/what-if", json={
+        "base": {"nitrogen": 250, "phosphorus": 40, "potassium": 200, "ph": 6.5},
+        "ranges": {"ph": {"min": 3, "max": 10, "step": 0.5}},
+    })
+    flips = response.get_json()["flips"]["ph"]
+    assert flips
+    matrix = api.crop_snapshot().matrix
+    base = {"nitrogen": 250, "phosphorus": 40, "potassium": 200, "ph": 6.5}
+    for flip in flips:
+        low, high = flip["between"]
+        assert low <= flip["at"] <= high
+        assert [matrix.names[c] for c in ranking(matrix, base, "ph", flip["at"] - 1e-4)] == flip["from"]
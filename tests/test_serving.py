@@ -0,0 +1,81 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_factory_builds_the_shared_tables_up_front():
+    assert app.create_app() is app.app
+    assert app.VILLAGE_STORE._spatial is not None
+    assert len(app.LOCATION_RESULTS) == len(app.VILLAGE_STORE)
+
+
+def test_forked_workers_open_their_own_sqlite_connections():
+    # The master touched every store before forking, as preload_app does
+    client = app.app.test_client()
+    card = {"nitrogen": 301, "phosphorus": 31, "potassium": 171, "ph": 6.61, "village": "hebbal"}
+    assert client.post("/api/analyze/lab-report", json=card).status_code == 200
+    village = app.rollup_keys(card)[0]
+    before = app.ROLLUPS.get(*village).count
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            worker = app.app.test_client()
+            response = worker.post("/api/analyze/lab-report", json=dict(card, nitrogen=302))
+            app.ROLLUPS.flush()
+            status = 0 if response.status_code == 200 else 2
+        finally:
+            os._exit(status)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    assert app.ROLLUPS.get(*village).count == before + 1
+    # The worker's memoized result is shared with the master's connection
+    assert app.MEMO.get(app.canonical_key("lab-report", app.parse_lab_params(dict(card, nitrogen=302))),
+                        app.memo_version())[2] == "shared"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_gunicorn_serves_from_preloaded_workers(tmp_path):
+    pytest.importorskip("gunicorn")
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY="2", GUNICORN_THREADS="2",
+               METRICS_DIR=str(tmp_path / "metrics"))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], cwd=ROOT, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                    assert json.load(response)["status"] == "ok"
+                break
+            except OSError:
+                assert server.poll() is None, server.stdout.read()
+                assert time.monotonic() < deadline, "gunicorn did not come up"
+                time.sleep(0.2)
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/analyze/location/hebbal", timeout=10) as response:
+            body = response.read()
+        assert body == app.LOCATION_RESULTS.get(app.VILLAGE_STORE.get("hebbal").id).body
+    finally:
+        server.terminate()
+        output, _ = server.communicate(timeout=30)
+
+    assert "Preload finished" in output
+    assert output.count("ready in") == 2
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+
+import app as api
+from spatial import SpatialGrid, haversine_km, idw_weights
+
+FAR_AWAY = [(-60, -170), (80, 170), (12.3, -170), (-90, 0), (90, 180)]
+
+
+@pytest.fixture(scope="module")
+def grid():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(11.5, 13.0, 2000), rng.uniform(75.8, 77.2, 2000)
+    return SpatialGrid(lat, lon, np.arange(2000) * 10), lat, lon
+
+
+@pytest.mark.parametrize("k", [1, 3, 8])
+def test_matches_a_brute_force_scan(grid, k):
+    index, lat, lon = grid
+    rng = np.random.default_rng(k)
+    for qlat, qlon in zip(rng.uniform(11, 13.5, 100), rng.uniform(75, 78, 100)):
+        ids, distances = index.nearest(qlat, qlon, k)
+        expected = np.sort(haversine_km(qlat, qlon, lat, lon))[:k]
+        np.testing.assert_allclose(distances, expected)
+        np.testing.assert_allclose(haversine_km(qlat, qlon, lat[ids // 10], lon[ids // 10]), distances)
+
+
+def test_max_km_only_bounds_the_closest_point(grid):
+    index, _, _ = grid
+    ids, distances = index.nearest(12.2, 76.5, 8, max_km=50)
+    assert len(ids) == 8 and distances[0] <= 50
+    assert len(index.nearest(14.0, 76.5, 1, max_km=50)[0]) == 0
+
+
+@pytest.mark.parametrize("lat, lon", FAR_AWAY)
+def test_far_away_points_stop_early(grid, lat, lon):
+    index, _, _ = grid
+    started = time.perf_counter()
+    ids, distances = index.nearest(lat, lon, 8, max_km=50)
+    assert len(ids) == 0 and len(distances) == 0
+    assert time.perf_counter() - started < 0.05
+
+
+def test_empty_grid():
+    ids, distances = SpatialGrid([np.nan], [np.nan], [1]).nearest(12.3, 76.6, 3, max_km=50)
+    assert len(ids) == len(distances) == 0
+
+
+def test_idw_weights():
+    np.testing.assert_allclose(idw_weights([1.0, 2.0]), [0.8, 0.2])
+    np.testing.assert_allclose(idw_weights([0.0, 2.0, 0.0]), [0.5, 0, 0.5])
+
+
+@pytest.mark.parametrize("lat, lon", FAR_AWAY)
+def test_far_away_coordinates_are_not_found(lat, lon):
+    started = time.perf_counter()
+    response = api.app.test_client().post("/api/analyze/location", json={"lat": lat, "lon": lon, "k": 8})
+    assert response.status_code == 404
+    assert time.perf_counter() - started < 0.1
+
+
+def test_coordinates_resolve_to_the_nearest_village():
+    village = api.VILLAGE_STORE.spatial
+    lat, lon = float(village.lat[0]), float(village.lon[0])
+    response = api.app.test_client().post("/api/analyze/location", json={"lat": lat, "lon": lon})
+    assert response.status_code == 200
+    assert float(response.headers["X-Village-Distance-Km"]) == 0
+    assert response.get_json()["village"] == api.VILLAGE_STORE.village(village.ids[0]).summary()
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import main
+from write_behind import InMemoryFirestore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(*args, cwd=ROOT):
+    return subprocess.run([sys.executable, *args], cwd=cwd, capture_output=True, text=True, timeout=120)
+
+
+def test_firebase_is_not_imported_at_startup():
+    result = run("-c", "import sys, main; main.app.test_client().get('/health'); "
+                       "print(sorted(m for m in sys.modules if m.startswith('firebase_admin')))")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_import_time_check_enforces_the_budget():
+    within = run("check_import_time.py")
+    assert within.returncode == 0, within.stdout
+    over = run("check_import_time.py", "--budget-ms", "1", "main")
+    assert over.returncode == 1 and "over budget" in over.stdout
+
+
+def test_concurrent_first_requests_initialize_firestore_once(monkeypatch, tmp_path):
+    calls = []
+
+    def slow_init():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return InMemoryFirestore()
+    monkeypatch.setenv("SOIL_JOURNAL_PATH", str(tmp_path / "journal.db"))
+    monkeypatch.setattr(main, "init_firestore", slow_init)
+    for name, value in (("_initialized", False), ("_db", None), ("_writes", None)):
+        monkeypatch.setattr(main, name, value)
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(main.get_db())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert len(calls) == 1
+        assert len({id(client) for client in clients}) == 1
+        assert main.get_writes() is main.get_writes() is not None
+    finally:
+        main.get_writes().close()
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from villages import VillageStore, load_village_store, parse_range, slugify, soil_row
+
+RECORD = {"pincode": "571438", "soil_type": "Red loamy", "typical_ph": 6.5, "nitrogen_range": "350-600 kg/ha",
+          "phosphorus_range": "30-60 kg/ha", "potassium_range": "300-500 kg/ha", "organic_carbon": "0.8-1.2%"}
+
+
+@pytest.fixture
+def store():
+    store = VillageStore()
+    store.add("Srirangapatna", "Mysuru", RECORD, "Mysuru", "Karnataka")
+    store.add("Sri Ramapura", "Mysuru", dict(RECORD, pincode="570008"))
+    store.add("Srirangapatna", "T. Narasipura", dict(RECORD, pincode="571438"))
+    return store
+
+
+def test_slugs():
+    assert slugify("T. Narasipura Town") == "t_narasipura_town"
+
+
+def test_lookups_by_slug_taluk_and_pincode(store):
+    assert store.get("srirangapatna").taluk == "mysuru"
+    assert store.get("Srirangapatna", "T. Narasipura").taluk == "t_narasipura"
+    assert store.get("srirangapatna", "hunsur") is None
+    assert [v.id for v in store.by_pin("571438")] == [0, 2]
+    assert [v.name for v in store.in_taluk("mysuru")] == ["Srirangapatna", "Sri Ramapura"]
+    assert store.taluks == {"mysuru": "Mysuru", "t_narasipura": "T. Narasipura"}
+
+
+def test_prefix_search_by_word_and_pincode(store):
+    assert [v.id for v in store.search("sri")] == [0, 1, 2]
+    assert [v.id for v in store.search("Ram")] == [1]
+    assert [v.id for v in store.search("5700")] == [1]
+    assert store.search("sri", limit=1)[0].id == 0
+    assert store.search("xyz") == []
+
+
+def test_every_change_bumps_the_version(store):
+    version = store.version
+    store.add("Hebbal", "Mysuru", RECORD)
+    assert store.version == version + 1
+
+
+def test_loads_the_district_file():
+    with open(load_village_store.__defaults__[0], encoding="utf-8") as f:
+        data = json.load(f)
+    store = load_village_store()
+    assert len(store) == sum(len(taluk["villages"]) for taluk in data["taluks"])
+    first = data["taluks"][0]["villages"][0]
+    assert store.get(first["name"], data["taluks"][0]["name"]).pincode == str(first["pincode"])
+
+
+def test_parses_ranges_with_units():
+    assert parse_range("350-600 kg/ha", "kg/ha") == (350.0, 600.0)
+    assert parse_range(" 0.8 - 1.2% ", "%") == (0.8, 1.2)
+    assert parse_range("45 kg/ha", "kg/ha") == (45.0, 45.0)
+
+
+@pytest.mark.parametrize("text,unit", [
+    ("350-600 kg/ha", "%"),
+    ("600-350 kg/ha", "kg/ha"),
+    ("about 400 kg/ha", "kg/ha"),
+    ("", "kg/ha"),
+])
+def test_rejects_bad_ranges(text, unit):
+    with pytest.raises(ValueError):
+        parse_range(text, unit)
+
+
+def test_soil_rows_hold_bounds_and_midpoints():
+    row = soil_row(RECORD)
+    assert row[0] == 6.5
+    assert row[1:4] == (350.0, 600.0, 475.0)
+    assert row[-3:] == (0.8, 1.2, 1.0)
+    legacy = soil_row({"avg_soil": {"ph": 7, "nitrogen": 280, "phosphorus": 20, "potassium": 150,
+                                    "organic_carbon": 0.5}})
+    assert legacy[1:4] == (280.0, 280.0, 280.0)
+
+
+def test_soil_table_and_means(store):
+    assert store.soil["nitrogen_mid"].tolist() == [475.0, 475.0, 475.0]
+    assert store.soil_params(store.villages[0]) == {
+        "ph": 6.5, "nitrogen": 475.0, "phosphorus": 45.0, "potassium": 400.0, "organic_carbon": 1.0,
+        "type": "Red loamy"
+    }
+    store.add("Hebbal", "Mysuru", dict(RECORD, typical_ph=7.5, nitrogen_range="100-200 kg/ha"))
+    means = store.taluk_soil_means("Mysuru")
+    assert means["ph"] == pytest.approx((6.5 + 6.5 + 7.5) / 3)
+    assert means["nitrogen"] == pytest.approx((475 + 475 + 150) / 3)
+    assert store.taluk_soil_means("Hunsur") is None
+
+
+def test_bad_records_name_the_village(store):
+    with pytest.raises(ValueError, match="Hebbal"):
+        store.add("Hebbal", "Mysuru", dict(RECORD, nitrogen_range="lots"))
+    with pytest.raises(ValueError, match="Hebbal"):
+        store.add("Hebbal", "Mysuru", {"typical_ph": 6})
+    assert len(store) == 3
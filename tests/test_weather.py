@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from weather import StubUpstream, TTLCache, WeatherService, snap_to_cell
+
+
+def test_nearby_coordinates_share_a_cell():
+    key, centre = snap_to_cell(12.3012, 76.6551)
+    assert snap_to_cell(12.3049, 76.6999)[0] == key
+    assert centre == (12.325, 76.675)
+    assert snap_to_cell(12.2999, 76.6551)[0] != key
+    # floor, not truncation: negative coordinates snap the same way
+    assert snap_to_cell(-0.01, -0.01) == ((-1, -1), (-0.025, -0.025))
+
+
+def test_one_upstream_call_per_cell():
+    upstream = StubUpstream()
+    service = WeatherService(upstream)
+    first = service.get(12.3012, 76.6551)
+    second = service.get(12.3049, 76.6999)
+    assert (first[2], second[2]) == ("MISS", "HIT")
+    assert first[0] == second[0] and first[1] == second[1]
+    assert upstream.calls == 1
+
+
+def test_entries_expire_after_the_ttl():
+    upstream = StubUpstream()
+    service = WeatherService(upstream, ttl=0.05)
+    service.get(12.3, 76.6)
+    time.sleep(0.08)
+    assert service.get(12.3, 76.6)[2] == "MISS"
+    assert upstream.calls == 2
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") == (None, 0)
+    assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3
+
+
+def test_concurrent_misses_share_one_upstream_call():
+    upstream = StubUpstream(delay=0.2)
+    service = WeatherService(upstream)
+    barrier = threading.Barrier(8)
+    statuses = []
+
+    def request(i):
+        barrier.wait()
+        statuses.append(service.get(12.3 + i * 0.001, 76.6)[2])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.calls == 1
+    assert sorted(statuses) == ["COALESCED"] * 7 + ["MISS"]
+    assert service.stats["coalesced"] == 7
+
+
+def test_upstream_failure_serves_stale_data():
+    upstream = StubUpstream()
+    service = WeatherService(upstream, ttl=0.05)
+    weather = service.get(12.3, 76.6)[0]
+    time.sleep(0.08)
+    upstream.fail = True
+
+    stale, _, status, seconds_left = service.get(12.3, 76.6)
+    assert (stale, status, seconds_left) == (weather, "STALE", 0)
+    assert service.stats["upstream_errors"] == 1 and service.stats["stale"] == 1
+
+
+def test_upstream_failure_without_cached_data_raises():
+    upstream = StubUpstream()
+    upstream.fail = True
+    with pytest.raises(ConnectionError):
+        WeatherService(upstream).get(12.3, 76.6)
+
+
+def test_weather_route(monkeypatch, caplog):
+    import app
+
+    upstream = StubUpstream()
+    monkeypatch.setattr(app, "WEATHER", WeatherService(upstream, ttl=600))
+    client = app.app.test_client()
+
+    response = client.get("/api/weather/12.3012/76.6551")
+    assert response.status_code == 200 and response.headers["X-Cache"] == "MISS"
+    assert response.get_json()["cell"] == {"lat": 12.325, "lon": 76.675}
+    assert client.get("/api/weather/12.3049/76.6999").headers["X-Cache"] == "HIT"
+    assert client.get("/api/weather/north/76.6").status_code == 400
+
+    upstream.fail = True
+    assert client.get("/api/weather/13.3/77.6").status_code == 502
+    assert "Weather upstream error" in caplog.text
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from journal import SoilJournal, content_id
+from write_behind import InMemoryFirestore, WriteBehindQueue
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+class GatedFirestore(InMemoryFirestore):
+    """Commits block until the gate opens, so the queue backs up"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def batch(self):
+        batch = super().batch()
+        commit = batch.commit
+
+        def gated_commit():
+            self.gate.wait(5)
+            commit()
+        batch.commit = gated_commit
+        return batch
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(client, **kwargs):
+        kwargs.setdefault("retry_backoff", 0.001)
+        queues.append(WriteBehindQueue(client, **kwargs))
+        return queues[-1]
+    yield make
+    for q in queues:
+        q.close()
+
+
+def test_flushes_when_the_batch_is_full(make_queue):
+    client = InMemoryFirestore()
+    q = make_queue(client, max_batch=5, flush_interval=30)
+    ids = [q.enqueue("soil", {"n": i}) for i in range(5)]
+
+    wait_for(lambda: client.commits == 1)
+    assert {doc_id for _, doc_id in client.documents} == set(ids)
+    assert q.stats()["batches"] == 1 and q.stats()["written"] == 5
+
+
+def test_flushes_a_partial_batch_after_the_interval(make_queue):
+    client = InMemoryFirestore()
+    q = make_queue(client, max_batch=100, flush_interval=0.2)
+    started = time.monotonic()
+    for i in range(3):
+        q.enqueue("soil", {"n": i})
+
+    wait_for(lambda: client.commits == 1)
+    assert time.monotonic() - started >= 0.15
+    assert len(client.documents) == 3
+
+
+def test_failed_commits_are_retried(make_queue):
+    client = InMemoryFirestore()
+    client.fail_commits = 2
+    q = make_queue(client, max_batch=2, max_retries=3)
+    q.enqueue("soil", {"n": 1})
+    q.enqueue("soil", {"n": 2})
+
+    wait_for(lambda: q.stats()["written"] == 2)
+    stats = q.stats()
+    assert stats["retries"] == 2 and stats["failed"] == 0
+    assert client.commits == 1 and len(client.documents) == 2
+
+
+def test_batches_fail_after_max_retries(make_queue):
+    client = InMemoryFirestore()
+    client.fail_commits = 10
+    failures = []
+    q = make_queue(client, max_batch=1, max_retries=2)
+    q.on_failure = failures.append
+    q.enqueue("soil", {"n": 1})
+
+    wait_for(lambda: q.stats()["failed"] == 1)
+    assert q.stats()["retries"] == 2
+    assert [data for _, _, _, data in failures[0]] == [{"n": 1}]
+    assert client.documents == {}
+
+
+def test_full_queue_drops_writes_and_counts_them(make_queue):
+    client = GatedFirestore()
+    q = make_queue(client, max_batch=1, max_queue=2, enqueue_timeout=0.01)
+    results = [q.enqueue("soil", {"n": i}) for i in range(10)]
+
+    stats = q.stats()
+    assert stats["dropped"] == results.count(None) > 0
+    assert stats["enqueued"] == 10 - stats["dropped"]
+    assert stats["high_watermark"] <= 2
+
+    client.gate.set()
+    wait_for(lambda: q.stats()["queue_depth"] == 0 and len(client.documents) == stats["enqueued"])
+
+
+def test_full_queue_defers_journaled_writes(make_queue, tmp_path):
+    client = GatedFirestore()
+    q = make_queue(client, max_batch=1, max_queue=1, enqueue_timeout=0.01,
+                   journal=SoilJournal(str(tmp_path / "journal.db")), replay_interval=0.05)
+    results = [q.enqueue("soil", {"n": i}) for i in range(6)]
+
+    assert None not in results
+    assert q.stats()["deferred"] > 0 and q.stats()["dropped"] == 0
+
+    # Deferred entries are only in the journal; the replayer writes them
+    client.gate.set()
+    wait_for(lambda: len(client.documents) == 6)
+    assert q.stats()["replayed"] > 0
+
+
+def test_close_flushes_everything_queued(make_queue):
+    client = InMemoryFirestore()
+    q = make_queue(client, max_batch=4, flush_interval=30)
+    for i in range(10):
+        q.enqueue("soil", {"n": i})
+
+    q.close()
+    assert len(client.documents) == 10
+    assert q.stats()["written"] == 10 and not q.stats()["worker_alive"]
+    with pytest.raises(RuntimeError):
+        q.enqueue("soil", {"n": 11})
+
+
+def test_journal_replays_after_a_crash(make_queue, tmp_path):
+    path = str(tmp_path / "journal.db")
+    # Journaled, then the process died before the worker flushed them
+    crashed = SoilJournal(path)
+    lost = [{"n": i} for i in range(3)]
+    for data in lost:
+        crashed.append("soil", data)
+
+    time.sleep(0.1)
+    journal = SoilJournal(path)
+    client = InMemoryFirestore()
+    q = make_queue(client, journal=journal, flush_interval=0.01, replay_interval=0.05)
+    q.enqueue("soil", {"n": "after restart"})
+
+    wait_for(lambda: len(client.documents) == 4 and len(journal) == 0)
+    assert {("soil", content_id("soil", data)) for data in lost} <= set(client.documents)
+    assert q.stats()["replayed"] == 3
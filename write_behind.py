@@ -0,0 +1,299 @@
+"""
+Write-behind queue for Firestore.
+
+Request handlers enqueue documents and return at once; a background worker
+flushes them in batched writes (by size or age), retries failed commits
+with backoff and keeps counters for monitoring. With a journal attached,
+every entry is made durable locally first and only removed from the
+journal once Firestore has confirmed it; anything left over (outage,
+crash, full queue) is replayed later under the same content-hash id.
+"""
+
+import atexit
+import os
+import queue
+import random
+import secrets
+import string
+import threading
+import time
+
+# Firestore rejects batches above 500 writes
+MAX_BATCH_SIZE = 500
+
+# Journal batches re-sent per replay pass
+REPLAY_BATCHES = 20
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+_STOP = object()
+
+
+def auto_id():
+    """20-character id in the same shape as Firestore's auto-generated ids"""
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+class WriteBehindQueue:
+    """Bounded queue of (seq, collection, doc_id, data) drained by one worker thread"""
+
+    def __init__(self, client, max_batch=100, flush_interval=0.5, max_queue=10000,
+                 enqueue_timeout=0.05, max_retries=5, retry_backoff=0.2,
+                 journal=None, replay_interval=5.0):
+        self.client = client
+        self.journal = journal
+        self.replay_interval = replay_interval
+        self.max_batch = min(max_batch, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_failure = None
+        # Called as on_commit(seconds, error) after every commit attempt
+        self.on_commit = None
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self._in_flight = set()
+        self._last_replay = 0.0
+        self._stats = {
+            "enqueued": 0, "written": 0, "batches": 0, "retries": 0,
+            "failed": 0, "dropped": 0, "deferred": 0, "replayed": 0,
+            "high_watermark": 0, "last_flush_ms": None,
+        }
+        atexit.register(self.close)
+
+    # ---------- producer side ----------
+
+    def _ensure_worker(self):
+        # Started lazily and restarted after fork: threads do not survive fork()
+        if self._pid == os.getpid() and self._worker is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._worker is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._worker = threading.Thread(target=self._run, name="firestore-write-behind", daemon=True)
+            self._pid = os.getpid()
+            self._worker.start()
+
+    def enqueue(self, collection, data, doc_id=None):
+        """Queue a document write; returns its id, or None if it could not be kept"""
+        if self._closed:
+            raise RuntimeError("write-behind queue is closed")
+        self._ensure_worker()
+
+        seq = None
+        if self.journal is not None:
+            try:
+                seq, doc_id = self.journal.append(collection, data)
+            except Exception as e:
+                print("Journal append error, keeping entry in memory only:", e)
+        doc_id = doc_id or auto_id()
+
+        with self._lock:
+            if seq is not None:
+                self._in_flight.add(seq)
+        try:
+            # Brief block applies backpressure without stalling the request for long
+            self._queue.put((seq, collection, doc_id, data), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._in_flight.discard(seq)
+            if seq is not None:
+                # Already durable; the replayer will pick it up
+                self._count("deferred")
+                return doc_id
+            self._count("dropped")
+            return None
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats["enqueued"] += 1
+            self._stats["high_watermark"] = max(self._stats["high_watermark"], depth)
+        return doc_id
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        """Counters plus current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        stats["worker_alive"] = bool(self._worker and self._worker.is_alive() and self._pid == os.getpid())
+        return stats
+
+    # ---------- consumer side ----------
+
+    def _run(self):
+        q = self._queue
+        while True:
+            try:
+                item = q.get(timeout=self.replay_interval)
+            except queue.Empty:
+                self._replay()
+                continue
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+
+            # Collect until the batch is full or the oldest entry is flush_interval old
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = q.get(timeout=max(remaining, 0)) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+            if stop:
+                # Drain whatever arrived before the stop marker
+                rest = []
+                while True:
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        rest.append(item)
+                for start in range(0, len(rest), self.max_batch):
+                    self._flush(rest[start:start + self.max_batch])
+                return
+            self._replay()
+
+    def _replay(self):
+        # Re-send journal entries nobody in this process is handling: earlier
+        # failures, crashes, or writes deferred by a full queue
+        if self.journal is None or time.monotonic() - self._last_replay < self.replay_interval:
+            return
+        self._last_replay = time.monotonic()
+        # Bounded so live traffic is not starved while a backlog drains
+        for _ in range(REPLAY_BATCHES):
+            with self._lock:
+                in_flight = set(self._in_flight)
+            try:
+                entries = self.journal.pending(self.max_batch, older_than=self.replay_interval, exclude=in_flight)
+            except Exception as e:
+                print("Journal read error:", e)
+                return
+            if not entries:
+                return
+            with self._lock:
+                self._in_flight.update(seq for seq, _, _, _ in entries)
+            if not self._flush(entries):
+                return
+            self._count("replayed", len(entries))
+            if len(entries) < self.max_batch:
+                return
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        seqs = [seq for seq, _, _, _ in batch]
+        try:
+            for attempt in range(self.max_retries + 1):
+                attempt_started = time.monotonic()
+                try:
+                    writes = self.client.batch()
+                    for _, collection, doc_id, data in batch:
+                        writes.set(self.client.collection(collection).document(doc_id), data)
+                    writes.commit()
+                    if self.on_commit is not None:
+                        self.on_commit(time.monotonic() - attempt_started, None)
+                    break
+                except Exception as e:
+                    if self.on_commit is not None:
+                        self.on_commit(time.monotonic() - attempt_started, e)
+                    if attempt == self.max_retries:
+                        print("Firestore batch write failed after retries:", e)
+                        self._count("failed", len(batch))
+                        if self.on_failure is not None:
+                            self.on_failure(batch)
+                        return False
+                    self._count("retries")
+                    # Exponential backoff with jitter so workers do not retry in lockstep
+                    time.sleep(self.retry_backoff * (2 ** attempt) * (0.5 + random.random()))
+
+            if self.journal is not None:
+                try:
+                    self.journal.remove(seqs)
+                except Exception as e:
+                    # Harmless: a later replay rewrites the same document ids
+                    print("Journal cleanup error:", e)
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(seqs)
+
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round((time.monotonic() - started) * 1000, 2)
+        return True
+
+    def close(self, timeout=10):
+        """Stop accepting writes, flush everything queued and stop the worker"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker is None or self._pid != os.getpid() or not self._worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+
+
+# ---------- local fake for tests and offline development ----------
+
+class InMemoryFirestore:
+    """Minimal stand-in for firestore.Client covering what the queue uses"""
+
+    def __init__(self):
+        self.documents = {}
+        self.commits = 0
+        self.fail_commits = 0
+
+    def collection(self, name):
+        return _FakeCollection(name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+
+class _FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, doc_id=None):
+        return _FakeDocument(self.name, doc_id or auto_id())
+
+
+class _FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+
+class _FakeBatch:
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        if self.store.fail_commits > 0:
+            self.store.fail_commits -= 1
+            raise ConnectionError("simulated Firestore outage")
+        for ref, data in self.writes:
+            self.store.documents[(ref.collection, ref.id)] = dict(data)
+        self.store.commits += 1